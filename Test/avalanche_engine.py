@@ -0,0 +1,342 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import hashlib
+import hmac
+import os
+import sys
+import numpy as np
+from blake3 import blake3
+from Crypto.Hash import SHA3_256
+from Crypto.Protocol.KDF import HKDF
+from blake2_tree import blake2_tree_hash, derive_key
+from hash_pool import chunk_spans
+
+# Mesin avalanche lokal: semua varian satu-bit dari sebuah input di-hash di proses ini (dan worker
+# pool-nya), tanpa file sementara atau request HTTP per bit.
+#
+# Bit i is bit 7 - i % 8 of byte i // 8 (the order of the old '0'/'1' string). Every engine returns the
+# digests of a batch of flipped variants as packed uint8 rows, so statistics are XOR + popcount in NumPy.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from blake3_tree import BLOCK_LEN, CHUNK_END, CHUNK_LEN, CHUNK_START, PARENT, ROOT, compress, mode_params, tree_levels
+
+# Varian per batch numpy (lanes per compress call) dan per tugas worker
+AVALANCHE_BATCH_LANES = int(os.environ.get("AVALANCHE_BATCH_LANES", 16384))
+AVALANCHE_TASK_BITS = int(os.environ.get("AVALANCHE_TASK_BITS", 65536))
+
+# Popcount of every byte value (numpy 1.24 has no bitwise_count)
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+# BLAKE3 via blake3-py for the API's three modes
+def blake3_function(hash_type: str = "regular", key_bytes: bytes = None, context=None):
+    if hash_type == "keyed":
+        return lambda data: blake3(data, key=key_bytes).digest()
+    if hash_type == "derive_keyed":
+        context = context.decode("utf-8") if isinstance(context, bytes) else context
+        return lambda data: blake3(data, derive_key_context=context).digest()
+    return lambda data: blake3(data).digest()
+
+# Any hash function fn(buffer) -> digest bytes. One reusable buffer: each bit is flipped in place,
+# hashed and flipped back, so a variant costs one hash of the input and no copy.
+class GenericFlipEngine:
+    def __init__(self, data: bytes, fn):
+        self.fn = fn
+        self.bit_count = len(data) * 8
+        self._buffer = bytearray(data)
+        self.original = np.frombuffer(fn(bytes(data)), dtype=np.uint8)
+
+    def digests(self, positions) -> np.ndarray:
+        out = np.empty((len(positions), len(self.original)), dtype=np.uint8)
+        view = memoryview(self._buffer)
+        for row, position in enumerate(positions):
+            index, mask = int(position) >> 3, 0x80 >> (int(position) & 7)
+            self._buffer[index] ^= mask
+            out[row] = np.frombuffer(self.fn(view), dtype=np.uint8)
+            self._buffer[index] ^= mask
+        return out
+
+# BLAKE3 variants from the tree: flipping a bit in block b of chunk j only changes chunk j from block b
+# onwards and the parents on j's path to the root. The chaining value before every block and every tree
+# level of the original are kept, so a variant costs (blocks left in its chunk + tree depth) compressions,
+# run for thousands of variants at once as numpy lanes (blake3_tree.compress).
+class Blake3FlipEngine:
+    def __init__(self, data: bytes, hash_type: str = "regular", key_bytes: bytes = None, context=None):
+        data = bytes(data)
+        self.key_words, self.flags = mode_params(hash_type, key_bytes, context)
+        self.bit_count = len(data) * 8
+        self.chunk_count = max(1, -(-len(data) // CHUNK_LEN))
+        count = self.chunk_count
+        padded = data.ljust(count * CHUNK_LEN, b"\0")
+        # (chunk, block, word)
+        self.words = np.frombuffer(padded, dtype="<u4").astype(np.uint32).reshape(count, 16, 16)
+        last_len = len(data) - (count - 1) * CHUNK_LEN
+        self.block_counts = np.full(count, 16, dtype=np.int64)
+        self.block_counts[-1] = max(1, -(-last_len // BLOCK_LEN))
+        self.block_lens = np.full((count, 16), BLOCK_LEN, dtype=np.uint32)
+        self.block_lens[-1, self.block_counts[-1] - 1] = last_len - (self.block_counts[-1] - 1) * BLOCK_LEN
+        self.counters = np.arange(count, dtype=np.uint64)
+
+        # Chaining value before each block of each chunk: (chunk, block, 8)
+        self.prefix = np.empty((count, 16, 8), dtype=np.uint32)
+        cv = np.repeat(self.key_words[:, None], count, axis=1)
+        for block in range(16):
+            self.prefix[:, block] = cv.T
+            active = block < self.block_counts
+            state = compress(cv, self.words[:, block].T, self.counters, self.block_lens[:, block], self._block_flags(block, self.block_counts))
+            cv = np.where(active, state[:8], cv)
+        self.levels = tree_levels(cv, self.key_words, self.flags) if count > 1 else None
+
+        fn = blake3_function(hash_type, key_bytes, context)
+        self.original = np.frombuffer(fn(data), dtype=np.uint8)
+        # Cek awal terhadap blake3-py dengan varian bit 0
+        if data and self.digests([0])[0].tobytes() != fn(bytes([data[0] ^ 0x80]) + data[1:]):
+            raise AssertionError("tree engine disagrees with blake3")
+
+    def _block_flags(self, block: int, block_counts) -> np.ndarray:
+        last = block == block_counts - 1
+        flags = np.where(last, self.flags | CHUNK_END | (ROOT if self.chunk_count == 1 else 0), self.flags)
+        return (flags | (CHUNK_START if block == 0 else 0)).astype(np.uint32)
+
+    def digests(self, positions) -> np.ndarray:
+        positions = np.asarray(positions, dtype=np.int64)
+        out = np.empty((len(positions), 32), dtype=np.uint8)
+        for start in range(0, len(positions), AVALANCHE_BATCH_LANES):
+            batch = positions[start:start + AVALANCHE_BATCH_LANES]
+            out[start:start + len(batch)] = self._digest_batch(batch)
+        return out
+
+    def _digest_batch(self, positions: np.ndarray) -> np.ndarray:
+        byte = positions >> 3
+        chunk = byte // CHUNK_LEN
+        first_block = (byte % CHUNK_LEN) // BLOCK_LEN
+        word = (byte % BLOCK_LEN) // 4
+        # Little-endian words: byte k of a word is bits 8k..8k+7, and bit 0 of the string is the byte's MSB
+        mask = np.left_shift(np.uint32(1), ((byte % 4) * 8 + 7 - (positions & 7)).astype(np.uint32))
+        cvs = np.empty((8, len(positions)), dtype=np.uint32)
+        # Lanes that start in the same block move through their chunks' remaining blocks in lockstep
+        for block in range(16):
+            lanes = np.nonzero(first_block == block)[0]
+            if not len(lanes):
+                continue
+            lane_chunk = chunk[lanes]
+            cv = self.prefix[lane_chunk, block].T
+            for current in range(block, 16):
+                active = current < self.block_counts[lane_chunk]
+                if not active.any():
+                    break
+                m = self.words[lane_chunk, current].T.copy()
+                if current == block:
+                    m[word[lanes], np.arange(len(lanes))] ^= mask[lanes]
+                state = compress(cv, m, self.counters[lane_chunk], self.block_lens[lane_chunk, current],
+                                 self._block_flags(current, self.block_counts[lane_chunk]))
+                cv = np.where(active, state[:8], cv)
+            cvs[:, lanes] = cv
+        if self.levels is not None:
+            cvs = self._root(cvs, chunk)
+        return np.ascontiguousarray(cvs.T).astype("<u4").view(np.uint8)
+
+    # Dari CV chunk yang berubah ke root, memakai node saudara dari tree asli
+    def _root(self, cvs: np.ndarray, index: np.ndarray) -> np.ndarray:
+        key = np.repeat(self.key_words[:, None], cvs.shape[1], axis=1)
+        top = len(self.levels) - 1
+        for k in range(top):
+            level = self.levels[k]
+            width = level.shape[1]
+            sibling = index ^ 1
+            paired = sibling < width
+            sibling_cv = level[:, np.minimum(sibling, width - 1)]
+            even = (index & 1) == 0
+            left = np.where(even, cvs, sibling_cv)
+            right = np.where(even, sibling_cv, cvs)
+            flags = self.flags | PARENT | (ROOT if k == top - 1 else 0)
+            parents = compress(key, np.concatenate([left, right]), 0, BLOCK_LEN, flags)[:8]
+            cvs = np.where(paired, parents, cvs)
+            index = index >> 1
+        return cvs
+
+# Jumlah bit output yang berubah per varian
+def flip_counts(engine, positions) -> np.ndarray:
+    return POPCOUNT[engine.digests(positions) ^ engine.original].sum(axis=1, dtype=np.uint16)
+
+_worker_engine = None
+
+def _init_worker(factory, args):
+    global _worker_engine
+    _worker_engine = factory(*args)
+
+def _worker_flip_counts(positions) -> np.ndarray:
+    return flip_counts(_worker_engine, positions)
+
+# Flip counts for every position, sharded over processes (each builds its own engine once).
+# factory(*args) must build the engine; with processes <= 1 everything runs here.
+def parallel_flip_counts(factory, args: tuple, positions, processes: int = None) -> np.ndarray:
+    positions = np.asarray(positions, dtype=np.int64)
+    processes = processes or os.cpu_count() or 1
+    if processes <= 1 or len(positions) <= AVALANCHE_TASK_BITS:
+        return flip_counts(factory(*args), positions)
+    shards = [positions[i:i + AVALANCHE_TASK_BITS] for i in range(0, len(positions), AVALANCHE_TASK_BITS)]
+    with ProcessPoolExecutor(processes, mp_context=get_context("fork"), initializer=_init_worker, initargs=(factory, args)) as pool:
+        return np.concatenate(list(pool.map(_worker_flip_counts, shards)))
+
+# Ringkasan avalanche dari flip counts: rata-rata (ideal: setengah bit digest), sebaran dan histogram
+def summarize_flips(counts: np.ndarray, digest_bits: int) -> dict:
+    counts = counts.astype(np.float64)
+    return {
+        "variants": int(len(counts)),
+        "digest_bits": digest_bits,
+        "average_avalanche_percent": float(counts.mean() / digest_bits * 100) if len(counts) else None,
+        "mean_flipped_bits": float(counts.mean()) if len(counts) else None,
+        "std_flipped_bits": float(counts.std()) if len(counts) else None,
+        "expected_std_flipped_bits": float(np.sqrt(digest_bits) / 2),
+        "min_flipped_bits": int(counts.min()) if len(counts) else None,
+        "max_flipped_bits": int(counts.max()) if len(counts) else None,
+        "histogram": np.bincount(counts.astype(np.int64), minlength=digest_bits + 1).tolist()
+    }
+
+# Hash functions of the comparison apps, rebuilt without Flask/GCS so they can be analysed locally.
+# The SHA apps hash cpu_count() chunks and combine the chunk digests (see hash_pool.chunk_spans), so
+# chunks should match the server's CPU count. The HKDF route draws a random salt per upload; a fixed
+# all-zero salt is used here, since a randomised function has no SAC to measure.
+def analysis_function(algorithm: str, hash_type: str = "regular", key_bytes: bytes = None, context=None, chunks: int = None):
+    chunks = chunks or os.cpu_count() or 1
+    if algorithm == "blake3":
+        return blake3_function(hash_type, key_bytes, context)
+    if algorithm == "blake2":
+        key = key_bytes if hash_type == "keyed" else derive_key(context) if hash_type == "derive_keyed" else b""
+        return lambda data: bytes.fromhex(blake2_tree_hash(data, key=key))
+    if algorithm not in ("sha256", "sha3"):
+        raise ValueError(f"unknown algorithm: {algorithm}")
+
+    digest = hashlib.sha256 if algorithm == "sha256" else hashlib.sha3_256
+
+    def split(data):
+        view = memoryview(data)
+        return [view[offset:offset + length] for offset, length in chunk_spans(len(view), chunks)]
+
+    if hash_type == "regular":
+        return lambda data: digest(b"".join(digest(chunk).digest() for chunk in split(data))).digest()
+    if hash_type == "keyed":
+        def keyed(data):
+            final = hmac.new(key_bytes, digestmod=digest)
+            for chunk in split(data):
+                final.update(hmac.new(key_bytes, chunk, digest).digest())
+            return final.digest()
+        return keyed
+    if algorithm == "sha3" and hash_type == "derive_keyed":
+        context = context.encode("utf-8") if isinstance(context, str) else context
+        return lambda data: b"".join(HKDF(bytes(chunk), 32, bytes(16), SHA3_256, context=context) for chunk in split(data))
+    raise ValueError(f"{algorithm} has no {hash_type} mode")
+
+# Strict Avalanche Criterion and Bit Independence Criterion counts, summed over samples.
+# A sample is one (message, input bit) pair; its diff is the XOR of the two digests as output bits d_j.
+#   flips[i, j]      = samples of input bit i where output bit j changed  -> SAC p[i, j] = flips / messages
+#   pair_flips[j, k] = samples where output bits j and k both changed     -> BIC correlation of d_j, d_k
+class SacBicAccumulator:
+    def __init__(self, input_bits: int, output_bits: int):
+        self.input_bits = input_bits
+        self.output_bits = output_bits
+        self.messages = 0
+        self.flips = np.zeros((input_bits, output_bits), dtype=np.int64)
+        self.pair_flips = np.zeros((output_bits, output_bits), dtype=np.int64)
+
+    # diffs: (messages, input_bits, output_bytes) packed XOR digests
+    def add(self, diffs: np.ndarray):
+        bits = np.unpackbits(diffs, axis=2)
+        self.messages += bits.shape[0]
+        self.flips += bits.sum(axis=0, dtype=np.int64)
+        rows = bits.reshape(-1, self.output_bits).astype(np.float32)
+        # float32 sums are exact while a batch has fewer than 2**24 rows
+        self.pair_flips += np.rint(rows.T @ rows).astype(np.int64)
+
+    def merge(self, other):
+        self.messages += other.messages
+        self.flips += other.flips
+        self.pair_flips += other.pair_flips
+
+    @property
+    def samples(self) -> int:
+        return self.messages * self.input_bits
+
+    def sac(self) -> np.ndarray:
+        return self.flips / max(self.messages, 1)
+
+    def bic(self) -> np.ndarray:
+        n = max(self.samples, 1)
+        mean = self.flips.sum(axis=0) / n
+        covariance = self.pair_flips / n - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(covariance), 0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.nan_to_num(covariance / np.outer(std, std))
+
+    # SAC: every p[i, j] should be 0.5 within binomial noise (3 sigma = 1.5 / sqrt(messages)).
+    # BIC: off-diagonal correlations should be 0 within 3 / sqrt(samples).
+    def summary(self) -> dict:
+        sac = self.sac()
+        bic = self.bic()
+        off_diagonal = np.abs(bic[~np.eye(self.output_bits, dtype=bool)])
+        sac_bound = 1.5 / np.sqrt(max(self.messages, 1))
+        bic_bound = 3 / np.sqrt(max(self.samples, 1))
+        return {
+            "messages": self.messages,
+            "samples": self.samples,
+            "input_bits": self.input_bits,
+            "output_bits": self.output_bits,
+            "sac": {
+                "mean": float(sac.mean()),
+                "std": float(sac.std()),
+                "max_abs_deviation": float(np.abs(sac - 0.5).max()),
+                "three_sigma_bound": float(sac_bound),
+                "fraction_outside_bound": float((np.abs(sac - 0.5) > sac_bound).mean())
+            },
+            "bic": {
+                "mean_abs_correlation": float(off_diagonal.mean()) if off_diagonal.size else 0.0,
+                "max_abs_correlation": float(off_diagonal.max()) if off_diagonal.size else 0.0,
+                "three_sigma_bound": float(bic_bound),
+                "fraction_outside_bound": float((off_diagonal > bic_bound).mean()) if off_diagonal.size else 0.0
+            }
+        }
+
+# Rows of messages hashed per accumulate step (bounds the unpacked bit matrix in memory)
+SAC_MESSAGES_PER_STEP = int(os.environ.get("SAC_MESSAGES_PER_STEP", 64))
+
+def _sac_bic_task(task):
+    spec, message_bytes, messages, seed = task
+    fn = analysis_function(*spec)
+    rng = np.random.default_rng(seed)
+    positions = np.arange(message_bytes * 8)
+    accumulator = None
+    for start in range(0, messages, SAC_MESSAGES_PER_STEP):
+        diffs = []
+        for _ in range(min(SAC_MESSAGES_PER_STEP, messages - start)):
+            engine = GenericFlipEngine(rng.bytes(message_bytes), fn)
+            diffs.append(engine.digests(positions) ^ engine.original)
+        diffs = np.stack(diffs)
+        if accumulator is None:
+            accumulator = SacBicAccumulator(message_bytes * 8, diffs.shape[2] * 8)
+        accumulator.add(diffs)
+    return accumulator
+
+# SAC/BIC over random messages of message_bytes, sharded across a process pool. spec is the argument
+# tuple of analysis_function(); every task gets its own seed derived from seed.
+def parallel_sac_bic(spec: tuple, message_bytes: int, messages: int, processes: int = None, seed: int = 0,
+                     messages_per_task: int = 256) -> SacBicAccumulator:
+    seeds = np.random.SeedSequence(seed).spawn(-(-messages // messages_per_task))
+    tasks = [(spec, message_bytes, min(messages_per_task, messages - i * messages_per_task), seeds[i])
+             for i in range(len(seeds))]
+    processes = processes or os.cpu_count() or 1
+    if processes <= 1 or len(tasks) == 1:
+        return _merge(map(_sac_bic_task, tasks))
+    with ProcessPoolExecutor(processes, mp_context=get_context("fork")) as pool:
+        return _merge(pool.map(_sac_bic_task, tasks))
+
+def _merge(accumulators) -> SacBicAccumulator:
+    total = None
+    for accumulator in accumulators:
+        if total is None:
+            total = accumulator
+        else:
+            total.merge(accumulator)
+    return total
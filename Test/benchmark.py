@@ -0,0 +1,252 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from blake3 import blake3
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import stream_encode_multipart
+from local_backends import load_app
+
+# Benchmark offline: setiap aplikasi dijalankan in-process (Flask test client) dengan GCS dan
+# Firestore lokal dari local_backends.py, jadi hasilnya bisa diulang tanpa jaringan.
+#
+#   python Test/benchmark.py --output bench.json
+#   python Test/benchmark.py --max-size 64M --apps blake3,sha256 --baseline bench.json
+#
+# Output JSON berisi median, p90, p99 dan GB/s per (app, mode, size). With --baseline every case
+# is compared to the stored run, and a median slower by more than --threshold is a regression
+# (exit code 1).
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KEY = "10c9a7fdfdd3ade1025895293e0b9412"
+
+# Aplikasi dan route upload per mode hash: (path, {mode: (route, form fields)})
+APPS = {
+    "blake3": ("gcp_app.py", {
+        "regular": ("/upload-regular-hash", {}),
+        "keyed": ("/upload-keyed-hash", {"key": KEY}),
+        "derive_keyed": ("/upload-derive-keyed-hash", {}),
+    }),
+    "sha256": ("Test/gcp_app_sha256.py", {
+        "regular": ("/upload-regular-sha256", {}),
+        "keyed": ("/upload-hmac-sha256", {"key": KEY}),
+    }),
+    "sha3": ("Test/gcp_app_sha3.py", {
+        "regular": ("/upload-regular-sha3", {}),
+        "keyed": ("/upload-hmac-sha3", {"key": KEY}),
+        "derive_keyed": ("/upload-hkdf-sha3", {}),
+    }),
+    "blake2": ("Test/gcp_app_blake2.py", {
+        "regular": ("/upload-regular-hash", {}),
+        "keyed": ("/upload-keyed-hash", {"key": KEY}),
+        "derive_keyed": ("/upload-derive-keyed-hash", {}),
+    }),
+}
+
+# 1 KiB .. 4 GiB, kelipatan 4
+DEFAULT_SIZES = tuple(1024 * 4 ** n for n in range(12))
+# Iterations per case are capped so one case uploads at most BYTES_PER_CASE, but never fewer than MIN_ITERATIONS
+BYTES_PER_CASE = 2 * 1024 ** 3
+MIN_ITERATIONS = 3
+# Sizes up to this get one unmeasured warm-up request
+WARMUP_MAX_SIZE = 64 * 1024 * 1024
+PAYLOAD_WRITE_SIZE = 8 * 1024 * 1024
+
+UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper().rstrip("IB")
+    if text[-1:] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+def format_size(size: int) -> str:
+    for unit in ("G", "M", "K"):
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return f"{size // UNITS[unit]}{unit}iB"
+    return f"{size}B"
+
+# Payload deterministik dari BLAKE3 XOF, ditulis ke disk per PAYLOAD_WRITE_SIZE (tidak pernah utuh di memori)
+def write_payload(path: str, size: int):
+    xof = blake3(b"blake3-api benchmark payload")
+    with open(path, "wb") as f:
+        for offset in range(0, size, PAYLOAD_WRITE_SIZE):
+            f.write(xof.digest(length=min(PAYLOAD_WRITE_SIZE, size - offset), seek=offset))
+
+# Body multipart di-encode sekali per (size, mode), sehingga waktu encoding tidak ikut terukur
+def encode_upload(payload_path: str, form: dict):
+    with open(payload_path, "rb") as payload:
+        stream, length, boundary = stream_encode_multipart({"file": FileStorage(payload, filename="bench.bin"), **form}, threshold=PAYLOAD_WRITE_SIZE)
+    return stream, length, f"multipart/form-data; boundary={boundary}"
+
+# Persentil nearest-rank dari sampel yang sudah diurutkan
+def percentile(ordered: list, fraction: float) -> float:
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def summarize(samples: list, size: int) -> dict:
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    return {
+        "iterations": len(ordered),
+        "median_s": median,
+        "p90_s": percentile(ordered, 0.90),
+        "p99_s": percentile(ordered, 0.99),
+        "min_s": ordered[0],
+        "mean_s": statistics.fmean(ordered),
+        "gbps": size / median / 1e9 if median else None
+    }
+
+# Median dari angka yang dilaporkan server (time_elapsed, dan phases_ms bila ada)
+def summarize_server(responses: list) -> dict:
+    summary = {}
+    elapsed = [r["time_elapsed"] for r in responses if isinstance(r.get("time_elapsed"), (int, float))]
+    if elapsed:
+        summary["time_elapsed_median_s"] = statistics.median(elapsed)
+    phases = {}
+    for r in responses:
+        for name, ms in (r.get("phases_ms") or {}).items():
+            phases.setdefault(name, []).append(ms)
+    if phases:
+        summary["phases_median_ms"] = {name: statistics.median(values) for name, values in phases.items()}
+    return summary
+
+def iterations_for(size: int, iterations: int) -> int:
+    return max(MIN_ITERATIONS, min(iterations, BYTES_PER_CASE // size))
+
+def run_case(client, route: str, form: dict, payload_path: str, size: int, iterations: int) -> dict:
+    stream, length, content_type = encode_upload(payload_path, form)
+    samples = []
+    responses = []
+    try:
+        runs = iterations_for(size, iterations)
+        warmup = 1 if size <= WARMUP_MAX_SIZE else 0
+        for run in range(warmup + runs):
+            stream.seek(0)
+            start = time.perf_counter_ns()
+            response = client.post(route, input_stream=stream, content_type=content_type, content_length=length)
+            elapsed = (time.perf_counter_ns() - start) / 1e9
+            body = response.get_json(silent=True)
+            response.close()
+            if response.status_code != 200:
+                return {"error": f"HTTP {response.status_code}: {body}"}
+            if run >= warmup:
+                samples.append(elapsed)
+                responses.append(body or {})
+    finally:
+        stream.close()
+    return {**summarize(samples, size), "server": summarize_server(responses)}
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(apps: list, modes: list, sizes: list, iterations: int, state_dir: str) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory(dir=state_dir) as root:
+        # All apps share one local bucket/database root: the clients are patched process-wide
+        payload_path = os.path.join(root, "payload.bin")
+        clients = {}
+        for size in sizes:
+            write_payload(payload_path, size)
+            for app_name in apps:
+                path, routes = APPS[app_name]
+                if app_name not in clients:
+                    clients[app_name] = load_app(os.path.join(REPO_ROOT, path), root).app.test_client()
+                for mode in modes:
+                    if mode not in routes:
+                        continue
+                    route, form = routes[mode]
+                    result = {"app": app_name, "mode": mode, "route": route, "size": size}
+                    result.update(run_case(clients[app_name], route, form, payload_path, size, iterations))
+                    results.append(result)
+                    report(result)
+    return {
+        "meta": {
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+
+def report(result: dict):
+    label = f"{result['app']:<7} {result['mode']:<13} {format_size(result['size']):>7}"
+    if "error" in result:
+        print(f"{label}  ERROR {result['error']}", file=sys.stderr)
+    else:
+        print(f"{label}  median {result['median_s'] * 1e3:10.3f} ms  p99 {result['p99_s'] * 1e3:10.3f} ms  {result['gbps']:8.3f} GB/s  (n={result['iterations']})", file=sys.stderr)
+
+# Membandingkan median dengan baseline. Mengembalikan daftar perbandingan; regression=True jika lebih lambat dari threshold.
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    stored = {(r["app"], r["mode"], r["size"]): r for r in baseline["results"] if "median_s" in r}
+    comparisons = []
+    for result in current["results"]:
+        before = stored.get((result["app"], result["mode"], result["size"]))
+        if before is None or "median_s" not in result:
+            continue
+        change = result["median_s"] / before["median_s"] - 1
+        comparisons.append({
+            "app": result["app"],
+            "mode": result["mode"],
+            "size": result["size"],
+            "baseline_median_s": before["median_s"],
+            "median_s": result["median_s"],
+            "change": change,
+            "regression": change > threshold
+        })
+    return comparisons
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline upload benchmark against in-process apps with local GCS/Firestore")
+    parser.add_argument("--apps", default=",".join(APPS), help="comma-separated, from: " + ", ".join(APPS))
+    parser.add_argument("--modes", default="regular,keyed,derive_keyed")
+    parser.add_argument("--sizes", help="comma-separated sizes (e.g. 1K,1M,64M); default 1KiB..4GiB by 4x")
+    parser.add_argument("--max-size", help="drop default sizes above this (e.g. 256M)")
+    parser.add_argument("--iterations", type=int, default=20, help="measured requests per case (capped for large payloads)")
+    parser.add_argument("--state-dir", default=None, help="where payloads and the local buckets are written (default: system temp)")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="median slow-down counted as a regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    apps = [name for name in args.apps.split(",") if name]
+    unknown = [name for name in apps if name not in APPS]
+    if unknown:
+        parser.error(f"unknown apps: {', '.join(unknown)}")
+    sizes = [parse_size(size) for size in args.sizes.split(",")] if args.sizes else list(DEFAULT_SIZES)
+    if args.max_size:
+        sizes = [size for size in sizes if size <= parse_size(args.max_size)]
+
+    results = run_benchmark(apps, args.modes.split(","), sizes, args.iterations, args.state_dir)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["comparison"] = compare(results, json.load(f), args.threshold)
+        regressions = [c for c in results["comparison"] if c["regression"]]
+        for c in regressions:
+            print(f"REGRESSION {c['app']} {c['mode']} {format_size(c['size'])}: {c['change']:+.1%} "
+                  f"({c['baseline_median_s'] * 1e3:.3f} ms -> {c['median_s'] * 1e3:.3f} ms)", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+
+# BLAKE2b tree hashing for gcp_app_blake2.py, built on hashlib.blake2b's tree parameters
+# (fanout, depth, leaf_size, node_offset, node_depth, inner_size, last_node).
+#
+# The input is cut into contiguous leaves of LEAF_SIZE bytes. Each leaf is a BLAKE2b node at depth 0
+# with its index as node_offset; the last leaf sets last_node. The root (node_depth=1, last_node) hashes
+# the concatenated 64-byte leaf digests. Like BLAKE2bp it is a two-level tree, but with contiguous
+# leaves instead of 128-byte striping, so every leaf is a zero-copy memoryview slice. hashlib releases
+# the GIL while it hashes, so the leaves run in parallel on plain threads.
+
+# Part of the hash definition: changing it changes every digest
+LEAF_SIZE = 256 * 1024
+DIGEST_SIZE = 32
+INNER_SIZE = 64
+# Unlimited fanout (0) and two levels: every leaf hangs directly under the root
+FANOUT = 0
+DEPTH = 2
+# Personalisation for the context key of derive_key mode (BLAKE2 has no derive-key mode of its own)
+DERIVE_KEY_PERSON = b"blake2 derive"
+
+BLAKE2_THREADS = int(os.environ.get("BLAKE2_THREADS", os.cpu_count() or 1))
+# Leaves per thread task, so thread hand-off stays small next to hashing time
+BLAKE2_LEAVES_PER_TASK = int(os.environ.get("BLAKE2_LEAVES_PER_TASK", 4))
+
+_executor = ThreadPoolExecutor(max_workers=max(1, BLAKE2_THREADS), thread_name_prefix="blake2")
+
+def _node(data, key: bytes, node_offset: int, node_depth: int, last_node: bool, digest_size: int):
+    return hashlib.blake2b(data, digest_size=digest_size, key=key, fanout=FANOUT, depth=DEPTH, leaf_size=LEAF_SIZE,
+                           node_offset=node_offset, node_depth=node_depth, inner_size=INNER_SIZE, last_node=last_node)
+
+# Digest leaf first..last-1 dari view, digabung
+def _hash_leaves(view, key: bytes, first: int, last: int, count: int) -> bytes:
+    return b"".join(_node(view[i * LEAF_SIZE:(i + 1) * LEAF_SIZE], key, i, 0, i == count - 1, INNER_SIZE).digest()
+                    for i in range(first, last))
+
+# Hash pohon BLAKE2b (hex) dari data; key kosong untuk mode regular
+def blake2_tree_hash(data, key: bytes = b"") -> str:
+    view = memoryview(data)
+    count = max(1, -(-len(view) // LEAF_SIZE))
+    if count == 1 or BLAKE2_THREADS <= 1:
+        leaves = _hash_leaves(view, key, 0, count, count)
+    else:
+        step = max(1, min(BLAKE2_LEAVES_PER_TASK, count // BLAKE2_THREADS))
+        tasks = [_executor.submit(_hash_leaves, view, key, first, min(first + step, count), count) for first in range(0, count, step)]
+        leaves = b"".join(task.result() for task in tasks)
+    return _node(leaves, key, 0, 1, True, DIGEST_SIZE).hexdigest()
+
+# Kunci 32 byte dari context, lalu keyed tree hash, meniru derive_key BLAKE3
+def derive_key(context) -> bytes:
+    context = context.encode("utf-8") if isinstance(context, str) else context
+    return hashlib.blake2b(context, digest_size=32, person=DERIVE_KEY_PERSON).digest()
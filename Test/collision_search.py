@@ -0,0 +1,235 @@
+from multiprocessing import get_context
+import math
+import os
+import queue
+import time
+import numpy as np
+
+from preimage_search import blake3_digest
+from blake3_tree import CHUNK_END, CHUNK_START, ROOT, compress, mode_params
+
+# Pencarian collision BLAKE3 terpotong k bit (24..64) dengan parallel rho dan distinguished points
+# (van Oorschot-Wiener).
+#
+# The walk function f maps a k-bit x to the first k bits of BLAKE3(x as 8 big-endian bytes || trial as
+# 4 big-endian bytes) in the chosen mode, so a collision f(x) = f(y) with x != y is a collision of the
+# truncated hash on two distinct 12-byte messages, and each trial number gives an independent function.
+# Every worker process advances its own lanes of random walks with one vectorised compress() per step;
+# a walk ends at a distinguished point (low dp_bits of x zero) and its (start, point, length) goes to
+# the coordinator. Two walks reaching the same point merged somewhere: the coordinator re-walks both
+# to the merge and checks the collision with blake3-py. Memory is the point table only.
+
+MIN_BITS = 24
+MAX_BITS = 64
+MESSAGE_LEN = 12
+# Lanes per worker at most; fewer for small k so no walk is left unfinished at the collision
+COLLISION_LANES = int(os.environ.get("COLLISION_LANES", 4096))
+# Distinguished points expected per trial; sets dp_bits, and so the size of the point table
+COLLISION_TABLE_POINTS = int(os.environ.get("COLLISION_TABLE_POINTS", 1 << 16))
+# Seconds between a worker's reports to the coordinator
+COLLISION_REPORT_INTERVAL = float(os.environ.get("COLLISION_REPORT_INTERVAL", 0.2))
+# A walk this many times longer than 2**dp_bits is in a cycle without distinguished points; it is restarted
+MAX_WALK_FACTOR = 20
+
+# Langkah yang diharapkan sampai collision pertama untuk fungsi acak k bit: sqrt(pi * 2**k / 2)
+def expected_steps(bits: int) -> float:
+    return math.sqrt(math.pi * 2 ** bits / 2)
+
+# dp_bits and lanes per worker for k bits: about COLLISION_TABLE_POINTS points per trial, and all lanes
+# together walking at most 1/16 of the expected steps past the collision before they are reported
+def walk_params(bits: int, processes: int):
+    budget = expected_steps(bits)
+    dp_bits = max(0, math.ceil(math.log2(budget / COLLISION_TABLE_POINTS)))
+    lanes = int(min(COLLISION_LANES, max(1, budget / (processes * 2 ** dp_bits * 16))))
+    return dp_bits, lanes
+
+# f untuk satu nilai, dengan blake3-py
+def step(x: int, bits: int, trial: int, hash_type: str, key_bytes: bytes = None, context: str = None) -> int:
+    digest = blake3_digest(message(x, trial), hash_type, key_bytes, context)
+    return int.from_bytes(digest[:8], "big") >> (64 - bits)
+
+def message(x: int, trial: int) -> bytes:
+    return x.to_bytes(8, "big") + trial.to_bytes(4, "big")
+
+# f tervektorisasi: satu compress() untuk semua lane
+class WalkFunction:
+    def __init__(self, bits: int, trial: int, hash_type: str, key_bytes: bytes = None, context: str = None):
+        self.bits = bits
+        key_words, flags = mode_params(hash_type, key_bytes, context)
+        self.key_words = key_words
+        self.flags = flags | CHUNK_START | CHUNK_END | ROOT
+        self.trial_word = np.frombuffer(trial.to_bytes(4, "big"), dtype="<u4")[0]
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        n = len(x)
+        words = x.astype(">u8").view("<u4").reshape(n, 2)
+        m = np.zeros((16, n), dtype=np.uint32)
+        m[0] = words[:, 0]
+        m[1] = words[:, 1]
+        m[2] = self.trial_word
+        state = compress(np.repeat(self.key_words[:, None], n, axis=1), m, 0, MESSAGE_LEN, self.flags)
+        digest = np.ascontiguousarray(state[:2].T, dtype="<u4").view(">u8")[:, 0].astype(np.uint64)
+        return digest >> np.uint64(64 - self.bits)
+
+# Worker process: lanes of walks until stop is set. Sends (distinguished points, steps) batches:
+# points is an (n, 3) uint64 array of start, point, length.
+def _walker(spec, bits: int, trial: int, dp_bits: int, lanes: int, seed: int, reports, stop):
+    reports.cancel_join_thread()
+    f = WalkFunction(bits, trial, *spec)
+    rng = np.random.default_rng(seed)
+    high = np.uint64((1 << bits) - 1)
+    dp_mask = np.uint64((1 << dp_bits) - 1)
+    max_length = MAX_WALK_FACTOR << dp_bits
+    start = rng.integers(0, high, size=lanes, dtype=np.uint64, endpoint=True)
+    x = start.copy()
+    length = np.zeros(lanes, dtype=np.uint64)
+    while not stop.is_set():
+        found, steps = [], 0
+        deadline = time.perf_counter() + COLLISION_REPORT_INTERVAL
+        while time.perf_counter() < deadline:
+            x = f(x)
+            length += np.uint64(1)
+            steps += lanes
+            ended = (x & dp_mask) == 0
+            if ended.any():
+                found.append(np.stack([start[ended], x[ended], length[ended]], axis=1))
+            ended |= length >= max_length
+            if ended.any():
+                count = int(ended.sum())
+                start[ended] = rng.integers(0, high, size=count, dtype=np.uint64, endpoint=True)
+                x[ended] = start[ended]
+                length[ended] = 0
+        reports.put((np.concatenate(found) if found else np.empty((0, 3), dtype=np.uint64), steps))
+
+# Tabel distinguished point: open addressing atas array numpy (25 byte per slot, load factor <= 1/2),
+# instead of a dict of Python ints at well over 100 bytes per point.
+class DistinguishedPointTable:
+    def __init__(self, capacity: int = 1024):
+        self._allocate(1 << max(4, (capacity - 1).bit_length()))
+        self.size = 0
+
+    def _allocate(self, capacity: int):
+        self.capacity = capacity
+        self._shift = 64 - (capacity.bit_length() - 1)
+        self.points = np.zeros(capacity, dtype=np.uint64)
+        self.starts = np.zeros(capacity, dtype=np.uint64)
+        self.lengths = np.zeros(capacity, dtype=np.uint64)
+        self.used = np.zeros(capacity, dtype=bool)
+
+    def _slot(self, point: int) -> int:
+        slot = ((point * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+        while self.used[slot] and int(self.points[slot]) != point:
+            slot = (slot + 1) & (self.capacity - 1)
+        return slot
+
+    # Menyimpan walk yang berakhir di point; mengembalikan (start, length) walk lain yang sudah ada di sana
+    def insert(self, point: int, start: int, length: int):
+        slot = self._slot(point)
+        if self.used[slot]:
+            return int(self.starts[slot]), int(self.lengths[slot])
+        self.points[slot], self.starts[slot], self.lengths[slot], self.used[slot] = point, start, length, True
+        self.size += 1
+        if 2 * self.size > self.capacity:
+            self._grow()
+        return None
+
+    def _grow(self):
+        old = self.points[self.used], self.starts[self.used], self.lengths[self.used]
+        self._allocate(2 * self.capacity)
+        for point, start, length in zip(*(a.tolist() for a in old)):
+            slot = self._slot(point)
+            self.points[slot], self.starts[slot], self.lengths[slot], self.used[slot] = point, start, length, True
+
+    @property
+    def nbytes(self) -> int:
+        return self.points.nbytes + self.starts.nbytes + self.lengths.nbytes + self.used.nbytes
+
+# Two walks that end at the same point: walk both to where they merge. Returns (x, y) with x != y and
+# f(x) == f(y), or None when one start lies on the other walk (a "Robin Hood", no collision).
+def locate_collision(f, walk_a, walk_b):
+    (a, length_a), (b, length_b) = walk_a, walk_b
+    if length_a < length_b:
+        (a, length_a), (b, length_b) = (b, length_b), (a, length_a)
+    for _ in range(length_a - length_b):
+        a = f(a)
+    if a == b:
+        return None
+    while True:
+        next_a, next_b = f(a), f(b)
+        if next_a == next_b:
+            return a, b
+        a, b = next_a, next_b
+
+# One trial: parallel rho on the trial's function until a collision or max_time. Returns the result dict;
+# "steps" is the length of every walk handled up to the collision (the work the birthday bound is about),
+# "worker_steps" everything the workers computed, including walks still running when they were stopped.
+def find_collision(spec, bits: int, trial: int = 0, processes: int = None, dp_bits: int = None, lanes: int = None,
+                   max_time: float = None, seed: int = 0) -> dict:
+    if not MIN_BITS <= bits <= MAX_BITS:
+        raise ValueError(f"bits must be between {MIN_BITS} and {MAX_BITS}")
+    hash_type, key_bytes, context = spec
+    processes = max(1, processes or os.cpu_count() or 1)
+    auto_dp_bits, auto_lanes = walk_params(bits, processes)
+    dp_bits = auto_dp_bits if dp_bits is None else dp_bits
+    lanes = auto_lanes if lanes is None else lanes
+    f = lambda x: step(x, bits, trial, hash_type, key_bytes, context)
+
+    ctx = get_context("fork")
+    reports, stop = ctx.Queue(), ctx.Event()
+    seeds = np.random.SeedSequence([seed, trial, bits]).spawn(processes)
+    workers = [ctx.Process(target=_walker, args=(spec, bits, trial, dp_bits, lanes, s, reports, stop), daemon=True)
+               for s in seeds]
+    table = DistinguishedPointTable(COLLISION_TABLE_POINTS)
+    result = {"bits": bits, "trial": trial, "hash_type": hash_type, "processes": processes, "dp_bits": dp_bits,
+              "lanes_per_process": lanes, "expected_steps": expected_steps(bits), "steps": 0, "worker_steps": 0, "points": 0,
+              "robin_hoods": 0, "collision": None}
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    try:
+        while result["collision"] is None:
+            remaining = None if max_time is None else max_time - (time.perf_counter() - started)
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                points, steps = reports.get(timeout=min(1.0, remaining) if remaining is not None else 1.0)
+            except queue.Empty:
+                continue
+            result["worker_steps"] += steps
+            for start, point, length in points.tolist():
+                result["points"] += 1
+                result["steps"] += length
+                other = table.insert(point, start, length)
+                if other is None:
+                    continue
+                pair = locate_collision(f, (start, length), other)
+                if pair is None:
+                    result["robin_hoods"] += 1
+                    continue
+                result["collision"] = _collision(pair, bits, trial, spec)
+                break
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(5)
+            if worker.is_alive():
+                worker.terminate()
+    elapsed = time.perf_counter() - started
+    result.update({
+        "time_elapsed": elapsed,
+        "steps_per_second": result["worker_steps"] / elapsed if elapsed else None,
+        "steps_per_second_per_core": result["worker_steps"] / elapsed / processes if elapsed else None,
+        "steps_over_expected": result["steps"] / result["expected_steps"],
+        "table_bytes": table.nbytes
+    })
+    return result
+
+# Collision dicek ulang dengan blake3-py atas pesan lengkapnya
+def _collision(pair, bits: int, trial: int, spec) -> dict:
+    x, y = pair
+    message_x, message_y = message(x, trial), message(y, trial)
+    digest_x, digest_y = blake3_digest(message_x, *spec), blake3_digest(message_y, *spec)
+    shift = 64 - bits
+    if message_x == message_y or int.from_bytes(digest_x[:8], "big") >> shift != int.from_bytes(digest_y[:8], "big") >> shift:
+        raise AssertionError(f"Walks merged without a {bits}-bit collision: {message_x.hex()} {message_y.hex()}")
+    return {"message_a": message_x.hex(), "message_b": message_y.hex(), "digest_a": digest_x.hex(), "digest_b": digest_y.hex()}
@@ -1,10 +1,10 @@
-from flask import Flask, request, jsonify, send_file, Response
+from flask import Flask, request, jsonify, send_file
 from google.cloud import storage, firestore
 import os
 import io
 import psutil
 import time
-from blake3 import blake3
+from blake2_tree import blake2_tree_hash, derive_key
 
 app = Flask(__name__)
 
@@ -14,20 +14,17 @@ BUCKET_NAME = "blake3-api-storage"
 # Konfigurasi Firestore
 db = firestore.Client()
 
-# Regular_hash function
-def blake3_regular_hash(file_data: bytes) -> str:
-   hash_value = blake3(file_data,  max_threads=blake3.AUTO).digest().hex()
-   return hash_value
+# Regular_hash function: pohon BLAKE2b, leaf di-hash paralel oleh thread (lihat blake2_tree.py)
+def blake2_regular_hash(file_data: bytes) -> str:
+    return blake2_tree_hash(file_data)
 
 # Keyed_hash function
-def blake3_keyed_hash(file_data: bytes, key_bytes: bytes) -> str:
-    hash_value = blake3(file_data, key=key_bytes, max_threads=blake3.AUTO).digest().hex()
-    return hash_value
+def blake2_keyed_hash(file_data: bytes, key_bytes: bytes) -> str:
+    return blake2_tree_hash(file_data, key=key_bytes)
 
 # Derive_keyed_hash function
-def blake3_derive_keyed_hash(file_data: bytes, context: bytes) -> str:
-    hash_value = blake3(file_data, derive_key_context=context, max_threads=blake3.AUTO).digest().hex()
-    return hash_value
+def blake2_derive_keyed_hash(file_data: bytes, context) -> str:
+    return blake2_tree_hash(file_data, key=derive_key(context))
 
 # Fungsi untuk mengunggah data ke Google Cloud Storage
 def upload_to_gcs(data: bytes, file_name: str):
@@ -62,7 +59,7 @@ def upload_keyed_hash():
     
     #file_bytes = file_data.encode('utf-8')
     key_bytes = key.encode('utf-8')
-    hash_value = blake3_keyed_hash(file_data, key_bytes)
+    hash_value = blake2_keyed_hash(file_data, key_bytes)
     gcs_file_name = f"{file_name}"
     upload_to_gcs(file_data, gcs_file_name)
 
@@ -71,7 +68,7 @@ def upload_keyed_hash():
     doc_ref.set({
         'file_name': gcs_file_name,
         'hash_value': hash_value,
-        'hash_type': "keyed"
+        'hash_type': "keyed_blake2b"
     })
 
     end_time = time.time()
@@ -105,11 +102,9 @@ def upload_derive_keyed_hash():
     file_name = file.filename
 
     # Generate context from file metadata
-    last_modified = request.form.get('last_modified')
-    hash_type = request.form.get('hash_type')
     context = f"{file_name} derive"
     
-    hash_value = blake3_derive_keyed_hash(file_data, context)
+    hash_value = blake2_derive_keyed_hash(file_data, context)
     gcs_file_name = f"{file_name}"
     upload_to_gcs(file_data, gcs_file_name)
 
@@ -118,7 +113,7 @@ def upload_derive_keyed_hash():
     doc_ref.set({
         'file_name': gcs_file_name,
         'hash_value': hash_value,
-        'hash_type': "derive_keyed"
+        'hash_type': "derive_keyed_blake2b"
     })
 
     end_time = time.time()
@@ -151,7 +146,7 @@ def upload():
     file_data = file.read()
     file_name = file.filename
 
-    hash_value = blake3_regular_hash(file_data)
+    hash_value = blake2_regular_hash(file_data)
     gcs_file_name = f"{file_name}"
     upload_to_gcs(file_data, gcs_file_name)
 
@@ -160,7 +155,7 @@ def upload():
     doc_ref.set({
         'file_name': gcs_file_name,
         'hash_value': hash_value,
-        'hash_type': "regular"
+        'hash_type': "regular_blake2b"
     })
 
     end_time = time.time()
@@ -184,14 +179,14 @@ def upload():
 
 @app.route('/check-regular-hash/<hash_value>', methods=['GET'])
 def check_regular_hash(hash_value):
-    metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).where('hash_type', '==', 'regular').limit(1).get()
+    metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).where('hash_type', '==', 'regular_blake2b').limit(1).get()
     metadata = metadata_ref[0].to_dict() if metadata_ref else None
     if not metadata:
         return jsonify({"error": "File not found"}), 404
 
     file_data = download_from_gcs(metadata['file_name'])
     
-    data_download_hash = blake3_regular_hash(file_data)
+    data_download_hash = blake2_regular_hash(file_data)
     if data_download_hash != hash_value:
         return jsonify({"Status": "Data Integrity Check Failed!"})
     return jsonify({"Status": "Success", "hash_value": data_download_hash})
@@ -199,7 +194,7 @@ def check_regular_hash(hash_value):
 
 @app.route('/check-keyed-hash/<hash_value>', methods=['GET'])
 def check_keyed_hash(hash_value):
-    metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).where('hash_type', '==', 'keyed').limit(1).get()
+    metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).where('hash_type', '==', 'keyed_blake2b').limit(1).get()
     metadata = metadata_ref[0].to_dict() if metadata_ref else None
     if not metadata:
         return jsonify({"error": "File not found"}), 404
@@ -210,23 +205,25 @@ def check_keyed_hash(hash_value):
     file_data = download_from_gcs(metadata['file_name'])
     key_bytes = key.encode('utf-8')
 
-    data_download_hash = blake3_keyed_hash(file_data, key_bytes)
+    data_download_hash = blake2_keyed_hash(file_data, key_bytes)
     if data_download_hash != hash_value:
         return jsonify({"Status": "Data Integrity Check Failed!"})
     return jsonify({"Status": "Success", "hash_value": data_download_hash})
 
 @app.route('/check-derive-keyed-hash/<hash_value>', methods=['GET'])
 def check_derive_keyed_hash(hash_value):
-    metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).where('hash_type', '==', 'derive_keyed').limit(1).get()
+    metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).where('hash_type', '==', 'derive_keyed_blake2b').limit(1).get()
     metadata = metadata_ref[0].to_dict() if metadata_ref else None
     if not metadata:
         return jsonify({"error": "File not found"}), 404
     
     context = request.form.get('context')
+    if context is None:
+        return jsonify({"error": "Context must be provided"}), 400
 
     file_data = download_from_gcs(metadata['file_name'])
 
-    data_download_hash = blake3_derive_keyed_hash(file_data, context)
+    data_download_hash = blake2_derive_keyed_hash(file_data, context)
     if data_download_hash != hash_value:
         return jsonify({"Status": "Data Integrity Check Failed!"})
     return jsonify({"Status": "Success", "hash_value": data_download_hash})
@@ -5,7 +5,8 @@ import psutil
 import time
 import hashlib  # Import hashlib for SHA-256
 from hmac import new as hmac_new
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
+from hash_pool import start_hash_pool, chunk_spans, HashPoolError
 
 app = Flask(__name__)
 
@@ -27,6 +28,9 @@ def hmac_sha256_hash_chunk(args):
     h = hmac_new(key, chunk, hashlib.sha256)
     return h.digest()
 
+# Worker hashing dibuat sekali per proses server, bukan per request
+hash_pool = start_hash_pool()
+
 # Fungsi untuk mengunggah data ke Google Cloud Storage
 def upload_to_gcs(data: bytes, file_name: str):
     client = storage.Client()
@@ -47,16 +51,14 @@ def upload_regular_sha256():
     file_data = file.read()
     file_name = file.filename
 
-    # Divide data into chunks
-    num_chunks = cpu_count()
-    chunk_size = len(file_data) // num_chunks
-    chunks = [file_data[i * chunk_size:(i + 1) * chunk_size] for i in range(num_chunks)]
-    if len(file_data) % num_chunks != 0:
-        chunks.append(file_data[num_chunks * chunk_size:])
+    # Divide data into chunks (offset, length); the bytes are not copied
+    spans = chunk_spans(len(file_data), cpu_count())
 
-    # Process chunks in parallel
-    with Pool(num_chunks) as pool:
-        results = pool.map(sha256_hash_chunk, chunks)
+    # Process chunks in parallel on the persistent worker pool
+    try:
+        results = hash_pool.map_chunks(sha256_hash_chunk, file_data, spans)
+    except HashPoolError as e:
+        return jsonify({"error": str(e)}), 503
     
     # Combine results
     final_hasher = hashlib.sha256()
@@ -111,16 +113,14 @@ def upload_hmac_sha256():
     
     key_bytes = key.encode('utf-8')
 
-    # Divide data into chunks
-    num_chunks = cpu_count()
-    chunk_size = len(file_data) // num_chunks
-    chunks = [file_data[i * chunk_size:(i + 1) * chunk_size] for i in range(num_chunks)]
-    if len(file_data) % num_chunks != 0:
-        chunks.append(file_data[num_chunks * chunk_size:])
+    # Divide data into chunks (offset, length); the bytes are not copied
+    spans = chunk_spans(len(file_data), cpu_count())
     
-    # Process chunks in parallel
-    with Pool(num_chunks) as pool:
-        results = pool.map(hmac_sha256_hash_chunk, [(chunk, key_bytes) for chunk in chunks])
+    # Process chunks in parallel on the persistent worker pool
+    try:
+        results = hash_pool.map_chunks(hmac_sha256_hash_chunk, file_data, spans, key_bytes)
+    except HashPoolError as e:
+        return jsonify({"error": str(e)}), 503
     
     # Combine results
     final_hasher = hmac_new(key_bytes, digestmod=hashlib.sha256)
@@ -159,5 +159,9 @@ def upload_hmac_sha256():
         "throughput_cpb": throughput
     })
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({"hash_pool": hash_pool.stats()})
+
 if __name__ == '__main__':
     app.run(debug=False, host='0.0.0.0', port=8080)
@@ -6,7 +6,8 @@ import time
 from Crypto.Hash import SHA3_256, HMAC
 from Crypto.Protocol.KDF import HKDF
 from Crypto.Random import get_random_bytes
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
+from hash_pool import start_hash_pool, chunk_spans, HashPoolError
 
 app = Flask(__name__)
 
@@ -33,6 +34,9 @@ def hkdf_sha3_key_chunk(args):
     chunk, salt, context = args
     return HKDF(chunk, 32, salt, SHA3_256, context=context)
 
+# Worker hashing dibuat sekali per proses server, bukan per request
+hash_pool = start_hash_pool()
+
 # Fungsi untuk mengunggah data ke Google Cloud Storage
 def upload_to_gcs(data: bytes, file_name: str):
     client = storage.Client()
@@ -53,16 +57,14 @@ def upload_regular_sha3():
     file_data = file.read()
     file_name = file.filename
 
-    # Divide data into chunks
-    num_chunks = cpu_count()
-    chunk_size = len(file_data) // num_chunks
-    chunks = [file_data[i * chunk_size:(i + 1) * chunk_size] for i in range(num_chunks)]
-    if len(file_data) % num_chunks != 0:
-        chunks.append(file_data[num_chunks * chunk_size:])
+    # Divide data into chunks (offset, length); the bytes are not copied
+    spans = chunk_spans(len(file_data), cpu_count())
 
-    # Process chunks in parallel
-    with Pool(num_chunks) as pool:
-        results = pool.map(sha3_hash_chunk, chunks)
+    # Process chunks in parallel on the persistent worker pool
+    try:
+        results = hash_pool.map_chunks(sha3_hash_chunk, file_data, spans)
+    except HashPoolError as e:
+        return jsonify({"error": str(e)}), 503
     
     # Combine results
     final_hasher = SHA3_256.new()
@@ -117,16 +119,14 @@ def upload_hmac_sha3():
     
     key_bytes = key.encode('utf-8')
 
-    # Divide data into chunks
-    num_chunks = cpu_count()
-    chunk_size = len(file_data) // num_chunks
-    chunks = [file_data[i * chunk_size:(i + 1) * chunk_size] for i in range(num_chunks)]
-    if len(file_data) % num_chunks != 0:
-        chunks.append(file_data[num_chunks * chunk_size:])
+    # Divide data into chunks (offset, length); the bytes are not copied
+    spans = chunk_spans(len(file_data), cpu_count())
     
-    # Process chunks in parallel
-    with Pool(num_chunks) as pool:
-        results = pool.map(hmac_sha3_hash_chunk, [(chunk, key_bytes) for chunk in chunks])
+    # Process chunks in parallel on the persistent worker pool
+    try:
+        results = hash_pool.map_chunks(hmac_sha3_hash_chunk, file_data, spans, key_bytes)
+    except HashPoolError as e:
+        return jsonify({"error": str(e)}), 503
     
     # Combine results
     final_hasher = HMAC.new(key_bytes, digestmod=SHA3_256)
@@ -178,18 +178,16 @@ def upload_hkdf_sha3():
     # Generate context from file metadata
     context = "hkdf"
     
-    # Divide data into chunks
-    num_chunks = cpu_count()
-    chunk_size = len(file_data) // num_chunks
-    chunks = [file_data[i * chunk_size:(i + 1) * chunk_size] for i in range(num_chunks)]
-    if len(file_data) % num_chunks != 0:
-        chunks.append(file_data[num_chunks * chunk_size:])
+    # Divide data into chunks (offset, length); the bytes are not copied
+    spans = chunk_spans(len(file_data), cpu_count())
     
     salt = get_random_bytes(16)
 
-    # Process chunks in parallel
-    with Pool(num_chunks) as pool:
-        results = pool.map(hkdf_sha3_key_chunk, [(chunk, salt, context.encode('utf-8')) for chunk in chunks])
+    # Process chunks in parallel on the persistent worker pool
+    try:
+        results = hash_pool.map_chunks(hkdf_sha3_key_chunk, file_data, spans, salt, context.encode('utf-8'))
+    except HashPoolError as e:
+        return jsonify({"error": str(e)}), 503
     
     # Combine results
     final_key = b"".join(results)
@@ -227,5 +225,9 @@ def upload_hkdf_sha3():
         "context": context
     })
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({"hash_pool": hash_pool.stats()})
+
 if __name__ == '__main__':
     app.run(debug=False, host='0.0.0.0', port=8080)
\ No newline at end of file
@@ -0,0 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import cpu_count, get_context, resource_tracker, shared_memory
+import os
+import threading
+import time
+
+# Pool proses hashing yang hidup selama server worker berjalan, dipakai gcp_app_sha256.py dan
+# gcp_app_sha3.py (satu pool per aplikasi). Sebelumnya setiap request membuat Pool(cpu_count())
+# sendiri, sehingga start dan teardown proses mendominasi waktu upload untuk file di bawah puluhan MB.
+
+HASH_POOL_PROCESSES = int(os.environ.get("HASH_POOL_PROCESSES", cpu_count()))
+# Seconds a map() may take before the pool is considered stuck and restarted
+HASH_POOL_TIMEOUT = float(os.environ.get("HASH_POOL_TIMEOUT", 300))
+# Seconds between health checks, and how long a ping may take
+HASH_POOL_HEALTH_INTERVAL = float(os.environ.get("HASH_POOL_HEALTH_INTERVAL", 30))
+HASH_POOL_PING_TIMEOUT = float(os.environ.get("HASH_POOL_PING_TIMEOUT", 5))
+# Inputs up to this size are hashed on the request thread: sending chunks to the workers costs more
+HASH_POOL_INLINE_MAX = int(os.environ.get("HASH_POOL_INLINE_MAX", 1024 * 1024))
+
+class HashPoolError(RuntimeError):
+    pass
+
+def _ping():
+    return os.getpid()
+
+# Potongan (offset, length) seperti pembagian chunk lama di aplikasi: num_chunks potongan sama besar,
+# plus satu potongan sisa bila ukuran tidak habis dibagi. The digests depend on this split.
+def chunk_spans(size: int, num_chunks: int) -> list:
+    chunk_size = size // num_chunks
+    spans = [(i * chunk_size, chunk_size) for i in range(num_chunks)]
+    if size % num_chunks != 0:
+        spans.append((num_chunks * chunk_size, size - num_chunks * chunk_size))
+    return spans
+
+def _call(fn, chunk, args: tuple):
+    return fn((chunk, *args)) if args else fn(chunk)
+
+# Runs in a worker: fn over one span of the request's shared memory segment, without copying it
+def _run_on_shared(task):
+    fn, name, offset, length, args = task
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        chunk = segment.buf[offset:offset + length]
+        try:
+            return _call(fn, chunk, args)
+        finally:
+            chunk.release()
+    finally:
+        segment.close()
+
+# Pool dibuat sekali per proses server (dibuat ulang bila proses di-fork, mis. gunicorn --preload).
+# ProcessPoolExecutor rather than multiprocessing.Pool: a worker that dies (OOM kill) breaks the
+# executor at once instead of leaving the pool's queue lock held and every later map() hanging.
+# A broken pool, a missed ping or a map() past its deadline gets the pool replaced; the request
+# that saw the failure gets HashPoolError.
+class HashWorkerPool:
+    def __init__(self, processes: int, timeout: float, health_interval: float):
+        self.processes = max(1, processes)
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._checked_at = None
+        self._counters = {"maps": 0, "inline": 0, "restarts": 0, "failed_health_checks": 0, "timeouts": 0, "broken": 0}
+
+    # Mengembalikan executor proses ini, membuatnya bila belum ada
+    def _current(self):
+        with self._lock:
+            return self._current_locked()
+
+    def _current_locked(self):
+        if self._executor is None or self._pid != os.getpid():
+            # An executor inherited through fork belongs to the parent; leave it alone.
+            # Workers forked after the resource tracker starts share it, so a segment they attach
+            # to is not reported as leaked by a tracker of their own when it is unlinked here.
+            resource_tracker.ensure_running()
+            self._executor = ProcessPoolExecutor(self.processes, mp_context=get_context("fork"))
+            self._pid = os.getpid()
+            threading.Thread(target=self._watch, args=(self._executor,), daemon=True).start()
+        return self._executor
+
+    # Membuat pool dan menjalankan semua worker sekarang, bukan saat request pertama
+    def start(self):
+        self.check()
+
+    # idle_only: keep the executor while a map() is running on it; checked under the lock map() takes
+    def restart(self, executor=None, idle_only: bool = False):
+        with self._lock:
+            if executor is not None and executor is not self._executor:
+                return
+            if idle_only and self._active:
+                return
+            old, self._executor = self._executor, None
+            self._counters["restarts"] += 1
+        if old is not None and self._pid == os.getpid():
+            # A stuck worker never returns, and the executor has no public way to stop one
+            for process in list((old._processes or {}).values()):
+                process.terminate()
+            old.shutdown(wait=False, cancel_futures=True)
+
+    # One ping per worker. Pings queue behind real work, so a failed check only restarts a pool that
+    # is still idle when the check ends (a busy one is covered by map()'s deadline).
+    def check(self) -> bool:
+        executor = self._current()
+        try:
+            pending = [executor.submit(_ping) for _ in range(self.processes)]
+            done, not_done = wait(pending, HASH_POOL_PING_TIMEOUT)
+            if not_done:
+                raise TimeoutError()
+            for future in done:
+                future.result()
+        except (TimeoutError, BrokenProcessPool, RuntimeError):
+            self._counters["failed_health_checks"] += 1
+            self.restart(executor, idle_only=True)
+            return False
+        self._checked_at = time.time()
+        return True
+
+    def _watch(self, executor):
+        while True:
+            time.sleep(self.health_interval)
+            if executor is not self._executor:
+                return
+            if not self._active:
+                self.check()
+
+    # executor.map(fn, items) dengan batas waktu
+    def map(self, fn, items: list):
+        with self._lock:
+            executor = self._current_locked()
+            self._counters["maps"] += 1
+            self._active += 1
+        try:
+            return list(executor.map(fn, items, timeout=self.timeout))
+        except TimeoutError:
+            self._counters["timeouts"] += 1
+            self.restart(executor)
+            raise HashPoolError(f"Hash workers did not finish within {self.timeout:g}s")
+        except BrokenProcessPool as e:
+            self._counters["broken"] += 1
+            self.restart(executor)
+            raise HashPoolError(f"Hash worker died: {e}")
+        except RuntimeError as e:
+            # submit() ke executor yang baru saja ditutup restart() dari thread lain
+            if executor is self._executor:
+                raise
+            raise HashPoolError(str(e))
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    # fn over each (offset, length) span of data, as fn(chunk) or fn((chunk, *args)) with chunk a memoryview.
+    # The payload is copied once into a shared memory segment and workers only receive its name and
+    # their span, instead of every chunk being pickled through the pool's pipes.
+    def map_chunks(self, fn, data, spans: list, *args):
+        if len(data) <= HASH_POOL_INLINE_MAX:
+            self._counters["inline"] += 1
+            view = memoryview(data)
+            return [_call(fn, view[offset:offset + length], args) for offset, length in spans]
+        segment = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            segment.buf[:len(data)] = data
+            return self.map(_run_on_shared, [(fn, segment.name, offset, length, args) for offset, length in spans])
+        finally:
+            segment.close()
+            segment.unlink()
+
+    def stats(self) -> dict:
+        return dict(self._counters, processes=self.processes, running=self._executor is not None and self._pid == os.getpid(),
+                    last_health_check=self._checked_at)
+
+# Pool untuk satu aplikasi. Call it after the module's chunk functions are defined: forked workers
+# only know the functions that existed when they were started.
+def start_hash_pool() -> HashWorkerPool:
+    pool = HashWorkerPool(HASH_POOL_PROCESSES, HASH_POOL_TIMEOUT, HASH_POOL_HEALTH_INTERVAL)
+    pool.start()
+    return pool
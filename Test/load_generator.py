@@ -0,0 +1,417 @@
+import argparse
+import datetime
+import json
+import logging
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from blake3 import blake3
+
+# Load generator untuk API: upload, check dan download dengan concurrency, arrival rate dan
+# campuran ukuran payload yang bisa diatur. Setiap worker thread memakai requests.Session sendiri
+# (keep-alive), berbeda dengan script test_performance_*.py yang mengirim request satu per satu.
+#
+#   python Test/load_generator.py --url http://127.0.0.1:8080 --concurrency 32 --duration 60
+#   python Test/load_generator.py --local --rate 200 --mix upload=1,check=2,download=1 --sizes 4K=3,1M=1
+#
+# Closed loop (default): --concurrency workers each send the next request as soon as the previous one
+# finishes. Open loop (--rate): requests arrive as a Poisson process at that rate regardless of how fast
+# the server answers, and latency is counted from the scheduled arrival, so time spent queued behind
+# busy workers is included instead of hidden (coordinated omission).
+#
+# --local serves gcp_app.py in this process with the GCS/Firestore stand-ins from local_backends.py.
+# The server then shares the interpreter with the generator; to size a deployment run the app the way
+# it is deployed (gunicorn, container) on this machine and point --url at it.
+
+KEY = "10c9a7fdfdd3ade1025895293e0b9412"
+OPERATIONS = ("upload", "check", "download")
+MODES = ("regular", "keyed", "derive_keyed")
+
+UPLOAD_ROUTES = {
+    "regular": "/upload-regular-hash",
+    "keyed": "/upload-keyed-hash",
+    "derive_keyed": "/upload-derive-keyed-hash",
+}
+CHECK_ROUTES = {
+    "regular": "/check-regular-hash/",
+    "keyed": "/check-keyed-hash/",
+    "derive_keyed": "/check-derive-keyed-hash/",
+}
+
+PERCENTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99), ("p999", 0.999))
+# Uploads per (size, mode) done before the run, so check and download have objects from the start
+SEED_UPLOADS = 2
+# Objects remembered for check/download; older ones are dropped
+KNOWN_OBJECTS = 4096
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper().rstrip("IB")
+    if text[-1:] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+# "upload=1,check=2" atau "4K=3,1M" (tanpa bobot: 1) -> {nama: bobot}
+def parse_weights(text: str, parse_name=str) -> dict:
+    weights = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        weights[parse_name(name.strip())] = float(weight) if weight else 1.0
+    if not weights or any(weight < 0 for weight in weights.values()) or not sum(weights.values()):
+        raise ValueError(f"invalid weights: {text!r}")
+    return weights
+
+# Persentil nearest-rank dari sampel yang sudah diurutkan
+def percentile(ordered: list, fraction: float) -> float:
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+# Payload dasar per ukuran dari BLAKE3 XOF. Unless reused, every upload gets a fresh 16-byte prefix so
+# it is stored as a new object rather than deduplicated against an earlier one.
+class Payloads:
+    def __init__(self, sizes, unique: bool = True):
+        self.unique = unique
+        self._base = {size: blake3(b"blake3-api load payload").digest(length=size) for size in sizes}
+
+    def get(self, size: int) -> bytes:
+        if not self.unique:
+            return self._base[size]
+        prefix = os.urandom(min(16, size))
+        return prefix + self._base[size][len(prefix):]
+
+# Objek yang sudah diunggah: (hash_value, mode, file_name, size)
+class KnownObjects:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._objects = []
+        self._lock = threading.Lock()
+
+    def add(self, entry: tuple):
+        with self._lock:
+            self._objects.append(entry)
+            if len(self._objects) > self.max_entries:
+                del self._objects[:len(self._objects) - self.max_entries]
+
+    def pick(self, rng: random.Random):
+        with self._lock:
+            return rng.choice(self._objects) if self._objects else None
+
+# Sampel per request, dikelompokkan per jendela waktu (dari waktu selesai) untuk laporan berkala
+class Recorder:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.windows = {}
+        self._lock = threading.Lock()
+
+    # error: None, "http_<status>", "integrity" atau nama exception
+    def add(self, op: str, latency: float, nbytes: int, error):
+        index = int((time.perf_counter() - self.started) // self.interval)
+        with self._lock:
+            self.windows.setdefault(index, []).append((op, latency, nbytes, error))
+
+    def window(self, index: int) -> list:
+        with self._lock:
+            return list(self.windows.get(index, ()))
+
+    def all_samples(self) -> list:
+        with self._lock:
+            return [sample for index in sorted(self.windows) for sample in self.windows[index]]
+
+def summarize(samples: list, seconds: float) -> dict:
+    latencies = sorted(sample[1] for sample in samples)
+    errors = {}
+    for sample in samples:
+        if sample[3] is not None:
+            errors[sample[3]] = errors.get(sample[3], 0) + 1
+    summary = {
+        "requests": len(samples),
+        "errors": sum(errors.values()),
+        "error_rate": sum(errors.values()) / len(samples) if samples else 0,
+        "throughput_rps": len(samples) / seconds if seconds else None,
+        "throughput_MBps": sum(sample[2] for sample in samples) / seconds / 1e6 if seconds else None,
+    }
+    if latencies:
+        summary["latency_ms"] = {name: percentile(latencies, fraction) * 1e3 for name, fraction in PERCENTILES}
+        summary["latency_ms"]["mean"] = statistics.fmean(latencies) * 1e3
+        summary["latency_ms"]["max"] = latencies[-1] * 1e3
+    if errors:
+        summary["errors_by_kind"] = errors
+    return summary
+
+def format_line(label: str, summary: dict) -> str:
+    latency = summary.get("latency_ms")
+    text = f"{label:>12}  {summary['requests']:7d} req  {summary['throughput_rps']:9.1f} req/s  {summary['throughput_MBps']:9.2f} MB/s  err {summary['error_rate']:6.2%}"
+    if latency:
+        text += "  " + "  ".join(f"{name} {latency[name]:9.2f} ms" for name, _ in PERCENTILES)
+    return text
+
+class LoadGenerator:
+    def __init__(self, base_url: str, mix: dict, sizes: dict, modes: list, payloads: Payloads,
+                 recorder: Recorder, timeout: float, keepalive: bool = True, seed: int = None):
+        self.base_url = base_url.rstrip("/")
+        self.mix = mix
+        self.sizes = sizes
+        self.modes = modes
+        self.payloads = payloads
+        self.recorder = recorder
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.known = KnownObjects(KNOWN_OBJECTS)
+        self._local = threading.local()
+        self._seed = seed
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+
+    # Session dan RNG per worker thread
+    def _thread_state(self):
+        state = getattr(self._local, "state", None)
+        if state is None:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            if not self.keepalive:
+                session.headers["Connection"] = "close"
+            with self._counter_lock:
+                self._counter += 1
+                rng = random.Random(None if self._seed is None else self._seed * 1000003 + self._counter)
+            state = self._local.state = (session, rng)
+        return state
+
+    def _next_name(self) -> str:
+        with self._counter_lock:
+            self._counter += 1
+            return f"load-{os.getpid()}-{self._counter}.bin"
+
+    def upload(self, session, rng, size: int = None, mode: str = None):
+        size = size if size is not None else rng.choices(list(self.sizes), weights=list(self.sizes.values()))[0]
+        mode = mode or rng.choice(self.modes)
+        file_name = self._next_name()
+        data = {"key": KEY} if mode == "keyed" else None
+        response = session.post(self.base_url + UPLOAD_ROUTES[mode], files={"file": (file_name, self.payloads.get(size))},
+                                data=data, timeout=self.timeout)
+        if response.status_code != 200:
+            return size, f"http_{response.status_code}"
+        self.known.add((response.json()["hash_value"], mode, file_name, size))
+        return size, None
+
+    def check(self, session, rng, entry):
+        hash_value, mode, file_name, _ = entry
+        data = {"key": KEY} if mode == "keyed" else {"context": f"{file_name} derive"} if mode == "derive_keyed" else None
+        response = session.get(self.base_url + CHECK_ROUTES[mode] + hash_value, data=data, timeout=self.timeout)
+        if response.status_code != 200:
+            return 0, f"http_{response.status_code}"
+        return 0, None if response.json().get("Status") == "Success" else "integrity"
+
+    def download(self, session, rng, entry):
+        hash_value, _, _, size = entry
+        with session.get(f"{self.base_url}/download/{hash_value}", stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                return 0, f"http_{response.status_code}"
+            received = sum(len(chunk) for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE))
+        return received, None if received == size else "short_body"
+
+    # Satu request; latency dihitung dari scheduled (perf_counter) sampai respons selesai dibaca
+    def request(self, scheduled: float):
+        session, rng = self._thread_state()
+        op = rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        entry = self.known.pick(rng) if op != "upload" else None
+        if op != "upload" and entry is None:
+            op = "upload"
+        try:
+            if op == "upload":
+                nbytes, error = self.upload(session, rng)
+            elif op == "check":
+                nbytes, error = self.check(session, rng, entry)
+            else:
+                nbytes, error = self.download(session, rng, entry)
+        except (requests.RequestException, ValueError) as e:
+            nbytes, error = 0, type(e).__name__
+        self.recorder.add(op, time.perf_counter() - scheduled, nbytes, error)
+
+    # Upload awal (tidak diukur) untuk setiap (ukuran, mode)
+    def seed(self, uploads: int):
+        session, rng = self._thread_state()
+        for size in self.sizes:
+            for mode in self.modes:
+                for _ in range(uploads):
+                    _, error = self.upload(session, rng, size, mode)
+                    if error is not None:
+                        raise RuntimeError(f"seed upload ({mode}, {size} bytes) failed: {error}")
+
+def run_closed_loop(generator: LoadGenerator, concurrency: int, duration: float):
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            generator.request(time.perf_counter())
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+# Poisson arrivals at rate per second; at most concurrency requests run at once, the rest wait in the pool queue
+def run_open_loop(generator: LoadGenerator, rate: float, concurrency: int, duration: float, seed: int = None):
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    scheduled = start
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            scheduled += rng.expovariate(rate)
+            if scheduled - start >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(generator.request, scheduled)
+
+# Mencetak ringkasan setiap jendela yang sudah lewat sampai stop di-set
+def report_windows(recorder: Recorder, stop: threading.Event):
+    index = 0
+    while True:
+        wait = recorder.started + (index + 1) * recorder.interval - time.perf_counter()
+        if stop.wait(max(wait, 0)):
+            return
+        summary = summarize(recorder.window(index), recorder.interval)
+        print(format_line(f"{index * recorder.interval:.0f}s", summary), file=sys.stderr)
+        index += 1
+
+# gcp_app.py (atau app lain) dengan backend lokal, dilayani werkzeug multi-thread di port bebas
+def start_local_server(app_path: str, state_dir: str):
+    from werkzeug.serving import make_server
+    from local_backends import load_app
+    module = load_app(app_path, state_dir)
+    # Access log per request would bury the window reports
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.port}"
+
+def build_report(recorder: Recorder, elapsed: float, config: dict) -> dict:
+    samples = recorder.all_samples()
+    windows = []
+    for index in sorted(recorder.windows):
+        span = min(recorder.interval, elapsed - index * recorder.interval)
+        if span > 0:
+            windows.append({"start_s": index * recorder.interval, **summarize(recorder.window(index), span)})
+    by_op = {}
+    for op in OPERATIONS:
+        op_samples = [sample for sample in samples if sample[0] == op]
+        if op_samples:
+            by_op[op] = summarize(op_samples, elapsed)
+    return {
+        "meta": {
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": config,
+        "total": summarize(samples, elapsed),
+        "by_op": by_op,
+        "windows": windows
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the upload, check and download routes")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="base URL of a running instance, e.g. http://127.0.0.1:8080")
+    target.add_argument("--local", action="store_true", help="serve the app in-process with local GCS/Firestore")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gcp_app.py"),
+                        help="app served by --local (default: gcp_app.py)")
+    parser.add_argument("--state-dir", default=None, help="where --local keeps its bucket and database (default: system temp)")
+    parser.add_argument("--concurrency", type=int, default=8, help="workers (closed loop) or max requests in flight (open loop)")
+    parser.add_argument("--rate", type=float, help="open loop: mean arrivals per second (Poisson)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--mix", default="upload=1,check=1,download=1", help="operation weights")
+    parser.add_argument("--sizes", default="1K=4,64K=2,1M=1", help="upload size weights")
+    parser.add_argument("--modes", default=",".join(MODES), help="hash modes used for uploads")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds per reporting window")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument("--no-keepalive", action="store_true", help="open a new connection for every request")
+    parser.add_argument("--reuse-payloads", action="store_true", help="upload identical bytes per size (exercises deduplication)")
+    parser.add_argument("--seed", type=int, help="RNG seed for operation, size and arrival choices")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_weights(args.mix)
+        sizes = parse_weights(args.sizes, parse_size)
+    except ValueError as e:
+        parser.error(str(e))
+    unknown = [op for op in mix if op not in OPERATIONS] + [mode for mode in args.modes.split(",") if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown operations or modes: {', '.join(unknown)}")
+    if args.concurrency < 1 or args.duration <= 0 or args.interval <= 0 or (args.rate is not None and args.rate <= 0):
+        parser.error("--concurrency, --duration, --interval and --rate must be positive")
+
+    server = None
+    state = None
+    base_url = args.url
+    if args.local:
+        state = tempfile.TemporaryDirectory(dir=args.state_dir)
+        server, base_url = start_local_server(args.app, state.name)
+
+    try:
+        recorder = Recorder(args.interval)
+        generator = LoadGenerator(base_url, mix, sizes, args.modes.split(","), Payloads(sizes, not args.reuse_payloads),
+                                  recorder, args.timeout, keepalive=not args.no_keepalive, seed=args.seed)
+        if mix.get("check") or mix.get("download"):
+            generator.seed(SEED_UPLOADS)
+
+        stop = threading.Event()
+        recorder.started = time.perf_counter()
+        reporter = threading.Thread(target=report_windows, args=(recorder, stop), daemon=True)
+        reporter.start()
+        if args.rate:
+            run_open_loop(generator, args.rate, args.concurrency, args.duration, args.seed)
+        else:
+            run_closed_loop(generator, args.concurrency, args.duration)
+        elapsed = time.perf_counter() - recorder.started
+        stop.set()
+        reporter.join()
+    finally:
+        if server is not None:
+            server.shutdown()
+            state.cleanup()
+
+    config = {
+        "url": args.url or "local",
+        "loop": "open" if args.rate else "closed",
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": mix,
+        "sizes": sizes,
+        "modes": args.modes.split(","),
+        "keepalive": not args.no_keepalive,
+        "unique_payloads": not args.reuse_payloads
+    }
+    report = build_report(recorder, elapsed, config)
+    for op, summary in report["by_op"].items():
+        print(format_line(op, summary), file=sys.stderr)
+    print(format_line("total", report["total"]), file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+import datetime
+import importlib.util
+import json
+import os
+import sys
+import threading
+import urllib.parse
+import uuid
+from unittest import mock
+import requests
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1 import transforms
+
+# Pengganti GCS dan Firestore berbasis filesystem untuk benchmark dan load test offline.
+# Hanya bagian API yang dipakai aplikasi yang ditiru: objek disimpan sebagai file di
+# <root>/gcs/<bucket>/, dokumen sebagai JSON di <root>/firestore/<collection>/.
+
+# Penulis blob ("wb"): ditulis ke file sementara, lalu di-rename saat close seperti finalisasi upload
+class LocalBlobWriter:
+    def __init__(self, blob):
+        self._blob = blob
+        self._partial = f"{blob._path}.{uuid.uuid4().hex}.partial"
+        self._file = open(self._partial, "wb")
+
+    def write(self, data):
+        return self._file.write(data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        os.replace(self._partial, self._blob._path)
+        self._blob.reload()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._partial)
+
+class LocalBlob:
+    def __init__(self, bucket, name: str):
+        self.bucket = bucket
+        self.name = name
+        self.size = None
+        self.etag = None
+        self.generation = None
+        self.updated = None
+        self.content_type = None
+
+    @property
+    def _path(self) -> str:
+        return os.path.join(self.bucket._root, urllib.parse.quote(self.name, safe=""))
+
+    def exists(self, **kwargs) -> bool:
+        return os.path.exists(self._path)
+
+    def reload(self, **kwargs):
+        try:
+            st = os.stat(self._path)
+        except FileNotFoundError:
+            raise NotFound(self.name)
+        self.size = st.st_size
+        self.generation = st.st_mtime_ns
+        self.etag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+        self.updated = datetime.datetime.fromtimestamp(st.st_mtime, tz=datetime.timezone.utc)
+        self.content_type = "application/octet-stream"
+
+    def open(self, mode: str = "rb", chunk_size: int = None, **kwargs):
+        if mode == "wb":
+            return LocalBlobWriter(self)
+        return open(self._path, mode)
+
+    def upload_from_string(self, data, **kwargs):
+        with self.open("wb") as writer:
+            writer.write(data.encode() if isinstance(data, str) else data)
+
+    # end inklusif, seperti ranged read GCS
+    def download_as_bytes(self, start: int = None, end: int = None, **kwargs) -> bytes:
+        try:
+            with open(self._path, "rb") as f:
+                f.seek(start or 0)
+                return f.read() if end is None else f.read(end - (start or 0) + 1)
+        except FileNotFoundError:
+            raise NotFound(self.name)
+
+    def delete(self, **kwargs):
+        os.remove(self._path)
+
+class LocalBucket:
+    def __init__(self, root: str, name: str):
+        self.name = name
+        self._root = os.path.join(root, "gcs", name)
+        os.makedirs(self._root, exist_ok=True)
+
+    def blob(self, name: str, **kwargs):
+        return LocalBlob(self, name)
+
+    def get_blob(self, name: str, **kwargs):
+        blob = LocalBlob(self, name)
+        if not blob.exists():
+            return None
+        blob.reload()
+        return blob
+
+class LocalStorageClient:
+    root = None
+
+    def __init__(self, *args, **kwargs):
+        # GcsPool memasang HTTPAdapter-nya di session ini
+        self._http = requests.Session()
+
+    def bucket(self, name: str):
+        return LocalBucket(type(self).root, name)
+
+# Menerapkan set/update termasuk transform Firestore yang dipakai aplikasi
+def apply_write(current: dict, data: dict) -> dict:
+    result = dict(current)
+    for field, value in data.items():
+        if isinstance(value, transforms.ArrayUnion):
+            items = list(result.get(field) or [])
+            items += [item for item in value.values if item not in items]
+            result[field] = items
+        elif value is transforms.SERVER_TIMESTAMP:
+            result[field] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        else:
+            result[field] = value
+    return result
+
+class LocalSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return None if self._data is None else dict(self._data)
+
+_write_lock = threading.Lock()
+
+class LocalDocument:
+    def __init__(self, collection, doc_id: str = None):
+        self._collection = collection
+        self.id = doc_id or uuid.uuid4().hex[:20]
+
+    @property
+    def _path(self) -> str:
+        return os.path.join(self._collection._root, urllib.parse.quote(self.id, safe="") + ".json")
+
+    def _read(self):
+        try:
+            with open(self._path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, data: dict):
+        with open(self._path, "w") as f:
+            json.dump(data, f, default=str)
+
+    def get(self, **kwargs):
+        return LocalSnapshot(self, self._read())
+
+    def set(self, data: dict, merge: bool = False, **kwargs):
+        with _write_lock:
+            self._write(apply_write((self._read() or {}) if merge else {}, data))
+
+    def update(self, data: dict, **kwargs):
+        with _write_lock:
+            current = self._read()
+            if current is None:
+                raise NotFound(self.id)
+            self._write(apply_write(current, data))
+
+    def delete(self, **kwargs):
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+
+class LocalCollection:
+    def __init__(self, root: str, name: str):
+        self._root = os.path.join(root, "firestore", name)
+        os.makedirs(self._root, exist_ok=True)
+
+    def document(self, doc_id: str = None):
+        return LocalDocument(self, doc_id)
+
+    # Semua dokumen koleksi, urut nama file (dipakai migrate_file_metadata.py)
+    def stream(self, **kwargs):
+        for entry in sorted(os.listdir(self._root)):
+            if entry.endswith(".json"):
+                yield self.document(urllib.parse.unquote(entry[:-len(".json")])).get()
+
+class LocalBatch:
+    def __init__(self):
+        self._writes = []
+
+    def set(self, ref, data: dict, merge: bool = False):
+        self._writes.append(lambda: ref.set(data, merge=merge))
+
+    def update(self, ref, data: dict):
+        self._writes.append(lambda: ref.update(data))
+
+    def delete(self, ref):
+        self._writes.append(ref.delete)
+
+    def commit(self, **kwargs):
+        for write in self._writes:
+            write()
+        self._writes = []
+
+class LocalFirestoreClient:
+    root = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def collection(self, name: str):
+        return LocalCollection(type(self).root, name)
+
+    def get_all(self, refs, **kwargs):
+        for ref in refs:
+            yield ref.get()
+
+    def batch(self):
+        return LocalBatch()
+
+# Mengganti storage.Client dan firestore.Client dengan versi lokal di bawah root
+def patch_clients(root: str):
+    LocalStorageClient.root = root
+    LocalFirestoreClient.root = root
+    patches = [
+        mock.patch("google.cloud.storage.Client", LocalStorageClient),
+        mock.patch("google.cloud.firestore.Client", LocalFirestoreClient),
+    ]
+    for patch in patches:
+        patch.start()
+    return patches
+
+# Memuat modul aplikasi (gcp_app.py, Test/gcp_app_sha256.py, ...) dengan backend lokal di root
+def load_app(path: str, root: str):
+    patch_clients(root)
+    name = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,268 @@
+from blake3 import blake3
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from blake3_tree import CHUNK_END, CHUNK_START, ROOT, compress, mode_params
+
+# Mesin pencarian second preimage untuk test_second_preimage_*.py.
+#
+# Candidates are every byte string of 1, 2, ... MAX_CANDIDATE_BYTES bytes in order (the distinct values
+# the old generate_incremental_bits() walked, without its repeats). All of them fit one BLAKE3 block,
+# so a candidate costs one compression: workers hash them SEARCH_LANES at a time with the numpy
+# compress() of blake3_tree.py, keep the lanes whose first output word matches the target, and confirm
+# those with blake3-py. The space is sharded into units of SEARCH_UNIT_CANDIDATES handed to a process
+# pool; finished units move a frontier that is checkpointed, so a stopped search resumes where it left off.
+
+MAX_CANDIDATE_BYTES = 8
+SEARCH_UNIT_CANDIDATES = int(os.environ.get("SEARCH_UNIT_CANDIDATES", 1 << 20))
+# Candidates per compress() call; numpy is fastest when one batch stays in cache
+SEARCH_LANES = int(os.environ.get("SEARCH_LANES", 4096))
+# Seconds between checkpoint writes
+SEARCH_CHECKPOINT_INTERVAL = float(os.environ.get("SEARCH_CHECKPOINT_INTERVAL", 30))
+MAX_TIME = 30 * 60
+
+_worker = {}
+
+# Message words (16, count) untuk kandidat start..start+count-1 sepanjang length byte (big-endian, seperti to_bytes)
+def candidate_words(length: int, start: int, count: int) -> np.ndarray:
+    values = np.arange(start, start + count, dtype=np.uint64) << np.uint64(8 * (MAX_CANDIDATE_BYTES - length))
+    words = values.astype(">u8").view("<u4").reshape(count, 2)
+    m = np.zeros((16, count), dtype=np.uint32)
+    m[0] = words[:, 0]
+    m[1] = words[:, 1]
+    return m
+
+def candidate_bytes(length: int, value: int) -> bytes:
+    return value.to_bytes(length, "big")
+
+def blake3_digest(data: bytes, hash_type: str, key_bytes: bytes = None, context: str = None) -> bytes:
+    if hash_type == "keyed":
+        return blake3(data, key=key_bytes).digest()
+    if hash_type == "derive_keyed":
+        return blake3(data, derive_key_context=context).digest()
+    return blake3(data).digest()
+
+# True bila prefix_bits bit pertama digest sama dengan target
+def prefix_matches(digest: bytes, target: bytes, prefix_bits: int) -> bool:
+    shift = 8 * len(target) - prefix_bits
+    return int.from_bytes(digest, "big") >> shift == int.from_bytes(target, "big") >> shift
+
+# First output word of the target and the mask of its bits that fall inside the prefix
+def _first_word_filter(target: bytes, prefix_bits: int):
+    bits = min(prefix_bits, 32)
+    mask = int.from_bytes((((1 << bits) - 1) << (32 - bits)).to_bytes(4, "big"), "little")
+    return np.uint32(int.from_bytes(target[:4], "little") & mask), np.uint32(mask)
+
+def _init_worker(spec):
+    hash_type, key_bytes, context, target_message, target_hash, prefix_bits = spec
+    key_words, flags = mode_params(hash_type, key_bytes, context)
+    target = bytes.fromhex(target_hash)
+    word, mask = _first_word_filter(target, prefix_bits)
+    _worker.update(spec=spec, key_words=key_words, flags=flags | CHUNK_START | CHUNK_END | ROOT,
+                   target=target, word=word, mask=mask)
+
+# Satu unit kerja: (length, start, count). Mengembalikan (count, kandidat yang cocok, detik kerja)
+def _search_unit(task):
+    length, start, count = task
+    hash_type, key_bytes, context, target_message, target_hash, prefix_bits = _worker["spec"]
+    started = time.perf_counter()
+    cv = np.repeat(_worker["key_words"][:, None], min(SEARCH_LANES, count), axis=1)
+    matches = []
+    for offset in range(0, count, SEARCH_LANES):
+        lanes = min(SEARCH_LANES, count - offset)
+        state = compress(cv[:, :lanes], candidate_words(length, start + offset, lanes), 0, length, _worker["flags"])
+        for lane in np.flatnonzero((state[0] & _worker["mask"]) == _worker["word"]):
+            candidate = candidate_bytes(length, start + offset + int(lane))
+            digest = blake3_digest(candidate, hash_type, key_bytes, context)
+            if candidate != target_message and prefix_matches(digest, _worker["target"], prefix_bits):
+                matches.append(candidate.hex())
+    return count, matches, time.perf_counter() - started
+
+# Unit kerja berikutnya mulai dari posisi (length, value)
+def _next_unit(length: int, value: int):
+    if value >= 256 ** length:
+        length, value = length + 1, 0
+    if length > MAX_CANDIDATE_BYTES:
+        return None
+    return length, value, min(SEARCH_UNIT_CANDIDATES, 256 ** length - value)
+
+# Second preimage search over one target. Progress (the frontier below which every candidate has been
+# hashed, totals and matches) lives in a JSON checkpoint; a search started with the same checkpoint and
+# target continues from its frontier, redoing at most the units that were in flight when it stopped.
+class SecondPreimageSearch:
+    def __init__(self, target_message: bytes, target_hash: str, hash_type: str = "regular", key_bytes: bytes = None,
+                 context: str = None, prefix_bits: int = 256, processes: int = None, checkpoint_path: str = None):
+        if hash_type == "keyed" and (key_bytes is None or len(key_bytes) != 32):
+            raise ValueError("keyed search needs a 32-byte key")
+        if hash_type == "derive_keyed" and not context:
+            raise ValueError("derive_keyed search needs a context")
+        if not 1 <= prefix_bits <= 256:
+            raise ValueError("prefix_bits must be between 1 and 256")
+        self.spec = (hash_type, key_bytes, context, target_message, target_hash.lower(), prefix_bits)
+        self.processes = max(1, processes or os.cpu_count() or 1)
+        self.checkpoint_path = checkpoint_path
+        self.frontier = (1, 0)
+        self.hashed = 0
+        self.elapsed = 0.0
+        self.worker_seconds = 0.0
+        self.matches = []
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self._load()
+
+    def _identity(self) -> dict:
+        hash_type, key_bytes, context, target_message, target_hash, prefix_bits = self.spec
+        return {"hash_type": hash_type, "key": key_bytes.hex() if key_bytes else None, "context": context,
+                "target_message": target_message.hex(), "target_hash": target_hash, "prefix_bits": prefix_bits}
+
+    def _load(self):
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        if state["search"] != self._identity():
+            raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to a different search")
+        self.frontier = tuple(state["frontier"])
+        self.hashed = state["hashed"]
+        self.elapsed = state["elapsed"]
+        self.worker_seconds = state["worker_seconds"]
+        self.matches = state["matches"]
+
+    # Ditulis ke file sementara lalu os.replace, supaya checkpoint tidak pernah setengah jadi
+    def save(self):
+        if not self.checkpoint_path:
+            return
+        state = {"search": self._identity(), "frontier": list(self.frontier), "hashed": self.hashed,
+                 "elapsed": self.elapsed, "worker_seconds": self.worker_seconds, "matches": self.matches}
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.checkpoint_path)
+
+    # Search for up to max_time seconds (this run), until the space is exhausted, or until the first
+    # match when stop_on_match. progress(stats) is called after each checkpoint.
+    def run(self, max_time: float = MAX_TIME, stop_on_match: bool = True, progress=None) -> dict:
+        started = time.perf_counter()
+        elapsed_before = self.elapsed
+        last_checkpoint = started
+        in_flight = deque()
+        done = {}
+        position = self.frontier
+        with ProcessPoolExecutor(self.processes, mp_context=get_context("fork"), initializer=_init_worker,
+                                 initargs=(self.spec,)) as executor:
+            while True:
+                stopping = (time.perf_counter() - started >= max_time or (stop_on_match and self.matches))
+                while not stopping and len(in_flight) < 2 * self.processes:
+                    unit = _next_unit(*position)
+                    if unit is None:
+                        break
+                    in_flight.append((unit, executor.submit(_search_unit, unit)))
+                    position = (unit[0], unit[1] + unit[2])
+                if not in_flight:
+                    break
+                wait([future for _, future in in_flight], return_when=FIRST_COMPLETED)
+                for unit, future in in_flight:
+                    if future.done() and unit not in done:
+                        done[unit] = future.result()
+                # Only a contiguous run of finished units moves the frontier
+                while in_flight and in_flight[0][0] in done:
+                    unit, _ = in_flight.popleft()
+                    count, matches, seconds = done.pop(unit)
+                    self.hashed += count
+                    self.worker_seconds += seconds
+                    self.matches.extend(m for m in matches if m not in self.matches)
+                    self.frontier = (unit[0], unit[1] + unit[2])
+                self.elapsed = elapsed_before + time.perf_counter() - started
+                if time.perf_counter() - last_checkpoint >= SEARCH_CHECKPOINT_INTERVAL:
+                    last_checkpoint = time.perf_counter()
+                    self.save()
+                    if progress:
+                        progress(self.stats())
+        self.elapsed = elapsed_before + time.perf_counter() - started
+        self.save()
+        result = self.stats()
+        result["run_seconds"] = time.perf_counter() - started
+        return result
+
+    def stats(self) -> dict:
+        length, value = self.frontier
+        return {
+            "hashed": self.hashed,
+            "frontier": {"length": length, "value": value},
+            "exhausted": _next_unit(length, value) is None,
+            "matches": list(self.matches),
+            "elapsed": self.elapsed,
+            "processes": self.processes,
+            "hashes_per_second": self.hashed / self.elapsed if self.elapsed else None,
+            "hashes_per_second_per_core": self.hashed / self.worker_seconds if self.worker_seconds else None
+        }
+
+# Function to get response from the server
+def get_responds(url):
+    response = requests.post(url)
+    try:
+        response_json = response.json()
+    except ValueError:
+        print("Failed to parse JSON response:", response.text)
+        response_json = None
+    return response_json
+
+def _print_progress(stats: dict):
+    frontier = stats["frontier"]
+    print(f"{stats['hashed']} hashed, at {frontier['length']}-byte candidate {frontier['value']}, "
+          f"{stats['hashes_per_second']:.0f}/s ({stats['hashes_per_second_per_core']:.0f}/s per core)")
+
+# CLI bersama untuk test_second_preimage_regular/_keyed/_derive_keyed.py. The target comes from the
+# server's test endpoint, or from --message (and --key/--context) to search offline.
+def run_cli(hash_type: str, default_url: str):
+    parser = argparse.ArgumentParser(description=f"Second preimage search against {hash_type} BLAKE3")
+    parser.add_argument("--url", default=default_url)
+    parser.add_argument("--message", help="search offline for this message instead of asking the server")
+    if hash_type == "keyed":
+        parser.add_argument("--key", help="32-byte key (with --message)")
+    if hash_type == "derive_keyed":
+        parser.add_argument("--context", help="derive_key context (with --message)")
+    parser.add_argument("--max-time", type=float, default=MAX_TIME, help="seconds for this run")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--prefix-bits", type=int, default=256, help="only match the first bits of the digest")
+    parser.add_argument("--checkpoint", help="resume from and save progress to this JSON file")
+    parser.add_argument("--all-matches", action="store_true", help="keep searching after the first match")
+    args = parser.parse_args()
+
+    if args.message is not None:
+        response = {"message": args.message, "key": getattr(args, "key", None), "context": getattr(args, "context", None)}
+    else:
+        response = get_responds(args.url)
+        if response is None:
+            sys.exit(1)
+    message = response["message"].encode("utf-8")
+    key_bytes = response["key"].encode("utf-8") if hash_type == "keyed" and response.get("key") else None
+    context = response.get("context") if hash_type == "derive_keyed" else None
+    hash_value = response.get("hash_value") or blake3_digest(message, hash_type, key_bytes, context).hex()
+
+    try:
+        search = SecondPreimageSearch(message, hash_value, hash_type, key_bytes, context, args.prefix_bits,
+                                      args.processes, args.checkpoint)
+    except ValueError as e:
+        parser.error(str(e))
+    if search.hashed:
+        print(f"Resuming after {search.hashed} candidates")
+    result = search.run(args.max_time, not args.all_matches, _print_progress)
+    print(f"Hashed {result['hashed']} candidates in {result['elapsed']:.1f} s: {result['hashes_per_second']:.0f}/s, "
+          f"{result['hashes_per_second_per_core']:.0f}/s per core on {result['processes']} processes")
+    if result["matches"]:
+        for match in result["matches"]:
+            print(f"Second preimage for '{response['message']}' ({args.prefix_bits} bits) is '{match}' (hex)")
+    elif result["exhausted"]:
+        print(f"No second preimage among candidates up to {MAX_CANDIDATE_BYTES} bytes")
+    else:
+        print(f"No second preimage found within the given time limit. Total attempts: {result['hashed']}")
@@ -1,94 +1,135 @@
-import requests
-import sys
+import argparse
+import json
 import os
+import time
+import numpy as np
+from avalanche_engine import (Blake3FlipEngine, GenericFlipEngine, blake3_function, parallel_flip_counts,
+                              parallel_sac_bic, summarize_flips)
 
-# URL endpoint
-url_upload = "http://34.101.237.78:8080/upload-derive-keyed-hash"
+# Uji avalanche lokal: setiap bit file dibalik satu per satu dan jumlah bit digest yang berubah dihitung.
+# Variants are hashed in-process across a process pool (avalanche_engine.py) instead of being written
+# to flipped_bit_<i>.bin and uploaded one request per bit.
+#
+#   python Test/test_avalanche.py data.bin
+#   python Test/test_avalanche.py data.bin --hash-type keyed --sample 100000 --output avalanche.json
+#
+# --sac-bic measures the Strict Avalanche and Bit Independence Criteria over random messages instead of
+# one file: the input-bit x output-bit flip probability matrix and the output-bit correlation matrix,
+# for BLAKE3 or the SHA-256/SHA-3/BLAKE2 apps' constructions. Matrices go to --matrices (.npz) and,
+# rounded, into the --output JSON, both ready to plot as heatmaps.
+#
+#   python Test/test_avalanche.py --sac-bic --algorithm sha256 --hash-type keyed --messages 20000 --matrices sac_bic.npz
 
-# Function to read file and return its content as binary string
-def read_file_as_binary(file_path):
-    with open(file_path, 'rb') as file:
-        binary_content = file.read()
-    # Convert the file content to binary string
-    binary_string = ''.join(format(byte, '08b') for byte in binary_content)
-    return binary_string
+KEY = "10c9a7fdfdd3ade1025895293e0b9412"
+# Up to this size rehashing the whole variant with blake3-py beats the numpy tree engine
+GENERIC_ENGINE_MAX_SIZE = 8 * 1024
 
-# Function to write binary string back to file
-def write_binary_to_file(binary_string, file_path):
-    with open(file_path, 'wb') as file:
-        # Split binary string into chunks of 8 bits and convert to bytes
-        byte_array = bytearray(int(binary_string[i:i+8], 2) for i in range(0, len(binary_string), 8))
-        file.write(byte_array)
+def build_engine(engine: str, data: bytes, hash_type: str, key_bytes: bytes, context):
+    if engine == "auto":
+        engine = "generic" if len(data) <= GENERIC_ENGINE_MAX_SIZE else "tree"
+    if engine == "tree":
+        return Blake3FlipEngine, (data, hash_type, key_bytes, context)
+    return _generic_engine, (data, hash_type, key_bytes, context)
 
-# Function to flip bit at a specific index in binary string
-def flip_bit(binary_string, bit_index):
-    flipped_bit = '1' if binary_string[bit_index] == '0' else '0'
-    return binary_string[:bit_index] + flipped_bit + binary_string[bit_index+1:]
+def _generic_engine(data: bytes, hash_type: str, key_bytes: bytes, context):
+    return GenericFlipEngine(data, blake3_function(hash_type, key_bytes, context))
 
-# Function to upload file and get hash response
-def upload_file_and_get_hash(file_path, key):
-    with open(file_path, 'rb') as file:
-        files = {'file': file}
-        data = {'key': key}
-        response = requests.post(url_upload, files=files, data=data)
-        response_json = response.json()
-        if 'hash_value' in response_json:
-            return response_json['hash_value']
-        else:
-            raise ValueError("No hash_value in response")
+def run_sac_bic(args, key_bytes: bytes):
+    context = args.context or "sac-bic derive"
+    spec = (args.algorithm, args.hash_type, key_bytes, context, args.chunks)
+    started = time.perf_counter()
+    accumulator = parallel_sac_bic(spec, args.message_bytes, args.messages, args.processes, args.seed)
+    elapsed = time.perf_counter() - started
 
-# Function to count bit differences between two hash values
-def bit_difference_count(hash_1, hash_2):
-    if hash_1 is None or hash_2 is None:
-        raise ValueError("One or both hash values are None")
-    return bin(int(hash_1, 16) ^ int(hash_2, 16)).count('1')
+    summary = accumulator.summary()
+    summary.update({
+        "algorithm": args.algorithm,
+        "hash_type": args.hash_type,
+        "message_bytes": args.message_bytes,
+        "time_elapsed": elapsed,
+        "samples_per_second": accumulator.samples / elapsed if elapsed else None
+    })
+    print(f"{args.algorithm} {args.hash_type}: {summary['samples']} samples ({summary['messages']} messages x {summary['input_bits']} bits) in {elapsed:.2f} s")
+    print(f"SAC: mean {summary['sac']['mean']:.4f}, max |p - 0.5| {summary['sac']['max_abs_deviation']:.4f} "
+          f"(3 sigma {summary['sac']['three_sigma_bound']:.4f}), {summary['sac']['fraction_outside_bound']:.2%} of cells outside")
+    print(f"BIC: mean |r| {summary['bic']['mean_abs_correlation']:.4f}, max |r| {summary['bic']['max_abs_correlation']:.4f} "
+          f"(3 sigma {summary['bic']['three_sigma_bound']:.4f}), {summary['bic']['fraction_outside_bound']:.2%} of pairs outside")
+    if args.matrices:
+        np.savez_compressed(args.matrices, sac=accumulator.sac(), bic=accumulator.bic(), flips=accumulator.flips,
+                            pair_flips=accumulator.pair_flips, messages=accumulator.messages)
+    if args.output:
+        summary["sac_matrix"] = np.round(accumulator.sac(), 4).tolist()
+        summary["bic_matrix"] = np.round(accumulator.bic(), 4).tolist()
+        with open(args.output, "w") as f:
+            json.dump(summary, f)
 
-# Function to perform the avalanche test
-def avalanche_test(hash_ori, hash_mod):
-    # Calculate avalanche effect
-    d = bit_difference_count(hash_ori, hash_mod)
-    n = len(hash_ori) * 4  # Each hex digit represents 4 bits
-    
-    avalanche_effect = (d / n) * 100
-    return avalanche_effect
+def main():
+    parser = argparse.ArgumentParser(description="Local avalanche test over every bit of a file, or SAC/BIC analysis")
+    parser.add_argument("file_path", nargs="?")
+    parser.add_argument("--hash-type", default="derive_keyed", choices=("regular", "keyed", "derive_keyed"))
+    parser.add_argument("--key", default=KEY, help="32-byte key for keyed mode")
+    parser.add_argument("--context", help="derive_keyed context (default: '<file name> derive', as the API uses)")
+    parser.add_argument("--engine", default="auto", choices=("auto", "tree", "generic"))
+    parser.add_argument("--sample", type=int, help="test this many random bit positions instead of all")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--output", help="write the summary as JSON here")
+    analysis = parser.add_argument_group("SAC/BIC analysis")
+    analysis.add_argument("--sac-bic", action="store_true", help="SAC and BIC matrices over random messages")
+    analysis.add_argument("--algorithm", default="blake3", choices=("blake3", "sha256", "sha3", "blake2"))
+    analysis.add_argument("--messages", type=int, default=10000, help="random messages; samples = messages x input bits")
+    analysis.add_argument("--message-bytes", type=int, default=64)
+    analysis.add_argument("--chunks", type=int, default=os.cpu_count(), help="chunk count of the SHA apps (their server's CPU count)")
+    analysis.add_argument("--matrices", help="write the matrices and raw counts here (.npz)")
+    args = parser.parse_args()
 
-# Main function to perform flip bit mechanism and upload files
-def flip_bits_and_test_avalanche(file_path, key):
-    binary_string = read_file_as_binary(file_path)
-    binary_length = len(binary_string)
-    
-    # Upload original file and get hash
-    original_hash = upload_file_and_get_hash(file_path, key)
-    print(f"Original file hash: {original_hash}")
-    
-    avalanche_scores = []
+    key_bytes = args.key.encode("utf-8") if args.hash_type == "keyed" else None
+    if key_bytes is not None and len(key_bytes) != 32:
+        parser.error("key must be exactly 32 bytes long")
+    if args.sac_bic:
+        if args.messages < 1 or args.message_bytes < 1:
+            parser.error("--messages and --message-bytes must be positive")
+        try:
+            run_sac_bic(args, key_bytes)
+        except ValueError as e:
+            parser.error(str(e))
+        return
+    if args.file_path is None:
+        parser.error("file_path is required unless --sac-bic is given")
 
-    for i in range(binary_length):
-        # Flip bit at index i
-        flipped_binary_string = flip_bit(binary_string, i)
-        flipped_file_path = f"flipped_bit_{i+1}.bin"
-        write_binary_to_file(flipped_binary_string, flipped_file_path)
+    with open(args.file_path, "rb") as f:
+        data = f.read()
+    if not data:
+        parser.error("file is empty")
+    context = (args.context or f"{os.path.basename(args.file_path)} derive") if args.hash_type == "derive_keyed" else None
 
-        # Upload flipped file and get hash
-        flipped_hash = upload_file_and_get_hash(flipped_file_path, key)
-        print(f"Flipped bit at index {i} file hash: {flipped_hash}")
+    bit_count = len(data) * 8
+    positions = np.arange(bit_count, dtype=np.int64)
+    if args.sample and args.sample < bit_count:
+        positions = np.sort(np.random.default_rng(args.seed).choice(bit_count, size=args.sample, replace=False))
 
-        # Perform avalanche test
-        avalanche_score = avalanche_test(original_hash, flipped_hash)
-        avalanche_scores.append(avalanche_score)
-        print(f"Avalanche Effect for bit {i+1}: {avalanche_score:.2f}%")
+    factory, factory_args = build_engine(args.engine, data, args.hash_type, key_bytes, context)
+    print(f"Original file hash: {blake3_function(args.hash_type, key_bytes, context)(data).hex()}")
+    started = time.perf_counter()
+    counts = parallel_flip_counts(factory, factory_args, positions, args.processes)
+    elapsed = time.perf_counter() - started
 
-    # Calculate and print average avalanche effect
-    average_avalanche_effect = sum(avalanche_scores) / len(avalanche_scores)
-    print(f"Average Avalanche Effect: {average_avalanche_effect:.2f}%")
+    summary = summarize_flips(counts, 256)
+    summary.update({
+        "file": args.file_path,
+        "size": len(data),
+        "hash_type": args.hash_type,
+        "engine": factory.__name__,
+        "time_elapsed": elapsed,
+        "variants_per_second": len(positions) / elapsed if elapsed else None
+    })
+    print(f"Variants: {summary['variants']} of {bit_count} bits in {elapsed:.2f} s ({summary['variants_per_second']:.0f}/s)")
+    print(f"Flipped output bits: mean {summary['mean_flipped_bits']:.2f}, std {summary['std_flipped_bits']:.2f} "
+          f"(ideal {summary['expected_std_flipped_bits']:.2f}), min {summary['min_flipped_bits']}, max {summary['max_flipped_bits']}")
+    print(f"Average Avalanche Effect: {summary['average_avalanche_percent']:.2f}%")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python flip_bits_and_test_avalanche.py <file_path>")
-        sys.exit(1)
-    
-    input_file_path = sys.argv[1]
-
-    key = "10c9a7fdfdd3ade1025895293e0b9412"
-    flip_bits_and_test_avalanche(input_file_path, key)
-    print(read_file_as_binary(input_file_path))
\ No newline at end of file
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import statistics
+from collision_search import MAX_BITS, MIN_BITS, find_collision
+
+# Eksperimen collision BLAKE3 terpotong: parallel rho dengan distinguished points (collision_search.py)
+# over k-bit truncations of the regular, keyed and derive_keyed functions, several independent trials
+# per k. The mean steps to a collision over sqrt(pi * 2**k / 2) should come out near 1.
+#
+#   python Test/test_collision_truncated.py --bits 24,32,40,48 --trials 5
+#   python Test/test_collision_truncated.py --hash-type keyed --bits 56 --trials 1 --output keyed_56.json
+
+KEY = "9ce463671338a2a2966dd8470296daa5"
+CONTEXT = "blake3 2024-08-20 12:00:00 test second preimage"
+
+def main():
+    parser = argparse.ArgumentParser(description="Truncated BLAKE3 collision search with parallel rho")
+    parser.add_argument("--hash-type", default="all", choices=("all", "regular", "keyed", "derive_keyed"))
+    parser.add_argument("--bits", default="24,32,40", help=f"comma separated output sizes, {MIN_BITS}..{MAX_BITS}")
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--key", default=KEY, help="32-byte key for keyed mode")
+    parser.add_argument("--context", default=CONTEXT, help="derive_key context")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--dp-bits", type=int, help="distinguished point bits (default: from k and the table size)")
+    parser.add_argument("--lanes", type=int, help="walks per process (default: from k)")
+    parser.add_argument("--max-time", type=float, help="seconds per trial")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write every trial as JSON here")
+    args = parser.parse_args()
+
+    try:
+        bit_sizes = [int(b) for b in args.bits.split(",")]
+    except ValueError:
+        parser.error("--bits must be comma separated integers")
+    if any(not MIN_BITS <= b <= MAX_BITS for b in bit_sizes):
+        parser.error(f"--bits must be between {MIN_BITS} and {MAX_BITS}")
+    if len(args.key.encode("utf-8")) != 32:
+        parser.error("key must be exactly 32 bytes long")
+    specs = {
+        "regular": ("regular", None, None),
+        "keyed": ("keyed", args.key.encode("utf-8"), None),
+        "derive_keyed": ("derive_keyed", None, args.context)
+    }
+    hash_types = list(specs) if args.hash_type == "all" else [args.hash_type]
+
+    results = []
+    for hash_type in hash_types:
+        for bits in bit_sizes:
+            trials = []
+            for trial in range(args.trials):
+                result = find_collision(specs[hash_type], bits, trial, args.processes, args.dp_bits, args.lanes,
+                                        args.max_time, args.seed)
+                trials.append(result)
+                collision = result["collision"]
+                found = f"{collision['message_a']} / {collision['message_b']}" if collision else "no collision (time limit)"
+                print(f"{hash_type} k={bits} trial {trial}: {result['steps']} steps ({result['steps_over_expected']:.2f}x expected) "
+                      f"in {result['time_elapsed']:.1f} s, {result['steps_per_second_per_core']:.0f} steps/s per core, "
+                      f"{result['points']} points, table {result['table_bytes'] // 1024} KiB: {found}")
+            ratios = [r["steps_over_expected"] for r in trials if r["collision"]]
+            if ratios:
+                spread = f" (stdev {statistics.stdev(ratios):.2f})" if len(ratios) > 1 else ""
+                print(f"{hash_type} k={bits}: mean steps / sqrt(pi 2^k / 2) = {statistics.mean(ratios):.2f}{spread} over {len(ratios)} collisions")
+            results.extend(trials)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,8 @@
-import hashlib
-import requests
-from blake3 import blake3
-import time
+from preimage_search import run_cli
 
+# Second preimage search against the derive-keyed BLAKE3 test endpoint, sharded over all cores by preimage_search.py.
+#   python Test/test_second_preimage_derive_keyed.py --max-time 1800 --checkpoint derive_keyed_search.json
 url_test_preimage_attack = "http://34.101.126.135:8080/test-second-preimage-derive-keyed"
-MAX_TIME = 30 * 60  # Maksimum waktu dalam detik (30 menit)
 
-# Function to get response from the server
-def get_responds(url):
-    response = requests.post(url)
-    try:
-        response_json = response.json()
-    except ValueError:
-        print("Failed to parse JSON response:", response.text)
-        response_json = None
-    return response_json
-
-# Function to generate incremental bit sequences
-def generate_incremental_bits():
-    bit_length = 1
-    while True:
-        for value in range(2 ** bit_length):
-            yield value.to_bytes((bit_length + 7) // 8, 'big')
-        bit_length += 1
-
-# Function for second preimage attack on derive keyed BLAKE3 hash
-def second_preimage_attack_derive_keyed(target_data, target_hash, max_time=MAX_TIME):
-    start_time = time.time()
-    attempts = 0
-
-    for bit_sequence in generate_incremental_bits():
-        # Convert the bit_sequence to a string to use as the derive_key_context
-        derive_key_context = bit_sequence.hex()
-
-        hash_value = blake3(bit_sequence, derive_key_context=derive_key_context, max_threads=blake3.AUTO).digest()
-        attempts += 1
-
-        if hash_value == target_hash and bit_sequence != target_data:
-            return bit_sequence, attempts
-
-        # Check if the time limit has been reached
-        if time.time() - start_time >= max_time:
-            break
-    
-    return None, attempts
-
-# Get response from the server
-response = get_responds(url_test_preimage_attack)
-responds_message = response.get("message")
-responds_hash_value = response.get("hash_value")
-
-# Perform second preimage attack
-second_message, second_preimage_attempts = second_preimage_attack_derive_keyed(responds_message, responds_hash_value)
-if second_message:
-    print(f"Second preimage for '{responds_message}' with derive keyed hash is '{second_message}'")
-else:
-    print(f"No second preimage found within the given time limit. Total attempts: {second_preimage_attempts}")
+if __name__ == "__main__":
+    run_cli("derive_keyed", url_test_preimage_attack)
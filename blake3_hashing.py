@@ -0,0 +1,230 @@
+from blake3 import blake3
+from collections import deque
+from contextlib import nullcontext
+import os
+import threading
+import time
+
+# BLAKE3 hashing shared by gcp_app.py and gcp_app_async.py
+
+# Hash types served by the API
+HASH_TYPES = ("regular", "keyed", "derive_keyed")
+
+# Threads for mid-sized inputs; below SINGLE_THREAD_MAX hashing stays on the calling thread,
+# above LIMITED_THREADS_MAX blake3.AUTO is used. The size thresholds are replaced by calibrate().
+BLAKE3_LIMITED_THREADS = int(os.environ.get("BLAKE3_LIMITED_THREADS", min(4, os.cpu_count() or 1)))
+BLAKE3_SINGLE_THREAD_MAX = int(os.environ.get("BLAKE3_SINGLE_THREAD_MAX", 128 * 1024))
+BLAKE3_LIMITED_THREADS_MAX = int(os.environ.get("BLAKE3_LIMITED_THREADS_MAX", 4 * 1024 * 1024))
+BLAKE3_CALIBRATE = os.environ.get("BLAKE3_CALIBRATE", "1") == "1"
+# Input sizes timed by calibrate(), and the speed-up a wider mode needs before it is preferred
+BLAKE3_CALIBRATION_SIZES = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+BLAKE3_CALIBRATION_GAIN = 1.1
+# Hashing threads the whole process may run at once, shared by all concurrent requests
+BLAKE3_THREAD_BUDGET = int(os.environ.get("BLAKE3_THREAD_BUDGET", os.cpu_count() or 1))
+# Single-threaded hashes up to this size skip the scheduler: they finish faster than its lock round trip
+BLAKE3_UNSCHEDULED_MAX = int(os.environ.get("BLAKE3_UNSCHEDULED_MAX", 64 * 1024))
+
+# Kebijakan jumlah thread BLAKE3 berdasarkan ukuran input dan beban mesin.
+# Saat load average per CPU di atas 1, input besar dibatasi ke limited threads agar request
+# paralel tidak saling berebut core; di atas 2 semua hashing single-threaded.
+class ThreadingPolicy:
+    def __init__(self, single_thread_max: int, limited_threads_max: int, limited_threads: int):
+        self.single_thread_max = single_thread_max
+        self.limited_threads_max = limited_threads_max
+        self.limited_threads = limited_threads
+        self.calibration = None
+        self._cpu_count = os.cpu_count() or 1
+        self._load = 0.0
+        self._load_checked = 0.0
+        self._lock = threading.Lock()
+
+    # Load average 1 menit per CPU, dibaca paling sering sekali per detik
+    def load(self) -> float:
+        now = time.monotonic()
+        if now - self._load_checked >= 1:
+            try:
+                self._load = os.getloadavg()[0] / self._cpu_count
+            except OSError:
+                self._load = 0.0
+            self._load_checked = now
+        return self._load
+
+    # max_threads untuk input sebesar size byte (None: ukuran tidak diketahui)
+    def max_threads(self, size: int = None) -> int:
+        if self.limited_threads <= 1 or (size is not None and size <= self.single_thread_max):
+            return 1
+        load = self.load()
+        if load > 2:
+            return 1
+        if load > 1 or (size is not None and size <= self.limited_threads_max):
+            return self.limited_threads
+        return blake3.AUTO
+
+    # Micro-benchmark at worker start: time single, limited and AUTO hashing per size. Each threshold
+    # becomes the largest size where the wider mode did not win by BLAKE3_CALIBRATION_GAIN.
+    def calibrate(self, sizes=BLAKE3_CALIBRATION_SIZES, repeats: int = 3) -> dict:
+        started = time.perf_counter()
+        modes = {"single": 1, "limited": self.limited_threads, "auto": blake3.AUTO}
+        timings = []
+        for size in sizes:
+            data = bytes(size)
+            best = {}
+            for mode, threads in modes.items():
+                best[mode] = float("inf")
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    blake3(data, max_threads=threads).digest()
+                    best[mode] = min(best[mode], time.perf_counter() - start)
+            timings.append(best)
+
+        def threshold(narrow: str, wide: str) -> int:
+            losing = [size for size, best in zip(sizes, timings) if best[narrow] <= best[wide] * BLAKE3_CALIBRATION_GAIN]
+            return max(losing, default=0)
+
+        with self._lock:
+            self.single_thread_max = threshold("single", "limited")
+            self.limited_threads_max = max(threshold("limited", "auto"), self.single_thread_max)
+            self.calibration = {
+                "duration_s": time.perf_counter() - started,
+                "results": [{"size": size, **{f"{mode}_MBps": size / best[mode] / 1e6 for mode in modes}} for size, best in zip(sizes, timings)]
+            }
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            "single_thread_max": self.single_thread_max,
+            "limited_threads_max": self.limited_threads_max,
+            "limited_threads": self.limited_threads,
+            "cpu_count": self._cpu_count,
+            "load_per_cpu": self.load(),
+            "calibration": self.calibration
+        }
+
+# Calibrated by the apps at startup (BLAKE3_CALIBRATE), not on import, so tools importing this module stay untimed
+threading_policy = ThreadingPolicy(BLAKE3_SINGLE_THREAD_MAX, BLAKE3_LIMITED_THREADS_MAX, BLAKE3_LIMITED_THREADS)
+
+# Penjadwal CPU untuk hashing di seluruh proses: setiap panggilan hash memegang token sebanyak
+# thread yang dipakainya, total token dibatasi BLAKE3_THREAD_BUDGET. Permintaan yang tidak kebagian
+# menunggu di antrean FIFO, jadi request besar dan kecil bergiliran per chunk alih-alih oversubscribe.
+class HashScheduler:
+    def __init__(self, budget: int):
+        self.budget = max(1, budget)
+        self._available = self.budget
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._counters = {"acquired": 0, "queued": 0, "wait_seconds": 0.0, "max_queue_depth": 0, "unscheduled": 0}
+
+    # Jumlah thread untuk max_threads dari ThreadingPolicy (blake3.AUTO menjadi seluruh budget)
+    def threads(self, max_threads: int) -> int:
+        return self.budget if max_threads == blake3.AUTO else max(1, min(max_threads, self.budget))
+
+    def acquire(self, threads: int):
+        with self._lock:
+            self._counters["acquired"] += 1
+            if not self._waiters and self._available >= threads:
+                self._available -= threads
+                return
+            waiter = (threads, threading.Event())
+            self._waiters.append(waiter)
+            self._counters["queued"] += 1
+            self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], len(self._waiters))
+        started = time.perf_counter()
+        waiter[1].wait()
+        with self._lock:
+            self._counters["wait_seconds"] += time.perf_counter() - started
+
+    def release(self, threads: int):
+        with self._lock:
+            self._available += threads
+            # Hanya kepala antrean yang boleh lewat, supaya permintaan besar tidak kelaparan
+            while self._waiters and self._available >= self._waiters[0][0]:
+                threads, event = self._waiters.popleft()
+                self._available -= threads
+                event.set()
+
+    # Context manager holding threads tokens; size is the bytes hashed in it, for the small-input bypass
+    def slot(self, threads: int, size: int = None):
+        if threads == 1 and size is not None and size <= BLAKE3_UNSCHEDULED_MAX:
+            with self._lock:
+                self._counters["unscheduled"] += 1
+            return _UNSCHEDULED
+        return _SchedulerSlot(self, threads)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, budget=self.budget, threads_in_use=self.budget - self._available, queue_depth=len(self._waiters))
+
+class _SchedulerSlot:
+    def __init__(self, scheduler: HashScheduler, threads: int):
+        self.scheduler = scheduler
+        self.threads = threads
+
+    def __enter__(self):
+        self.scheduler.acquire(self.threads)
+
+    def __exit__(self, *exc):
+        self.scheduler.release(self.threads)
+
+_UNSCHEDULED = nullcontext()
+
+hash_scheduler = HashScheduler(BLAKE3_THREAD_BUDGET)
+
+# Hasher whose update() calls run under hash_scheduler, holding as many tokens as threads it uses
+class ScheduledHasher:
+    def __init__(self, hasher, threads: int):
+        self.hasher = hasher
+        self.threads = threads
+
+    def update(self, data):
+        with hash_scheduler.slot(self.threads, len(data)):
+            self.hasher.update(data)
+
+    # digest(), hexdigest(), outboard(), ... come from the wrapped hasher
+    def __getattr__(self, name):
+        return getattr(self.hasher, name)
+
+# Regular_hash function
+def blake3_regular_hash(file_data: bytes) -> str:
+   threads = hash_scheduler.threads(threading_policy.max_threads(len(file_data)))
+   with hash_scheduler.slot(threads, len(file_data)):
+       hash_value = blake3(file_data,  max_threads=threads).digest().hex()
+   return hash_value
+
+# Keyed_hash function
+def blake3_keyed_hash(file_data: bytes, key_bytes: bytes) -> str:
+    threads = hash_scheduler.threads(threading_policy.max_threads(len(file_data)))
+    with hash_scheduler.slot(threads, len(file_data)):
+        hash_value = blake3(file_data, key=key_bytes, max_threads=threads).digest().hex()
+    return hash_value
+
+# Derive_keyed_hash function
+def blake3_derive_keyed_hash(file_data: bytes, context: bytes) -> str:
+    threads = hash_scheduler.threads(threading_policy.max_threads(len(file_data)))
+    with hash_scheduler.slot(threads, len(file_data)):
+        hash_value = blake3(file_data, derive_key_context=context, max_threads=threads).digest().hex()
+    return hash_value
+
+# Incremental hasher for the streaming routes, same modes as the functions above.
+# blake3 applies max_threads per update() call, so the mode is picked from update_size,
+# the largest input passed to one update() (None: unknown).
+def new_blake3_hasher(hash_type: str, key_bytes: bytes = None, context=None, update_size: int = None):
+    threads = hash_scheduler.threads(threading_policy.max_threads(update_size))
+    if hash_type == "keyed":
+        return ScheduledHasher(blake3(key=key_bytes, max_threads=threads), threads)
+    if hash_type == "derive_keyed":
+        return ScheduledHasher(blake3(derive_key_context=context, max_threads=threads), threads)
+    return ScheduledHasher(blake3(max_threads=threads), threads)
+
+# update_size untuk input total_size byte yang dibaca per chunk_size (total_size None: tidak diketahui)
+def expected_update_size(total_size, chunk_size: int) -> int:
+    return chunk_size if total_size is None else min(total_size, chunk_size)
+
+# Ukuran stream yang bisa di-seek (upload yang sudah di-spool), None jika tidak diketahui
+def stream_size(stream):
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+        return size - position
+    except (AttributeError, OSError, ValueError):
+        return None
@@ -0,0 +1,489 @@
+from blake3 import blake3
+from collections import OrderedDict
+import hmac
+import numpy as np
+import struct
+import threading
+
+# BLAKE3 tree hashing with access to the internal chaining values, which blake3-py does not expose.
+# Used to build a Bao-style outboard tree per object so a byte range can be served and verified
+# against the root hash_value with only the range plus O(log n) tree nodes.
+#
+# Outboard layout: 8-byte little-endian content length, then every parent node above the
+# leaf groups (64 bytes: left CV || right CV) in pre-order. A leaf group is 2**group_log chunks
+# of 1 KiB, so the outboard is 64 bytes per group instead of Bao's 64 bytes per KiB.
+# A slice uses the same pre-order with the groups that overlap the range inlined after their parents.
+
+CHUNK_LEN = 1024
+BLOCK_LEN = 64
+OUT_LEN = 32
+HEADER_LEN = 8
+PARENT_LEN = 2 * OUT_LEN
+
+CHUNK_START = 1
+CHUNK_END = 2
+PARENT = 4
+ROOT = 8
+KEYED_HASH = 16
+DERIVE_KEY_CONTEXT = 32
+DERIVE_KEY_MATERIAL = 64
+
+IV = np.array([0x6A09E667, 0xBB67AE85, 0x3C6EF372, 0xA54FF53A,
+               0x510E527F, 0x9B05688C, 0x1F83D9AB, 0x5BE0CD19], dtype=np.uint32)
+
+MSG_PERMUTATION = (2, 6, 3, 10, 7, 0, 4, 13, 1, 11, 12, 5, 9, 14, 15, 8)
+
+# Chunks compressed per numpy call while hashing a stream (16 MiB of input)
+HASH_BATCH_CHUNKS = 16 * 1024
+
+# (mode, key or context) pairs whose tree parameters are kept ready for new hashers
+TEMPLATE_CACHE_SIZE = 256
+
+# Message word order for each of the 7 rounds (the permutation is applied to indices, not data)
+def _message_schedule():
+    order = list(range(16))
+    schedule = []
+    for _ in range(7):
+        schedule.append(tuple(order))
+        order = [order[i] for i in MSG_PERMUTATION]
+    return tuple(schedule)
+
+MSG_SCHEDULE = _message_schedule()
+
+# compress() runs G on the four columns (then the four diagonals) of the state at once: message
+# word indices for those steps per round, and the row rotations that line the diagonals up as columns
+ROUND_WORDS = tuple((np.array(s[0:8:2]), np.array(s[1:8:2]), np.array(s[8:16:2]), np.array(s[9:16:2])) for s in MSG_SCHEDULE)
+ROTATE_1 = np.array([1, 2, 3, 0])
+ROTATE_2 = np.array([2, 3, 0, 1])
+ROTATE_3 = np.array([3, 0, 1, 2])
+
+def _rotr(x, n: int, tmp):
+    np.right_shift(x, n, out=tmp)
+    np.left_shift(x, 32 - n, out=x)
+    x |= tmp
+
+# G pada empat kolom (atau diagonal) sekaligus: a, b, c, d adalah baris state (4, n)
+def _g(a, b, c, d, mx, my, tmp):
+    a += b
+    a += mx
+    d ^= a
+    _rotr(d, 16, tmp)
+    c += d
+    b ^= c
+    _rotr(b, 12, tmp)
+    a += b
+    a += my
+    d ^= a
+    _rotr(d, 8, tmp)
+    c += d
+    b ^= c
+    _rotr(b, 7, tmp)
+
+# Fungsi kompresi BLAKE3, tervektorisasi atas n input sekaligus.
+# cv: (8, n), m: (16, n), counter/block_len/flags: skalar atau (n,). Mengembalikan state (16, n) setelah feed-forward.
+# Row-wise G keeps the numpy call count per compression low, which is what small inputs pay for.
+def compress(cv, m, counter, block_len, flags):
+    n = m.shape[1]
+    counter = np.asarray(counter, dtype=np.uint64)
+    a = np.array(cv[:4], dtype=np.uint32)
+    b = np.array(cv[4:8], dtype=np.uint32)
+    c = np.repeat(IV[:4, None], n, axis=1)
+    d = np.empty((4, n), dtype=np.uint32)
+    d[0] = (counter & 0xFFFFFFFF).astype(np.uint32)
+    d[1] = (counter >> 32).astype(np.uint32)
+    d[2] = block_len
+    d[3] = flags
+    tmp = np.empty((4, n), dtype=np.uint32)
+    for column_x, column_y, diagonal_x, diagonal_y in ROUND_WORDS:
+        _g(a, b, c, d, m[column_x], m[column_y], tmp)
+        b, c, d = b[ROTATE_1], c[ROTATE_2], d[ROTATE_3]
+        _g(a, b, c, d, m[diagonal_x], m[diagonal_y], tmp)
+        b, c, d = b[ROTATE_3], c[ROTATE_2], d[ROTATE_1]
+    state = np.concatenate([a, b, c, d])
+    state[:8] ^= state[8:]
+    state[8:] ^= cv
+    return state
+
+def _words(data) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
+
+def _cv_bytes(cv) -> bytes:
+    return np.ascontiguousarray(cv, dtype="<u4").tobytes()
+
+# Chaining values of n full chunks (n * 1024 bytes) starting at chunk index first_chunk -> (8, n)
+def full_chunk_cvs(data, first_chunk: int, key_words, flags: int) -> np.ndarray:
+    n = len(data) // CHUNK_LEN
+    # Read in place: every block is copied out below anyway
+    blocks = np.frombuffer(data, dtype="<u4", count=n * CHUNK_LEN // 4).reshape(n, 16, 16).transpose(1, 2, 0)
+    counter = np.arange(first_chunk, first_chunk + n, dtype=np.uint64)
+    cv = np.repeat(key_words[:, None], n, axis=1)
+    for j in range(16):
+        block_flags = flags | (CHUNK_START if j == 0 else 0) | (CHUNK_END if j == 15 else 0)
+        cv = compress(cv, np.ascontiguousarray(blocks[j]), counter, BLOCK_LEN, block_flags)[:8]
+    return cv
+
+# Chaining value (or root state when is_root) of one chunk of 0..1024 bytes -> (8, 1) / (16, 1)
+def chunk_cv(data, chunk_index: int, key_words, flags: int, is_root: bool = False) -> np.ndarray:
+    cv = key_words[:, None]
+    block_count = max(1, -(-len(data) // BLOCK_LEN))
+    for j in range(block_count):
+        block = data[j * BLOCK_LEN:(j + 1) * BLOCK_LEN]
+        m = _words(bytes(block).ljust(BLOCK_LEN, b"\0"))[:, None]
+        block_flags = flags | (CHUNK_START if j == 0 else 0)
+        if j == block_count - 1:
+            block_flags |= CHUNK_END | (ROOT if is_root else 0)
+        state = compress(cv, m, chunk_index, len(block), block_flags)
+        cv = state[:8]
+    return state if is_root else cv
+
+# Parent chaining values for n (left, right) pairs, left/right: (8, n)
+def parent_cvs(left, right, key_words, flags: int, is_root: bool = False) -> np.ndarray:
+    m = np.concatenate([left, right])
+    cv = np.repeat(key_words[:, None], m.shape[1], axis=1)
+    state = compress(cv, m, 0, BLOCK_LEN, flags | PARENT | (ROOT if is_root else 0))
+    return state if is_root else state[:8]
+
+# Level-by-level pairing; an unpaired last node is carried up unchanged, which gives BLAKE3's left-complete tree.
+# Mengembalikan list level, level[k][:, i] adalah CV subtree [i * 2**k, (i + 1) * 2**k) (dipotong di akhir).
+def tree_levels(cvs, key_words, flags: int) -> list:
+    levels = [cvs]
+    while levels[-1].shape[1] > 1:
+        level = levels[-1]
+        pairs = level.shape[1] // 2
+        parents = parent_cvs(level[:, 0:2 * pairs:2], level[:, 1:2 * pairs:2], key_words, flags)
+        if level.shape[1] % 2:
+            parents = np.concatenate([parents, level[:, -1:]], axis=1)
+        levels.append(parents)
+    return levels
+
+# Jumlah leaf di subtree kiri: pangkat dua terbesar yang lebih kecil dari count
+def left_count(count: int) -> int:
+    return 1 << ((count - 1).bit_length() - 1)
+
+def subtree_cv(levels, lo: int, hi: int) -> np.ndarray:
+    k = (hi - lo - 1).bit_length()
+    return levels[k][:, (lo >> k):(lo >> k) + 1]
+
+def _root_hex(state) -> str:
+    return _cv_bytes(state[:8, 0]).hex()
+
+# Key words and flags for the three API modes, matching new_blake3_hasher()
+def mode_params(hash_type: str, key_bytes: bytes = None, context=None):
+    if hash_type == "keyed":
+        return _words(key_bytes), KEYED_HASH
+    if hash_type == "derive_keyed":
+        context_key = hash_bytes(context.encode("utf-8") if isinstance(context, str) else context, IV, DERIVE_KEY_CONTEXT)
+        return _words(bytes.fromhex(context_key)), DERIVE_KEY_MATERIAL
+    return IV, 0
+
+# LRU of pre-initialised tree parameters (key words, flags) per (mode, key or context); every hasher
+# gets its own copy. Saves derive-key mode the context-key pass, which costs milliseconds in numpy.
+# Only the numpy tree (OutboardHasher, slice decoding) uses it. The blake3-py hashers of blake3_hashing.py
+# build their key per call on purpose: blake3(key=...) takes about 0.8 us, while a lookup in this cache
+# plus copy() of a cached blake3 object took about 2.3 us (a bare dict lookup plus copy() about 0.75 us).
+# Entries are found by the process-salted hash() of the key or context and confirmed against a private
+# copy of it; that copy and the cached key words are zeroised when the entry is evicted or replaced.
+class TemplateCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def params(self, hash_type: str, key_bytes: bytes = None, context=None):
+        material = key_bytes if hash_type == "keyed" else context if hash_type == "derive_keyed" else b""
+        if isinstance(material, str):
+            material = material.encode("utf-8")
+        slot = (hash_type, hash(material))
+        with self._lock:
+            entry = self._templates.get(slot)
+            if entry is not None and hmac.compare_digest(entry[0], material):
+                self._templates.move_to_end(slot)
+                self._counters["hits"] += 1
+                return entry[1].copy(), entry[2]
+            self._counters["misses"] += 1
+
+        key_words, flags = mode_params(hash_type, key_bytes, context)
+        with self._lock:
+            previous = self._templates.pop(slot, None)
+            if previous is not None:
+                self._evict(previous)
+            self._templates[slot] = (bytearray(material), key_words.copy(), flags)
+            while len(self._templates) > self.max_entries:
+                self._evict(self._templates.popitem(last=False)[1])
+        return key_words, flags
+
+    def _evict(self, entry):
+        material, key_words, _ = entry
+        material[:] = bytes(len(material))
+        key_words[:] = 0
+        self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            while self._templates:
+                self._evict(self._templates.popitem()[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, entries=len(self._templates), max_entries=self.max_entries)
+
+tree_templates = TemplateCache(TEMPLATE_CACHE_SIZE)
+
+# BLAKE3 dari seluruh data dalam memori (hex), dipakai untuk context key dan pengujian
+def hash_bytes(data, key_words=IV, flags: int = 0) -> str:
+    data = memoryview(bytes(data))
+    chunk_count = max(1, -(-len(data) // CHUNK_LEN))
+    if chunk_count == 1:
+        return _root_hex(chunk_cv(data, 0, key_words, flags, is_root=True))
+    full = (len(data) - 1) // CHUNK_LEN
+    cvs = [full_chunk_cvs(data[:full * CHUNK_LEN], 0, key_words, flags),
+           chunk_cv(data[full * CHUNK_LEN:], full, key_words, flags)]
+    levels = tree_levels(np.concatenate(cvs, axis=1), key_words, flags)
+    left = left_count(chunk_count)
+    state = parent_cvs(subtree_cv(levels, 0, left), subtree_cv(levels, left, chunk_count), key_words, flags, is_root=True)
+    return _root_hex(state)
+
+# Jumlah grup leaf untuk panjang konten tertentu (minimal satu, juga untuk file kosong)
+def group_count(content_len: int, group_log: int) -> int:
+    return max(1, -(-content_len // (CHUNK_LEN << group_log)))
+
+# Chaining value of one leaf group from its bytes; the root state instead when the group is the whole file
+def group_cv(data, group_index: int, group_log: int, key_words, flags: int, is_root: bool = False) -> np.ndarray:
+    data = memoryview(data)
+    first_chunk = group_index << group_log
+    chunk_count = max(1, -(-len(data) // CHUNK_LEN))
+    if chunk_count == 1:
+        return chunk_cv(data, first_chunk, key_words, flags, is_root=is_root)
+    full = (len(data) - 1) // CHUNK_LEN
+    cvs = np.concatenate([full_chunk_cvs(data[:full * CHUNK_LEN], first_chunk, key_words, flags),
+                          chunk_cv(data[full * CHUNK_LEN:], first_chunk + full, key_words, flags)], axis=1)
+    levels = tree_levels(cvs, key_words, flags)
+    left = left_count(chunk_count)
+    return parent_cvs(subtree_cv(levels, 0, left), subtree_cv(levels, left, chunk_count), key_words, flags, is_root=is_root)
+
+# Incremental hasher that also produces the outboard tree; update()/hexdigest() like blake3-py.
+# Whole groups are hashed straight from the caller's buffer, batch_size bytes per numpy pass, so only
+# the group CVs (32 bytes per group) and less than one group of input are kept between updates.
+class OutboardHasher:
+    def __init__(self, hash_type: str = "regular", key_bytes: bytes = None, context=None, group_log: int = 4,
+                 batch_size: int = HASH_BATCH_CHUNKS * CHUNK_LEN):
+        self.key_words, self.flags = tree_templates.params(hash_type, key_bytes, context)
+        self._mode = (hash_type, key_bytes, context)
+        self.group_log = group_log
+        self.group_len = CHUNK_LEN << group_log
+        self._batch_groups = max(1, batch_size // self.group_len)
+        self.content_len = 0
+        self._pending = bytearray()
+        self._group_cvs = []
+        self._groups_done = 0
+        self._result = None
+
+    def update(self, data):
+        if self._result is not None:
+            raise ValueError("OutboardHasher already finalized")
+        view = memoryview(data).cast("B")
+        self.content_len += len(view)
+        if self._pending:
+            fill = min(len(view), self.group_len - len(self._pending))
+            self._pending += view[:fill]
+            view = view[fill:]
+            # Keep at least one byte back: the last group is only known at finalize time
+            if not len(view):
+                return
+            self._hash_full_groups(self._pending, 1)
+            self._pending = bytearray()
+        ready = (len(view) - 1) // self.group_len if len(view) else 0
+        for first in range(0, ready, self._batch_groups):
+            groups = min(self._batch_groups, ready - first)
+            self._hash_full_groups(view[first * self.group_len:(first + groups) * self.group_len], groups)
+        self._pending += view[ready * self.group_len:]
+
+    def _hash_full_groups(self, data, groups: int):
+        cvs = full_chunk_cvs(data, self._groups_done << self.group_log, self.key_words, self.flags)
+        for _ in range(self.group_log):
+            cvs = parent_cvs(cvs[:, 0::2], cvs[:, 1::2], self.key_words, self.flags)
+        self._group_cvs.append(cvs)
+        self._groups_done += groups
+
+    def _finalize(self):
+        if self._result is not None:
+            return self._result
+        tail = bytes(self._pending)
+        self._pending = bytearray()
+        if self._groups_done == 0 and len(tail) <= self.group_len:
+            # One group: the outboard is just the header and the root is a plain BLAKE3 hash
+            self._result = (_blake3_hex(tail, *self._mode), _encode_outboard(None, 1, self.content_len))
+            return self._result
+        # Every chunk left (the ready groups and the last one) goes through one vectorised pass
+        first_chunk = self._groups_done << self.group_log
+        full = len(tail) // CHUNK_LEN
+        cvs = [full_chunk_cvs(tail[:full * CHUNK_LEN], first_chunk, self.key_words, self.flags)] if full else []
+        if len(tail) % CHUNK_LEN:
+            cvs.append(chunk_cv(tail[full * CHUNK_LEN:], first_chunk + full, self.key_words, self.flags))
+        cvs = np.concatenate(cvs, axis=1)
+        complete = (cvs.shape[1] >> self.group_log) << self.group_log
+        if complete:
+            groups = cvs[:, :complete]
+            for _ in range(self.group_log):
+                groups = parent_cvs(groups[:, 0::2], groups[:, 1::2], self.key_words, self.flags)
+            self._group_cvs.append(groups)
+        if complete < cvs.shape[1]:
+            self._group_cvs.append(tree_levels(cvs[:, complete:], self.key_words, self.flags)[-1])
+        group_cvs = np.concatenate(self._group_cvs, axis=1)
+        count = group_cvs.shape[1]
+        levels = tree_levels(group_cvs, self.key_words, self.flags)
+        left = left_count(count)
+        root = parent_cvs(subtree_cv(levels, 0, left), subtree_cv(levels, left, count), self.key_words, self.flags, is_root=True)
+        self._group_cvs = []
+        self._result = (_root_hex(root), _encode_outboard(levels, count, self.content_len))
+        return self._result
+
+    def hexdigest(self) -> str:
+        return self._finalize()[0]
+
+    def outboard(self) -> bytes:
+        return self._finalize()[1]
+
+# BLAKE3 root of a single-group file with blake3-py, same modes as new_blake3_hasher()
+def _blake3_hex(data: bytes, hash_type: str, key_bytes: bytes = None, context=None) -> str:
+    if hash_type == "keyed":
+        return blake3(data, key=key_bytes).hexdigest()
+    if hash_type == "derive_keyed":
+        return blake3(data, derive_key_context=context.decode("utf-8") if isinstance(context, bytes) else context).hexdigest()
+    return blake3(data).hexdigest()
+
+def _encode_outboard(levels, count: int, content_len: int) -> bytes:
+    out = bytearray(struct.pack("<Q", content_len))
+    stack = [(0, count)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        mid = lo + left_count(hi - lo)
+        out += _cv_bytes(subtree_cv(levels, lo, mid)[:, 0]) + _cv_bytes(subtree_cv(levels, mid, hi)[:, 0])
+        # Pre-order: left subtree is emitted before right
+        stack.append((mid, hi))
+        stack.append((lo, mid))
+    return bytes(out)
+
+# Panjang konten yang tercatat di header outboard atau slice
+def content_length(header: bytes) -> int:
+    return struct.unpack("<Q", header[:HEADER_LEN])[0]
+
+# Walks the tree for [start, end) and yields ("parent", outboard_offset, lo, hi) / ("group", group_index, byte_start, byte_end)
+# in slice order. Ranges are clamped to the content; an empty or out-of-bounds range still covers the last group,
+# so the reader can authenticate the content length.
+def slice_plan(content_len: int, start: int, end: int, group_log: int):
+    group_len = CHUNK_LEN << group_log
+    count = group_count(content_len, group_log)
+    first = min(start, max(content_len - 1, 0)) // group_len
+    last = max(first, (min(end, content_len) - 1) // group_len)
+    stack = [(0, count, HEADER_LEN)]
+    while stack:
+        lo, hi, offset = stack.pop()
+        if hi - lo == 1:
+            yield ("group", lo, lo * group_len, min((lo + 1) * group_len, content_len))
+            continue
+        mid = lo + left_count(hi - lo)
+        yield ("parent", offset, lo, hi)
+        if last >= mid:
+            stack.append((mid, hi, offset + PARENT_LEN * (mid - lo)))
+        if first < mid:
+            stack.append((lo, mid, offset + PARENT_LEN))
+
+# Range bytes yang dibutuhkan slice dari objek: (start, end) grup pertama sampai grup terakhir
+def slice_content_range(content_len: int, start: int, end: int, group_log: int):
+    groups = [step for step in slice_plan(content_len, start, end, group_log) if step[0] == "group"]
+    return groups[0][2], groups[-1][3]
+
+# Offsets of the parent nodes a slice of [start, end) needs from the outboard
+def slice_node_offsets(content_len: int, start: int, end: int, group_log: int) -> list:
+    return [step[1] for step in slice_plan(content_len, start, end, group_log) if step[0] == "parent"]
+
+# Pulls exact byte counts out of an iterator of chunks
+class _ChunkReader:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+# Menghasilkan slice secara streaming. read_node(offset) mengembalikan node parent dari outboard,
+# content_chunks adalah bytes objek mulai dari awal slice_content_range().
+def iter_encode_slice(header: bytes, read_node, content_chunks, start: int, end: int, group_log: int):
+    content_len = content_length(header)
+    content = _ChunkReader(content_chunks)
+    yield bytes(header[:HEADER_LEN])
+    for step in slice_plan(content_len, start, end, group_log):
+        if step[0] == "parent":
+            yield read_node(step[1])
+        else:
+            data = content.read(step[3] - step[2])
+            if len(data) != step[3] - step[2]:
+                raise ValueError("Object is shorter than its outboard")
+            yield data
+
+# Slice dari outboard dan isi objek yang lengkap
+def encode_slice(outboard: bytes, content: bytes, start: int, end: int, group_log: int) -> bytes:
+    read_node = lambda offset: outboard[offset:offset + PARENT_LEN]
+    content_start, content_end = slice_content_range(content_length(outboard), start, end, group_log)
+    return b"".join(iter_encode_slice(outboard, read_node, [content[content_start:content_end]], start, end, group_log))
+
+# Memverifikasi slice (iterator chunk) terhadap root hash dan menghasilkan bytes [start, end) per grup,
+# setiap grup baru dikeluarkan setelah terautentikasi. Raises ValueError when a node or group does not match.
+def iter_decode_slice(slice_chunks, hash_value: str, start: int, end: int, group_log: int = 4,
+                      hash_type: str = "regular", key_bytes: bytes = None, context=None):
+    key_words, flags = tree_templates.params(hash_type, key_bytes, context)
+    reader = _ChunkReader(slice_chunks)
+    header = reader.read(HEADER_LEN)
+    if len(header) != HEADER_LEN:
+        raise ValueError("Slice is truncated")
+    content_len = content_length(header)
+    # Expected CV for each subtree on the path, keyed by its group range; None means "compare to the root hash"
+    expected = {(0, group_count(content_len, group_log)): None}
+    for step in slice_plan(content_len, start, end, group_log):
+        if step[0] == "parent":
+            _, _, lo, hi = step
+            node = reader.read(PARENT_LEN)
+            if len(node) != PARENT_LEN:
+                raise ValueError("Slice is truncated")
+            left, right = _words(node[:OUT_LEN])[:, None], _words(node[OUT_LEN:])[:, None]
+            want = expected.pop((lo, hi))
+            _check(parent_cvs(left, right, key_words, flags, is_root=want is None), want, hash_value)
+            mid = lo + left_count(hi - lo)
+            expected[(lo, mid)] = left
+            expected[(mid, hi)] = right
+        else:
+            _, index, group_start, group_end = step
+            data = reader.read(group_end - group_start)
+            if len(data) != group_end - group_start:
+                raise ValueError("Slice is truncated")
+            want = expected.pop((index, index + 1))
+            _check(group_cv(data, index, group_log, key_words, flags, is_root=want is None), want, hash_value)
+            clip_start = max(start, group_start) - group_start
+            clip_end = min(end, group_end) - group_start
+            if clip_end > clip_start:
+                yield data[clip_start:clip_end]
+    if reader.read(1):
+        raise ValueError("Slice has trailing bytes")
+
+def decode_slice(slice_bytes: bytes, hash_value: str, start: int, end: int, group_log: int = 4,
+                 hash_type: str = "regular", key_bytes: bytes = None, context=None) -> bytes:
+    return b"".join(iter_decode_slice([slice_bytes], hash_value, start, end, group_log, hash_type, key_bytes, context))
+
+def _check(actual, want, hash_value: str):
+    if want is None:
+        ok = _root_hex(actual) == hash_value
+    else:
+        ok = np.array_equal(actual[:8], want)
+    if not ok:
+        raise ValueError("Slice does not match hash_value")
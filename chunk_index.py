@@ -0,0 +1,88 @@
+from blake3 import blake3
+import math
+import random
+import struct
+
+# Per-chunk BLAKE3 digest table stored next to each object, so a scrub can check a sample of
+# chunks with ranged reads and name the exact byte ranges that are corrupt.
+#
+# Packed layout: magic "B3CI", chunk size (u32), content length (u64), then one 32-byte
+# BLAKE3 digest per chunk. The last chunk may be short. Digests are unkeyed so the server
+# can scrub objects of every hash type.
+
+MAGIC = b"B3CI"
+HEADER = struct.Struct("<4sIQ")
+DIGEST_LEN = 32
+
+# Jumlah chunk untuk panjang konten tertentu
+def chunk_count(content_len: int, chunk_size: int) -> int:
+    return -(-content_len // chunk_size)
+
+# Byte range [start, end) dari chunk ke-index
+def chunk_range(index: int, chunk_size: int, content_len: int):
+    start = index * chunk_size
+    return start, min(start + chunk_size, content_len)
+
+def chunk_digest(data) -> bytes:
+    return blake3(data).digest()
+
+# Incremental builder, fed with the same chunks as the upload hasher
+class ChunkIndexBuilder:
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.content_len = 0
+        self._hasher = blake3()
+        self._filled = 0
+        self._digests = bytearray()
+
+    def update(self, data):
+        view = memoryview(data)
+        while view:
+            take = min(len(view), self.chunk_size - self._filled)
+            self._hasher.update(view[:take])
+            self._filled += take
+            self.content_len += take
+            view = view[take:]
+            if self._filled == self.chunk_size:
+                self._digests += self._hasher.digest()
+                self._hasher = blake3()
+                self._filled = 0
+
+    def packed(self) -> bytes:
+        tail = self._hasher.digest() if self._filled else b""
+        return HEADER.pack(MAGIC, self.chunk_size, self.content_len) + bytes(self._digests) + tail
+
+# Membaca tabel packed: (chunk_size, content_len, digests). Raises ValueError for a malformed table.
+def unpack_chunk_index(data: bytes):
+    if len(data) < HEADER.size:
+        raise ValueError("Chunk index is truncated")
+    magic, chunk_size, content_len = HEADER.unpack_from(data)
+    if magic != MAGIC or chunk_size == 0:
+        raise ValueError("Not a chunk index")
+    digests = memoryview(data)[HEADER.size:]
+    if len(digests) != chunk_count(content_len, chunk_size) * DIGEST_LEN:
+        raise ValueError("Chunk index is truncated")
+    return chunk_size, content_len, digests
+
+def expected_digest(digests, index: int) -> bytes:
+    return bytes(digests[index * DIGEST_LEN:(index + 1) * DIGEST_LEN])
+
+# Chunk yang diperiksa: daftar eksplisit, atau sampel acak sebesar fraksi sample (minimal satu chunk)
+def select_chunks(count: int, sample: float = None, chunks=None, seed=None) -> list:
+    if chunks is not None:
+        return sorted(set(index for index in chunks if 0 <= index < count))
+    if count == 0:
+        return []
+    size = min(count, max(1, math.ceil(count * sample)))
+    return sorted(random.Random(seed).sample(range(count), size))
+
+# Menggabungkan chunk rusak yang bersebelahan menjadi byte range [start, end)
+def corrupt_ranges(indices: list, chunk_size: int, content_len: int) -> list:
+    ranges = []
+    for index in sorted(indices):
+        start, end = chunk_range(index, chunk_size, content_len)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return [{"start": start, "end": end} for start, end in ranges]
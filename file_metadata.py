@@ -0,0 +1,129 @@
+from google.cloud import firestore
+from collections import OrderedDict
+import threading
+import time
+from blake3_hashing import HASH_TYPES
+
+# Layout dan cache metadata file_metadata, dipakai bersama oleh gcp_app.py dan gcp_app_async.py
+
+# Object key for content-addressed storage; the two digest-prefix levels spread keys over the bucket's key range
+def content_object_name(hash_value: str) -> str:
+    return f"{hash_value[:2]}/{hash_value[2:4]}/{hash_value}"
+
+# Outboard BLAKE3 tree (see blake3_tree.py) is stored next to its object
+def outboard_object_name(object_name: str) -> str:
+    return f"{object_name}.obao"
+
+# Tabel digest per chunk (see chunk_index.py) is stored next to its object
+def chunk_index_object_name(object_name: str) -> str:
+    return f"{object_name}.b3idx"
+
+# Dokumen metadata memakai ID deterministik "{hash_type}:{hash_value}", jadi setiap lookup adalah satu point get
+def metadata_doc_id(hash_type: str, hash_value: str) -> str:
+    return f"{hash_type}:{hash_value}"
+
+# Menyusun data metadata untuk sebuah upload: (data, mode "set" | "merge" | "update").
+# Upload yang terdeduplikasi hanya menambahkan nama file sebagai alias.
+def metadata_write(stored: dict, hash_type: str, file_name: str, content_addressed: bool):
+    if stored["existing"] is not None:
+        return {'aliases': firestore.ArrayUnion([file_name])}, "update"
+
+    record = {
+        'file_name': stored["object_name"],
+        'hash_value': stored["hash_value"],
+        'hash_type': hash_type
+    }
+    if stored.get("outboard") is not None:
+        record['outboard'] = stored["outboard"]
+    if stored.get("chunk_index") is not None:
+        record['chunk_index'] = stored["chunk_index"]
+    if content_addressed:
+        # merge + ArrayUnion: concurrent uploads of the same content converge on one record
+        record['original_name'] = file_name
+        record['aliases'] = firestore.ArrayUnion([file_name])
+        record['size'] = stored["size"]
+        return record, "merge"
+    return record, "set"
+
+# Menggabungkan penulisan metadata banyak upload (stored, hash_type, file_name) per dokumen, untuk satu WriteBatch.
+# Alias disatukan dan record pertama dipertahankan (mode content-addressed), selain itu penulisan terakhir yang berlaku.
+# Mengembalikan list (hash_type, hash_value, data, mode).
+def coalesce_metadata_writes(writes: list, content_addressed: bool) -> list:
+    merged = OrderedDict()
+    for stored, hash_type, file_name in writes:
+        data, mode = metadata_write(stored, hash_type, file_name, content_addressed)
+        doc_id = metadata_doc_id(hash_type, stored["hash_value"])
+        previous = merged.get(doc_id)
+        if previous is not None and 'aliases' in data:
+            _, _, previous_data, previous_mode = previous
+            aliases = list(previous_data['aliases'].values) + list(data['aliases'].values)
+            data = {**data, **previous_data, 'aliases': firestore.ArrayUnion(aliases)}
+            mode = "merge" if "merge" in (previous_mode, mode) else mode
+        merged[doc_id] = (hash_type, stored["hash_value"], data, mode)
+    return list(merged.values())
+
+# Validasi satu entry /check-batch, mengembalikan pesan error atau None
+def check_batch_entry_error(entry) -> str:
+    if not isinstance(entry, dict) or not isinstance(entry.get('hash_value'), str):
+        return "Entry must be an object with a hash_value"
+    hash_type = entry.get('hash_type', 'regular')
+    if hash_type not in HASH_TYPES:
+        return f"hash_type must be one of {', '.join(HASH_TYPES)}"
+    if hash_type == "keyed" and (not isinstance(entry.get('key'), str) or len(entry['key']) != 32):
+        return "Key must be provided and be exactly 32 bytes long"
+    if hash_type == "derive_keyed" and not isinstance(entry.get('context'), str):
+        return "Context must be provided"
+    return None
+
+# Cache LRU in-process untuk metadata hash yang dipakai bersama oleh semua route.
+# Hasil "tidak ditemukan" juga di-cache (None) dengan TTL yang lebih pendek.
+class MetadataCache:
+    MISSING = object()
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "negative_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    # Mengembalikan dict metadata, None (negatif) atau MetadataCache.MISSING
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return self.MISSING
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return self.MISSING
+            self._entries.move_to_end(key)
+            self._counters["hits" if value is not None else "negative_hits"] += 1
+            return value
+
+    def put(self, key: str, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._counters["invalidations"] += 1
+
+    def invalidate_hash(self, hash_value: str):
+        self.invalidate(metadata_doc_id("*", hash_value), *(metadata_doc_id(t, hash_value) for t in HASH_TYPES))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), max_entries=self.max_entries)
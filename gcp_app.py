@@ -1,197 +1,726 @@
-from flask import Flask, request, jsonify, send_file, Response
+from flask import Flask, request, jsonify, Response
+from werkzeug.datastructures import ContentRange
 from google.cloud import storage, firestore
+from requests.adapters import HTTPAdapter
 import os
-import io
-import psutil
-import time
-from blake3 import blake3
+import queue
+import shutil
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import threading
+from blake3_hashing import BLAKE3_CALIBRATE, HASH_TYPES, new_blake3_hasher, threading_policy, hash_scheduler, ScheduledHasher, expected_update_size, stream_size
+from blake3_tree import OutboardHasher, tree_templates, HEADER_LEN, PARENT_LEN, content_length, slice_content_range, slice_node_offsets, iter_encode_slice, iter_decode_slice
+from chunk_index import ChunkIndexBuilder, chunk_count, chunk_range, chunk_digest, unpack_chunk_index, expected_digest, select_chunks, corrupt_ranges
+from file_metadata import MetadataCache, metadata_doc_id, content_object_name, outboard_object_name, chunk_index_object_name, metadata_write, coalesce_metadata_writes, check_batch_entry_error
+from request_metrics import start_request, current_metrics, set_hash_type, phase, bind, metrics_payload, start_memory_tracing
+from prometheus_client import CONTENT_TYPE_LATEST
 
 app = Flask(__name__)
 
 # Konfigurasi Google Cloud Storage
 BUCKET_NAME = "blake3-api-storage"
 
+# Chunk size for streaming uploads (GCS resumable uploads need a multiple of 256 KiB)
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+
+# Chunk size for streaming downloads (each chunk is one ranged GCS read)
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("DOWNLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+
+# Verification reads: chunk size and how many chunks may be fetched ahead of the hasher
+VERIFY_CHUNK_SIZE = int(os.environ.get("VERIFY_CHUNK_SIZE", 4 * 1024 * 1024))
+VERIFY_PREFETCH_CHUNKS = int(os.environ.get("VERIFY_PREFETCH_CHUNKS", 2))
+
+# HTTP connection pool for GCS, sized to the number of concurrent request threads
+GCS_POOL_SIZE = int(os.environ.get("GCS_POOL_SIZE", 32))
+GCS_WARMUP = os.environ.get("GCS_WARMUP", "1") == "1"
+
+# Content-addressed mode: objects are stored under their BLAKE3 digest and identical uploads are deduplicated
+CONTENT_ADDRESSED_STORAGE = os.environ.get("CONTENT_ADDRESSED_STORAGE", "0") == "1"
+
+# Metadata cache: LRU size, TTL for found records and a shorter TTL for "not found" answers (seconds)
+METADATA_CACHE_SIZE = int(os.environ.get("METADATA_CACHE_SIZE", 10000))
+METADATA_CACHE_TTL = float(os.environ.get("METADATA_CACHE_TTL", 300))
+METADATA_CACHE_NEGATIVE_TTL = float(os.environ.get("METADATA_CACHE_NEGATIVE_TTL", 5))
+
+# /upload-batch: files hashed and uploaded in parallel, metadata committed per WriteBatch (max 500 writes)
+BATCH_UPLOAD_WORKERS = int(os.environ.get("BATCH_UPLOAD_WORKERS", 16))
+BATCH_COMMIT_SIZE = int(os.environ.get("BATCH_COMMIT_SIZE", 500))
+
+# /check-batch: verifications in flight (I/O), concurrent hasher updates (CPU) and document refs per get_all read
+CHECK_BATCH_IO_WORKERS = int(os.environ.get("CHECK_BATCH_IO_WORKERS", 16))
+CHECK_BATCH_HASH_WORKERS = int(os.environ.get("CHECK_BATCH_HASH_WORKERS", os.cpu_count() or 1))
+CHECK_BATCH_READ_SIZE = int(os.environ.get("CHECK_BATCH_READ_SIZE", 100))
+
+# Outboard BLAKE3 tree stored next to each uploaded object, for verifiable range reads (/slice).
+# Opt-in (OUTBOARD_TREES=1): the tree is hashed a second time in numpy, several times slower than
+# blake3-py, so uploads pay for it. Objects uploaded without one get no /slice.
+# Leaf groups are 2**OUTBOARD_GROUP_LOG KiB, so the outboard costs 64 bytes per group.
+OUTBOARD_TREES = os.environ.get("OUTBOARD_TREES", "0") == "1"
+OUTBOARD_GROUP_LOG = int(os.environ.get("OUTBOARD_GROUP_LOG", 4))
+# Outboards up to this size are read whole for a slice; larger ones only the nodes on the range's path
+OUTBOARD_FULL_READ_SIZE = int(os.environ.get("OUTBOARD_FULL_READ_SIZE", 1024 * 1024))
+OUTBOARD_READ_WORKERS = int(os.environ.get("OUTBOARD_READ_WORKERS", 8))
+
+# Per-chunk digest table stored next to every uploaded object, for sampled scrubs (/scrub)
+CHUNK_INDEX = os.environ.get("CHUNK_INDEX", "1") == "1"
+CHUNK_INDEX_CHUNK_SIZE = int(os.environ.get("CHUNK_INDEX_CHUNK_SIZE", 1024 * 1024))
+# Fraction of the chunks a scrub reads when no explicit chunk list is given
+SCRUB_SAMPLE = float(os.environ.get("SCRUB_SAMPLE", 0.03))
+SCRUB_IO_WORKERS = int(os.environ.get("SCRUB_IO_WORKERS", 16))
+
 # Konfigurasi Firestore
 db = firestore.Client()
 
-# Regular_hash function
-def blake3_regular_hash(file_data: bytes) -> str:
-   hash_value = blake3(file_data,  max_threads=blake3.AUTO).digest().hex()
-   return hash_value
-
-# Keyed_hash function
-def blake3_keyed_hash(file_data: bytes, key_bytes: bytes) -> str:
-    hash_value = blake3(file_data, key=key_bytes, max_threads=blake3.AUTO).digest().hex()
-    return hash_value
-
-# Derive_keyed_hash function
-def blake3_derive_keyed_hash(file_data: bytes, context: bytes) -> str:
-    hash_value = blake3(file_data, derive_key_context=context, max_threads=blake3.AUTO).digest().hex()
-    return hash_value
+# Client dan bucket GCS dibuat sekali per worker dan dipakai bersama oleh semua thread.
+# Session HTTP-nya memakai pool koneksi keep-alive sehingga kredensial dan TLS tidak diulang per request.
+class GcsPool:
+    def __init__(self, bucket_name: str, pool_size: int):
+        self.bucket_name = bucket_name
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._bucket = None
+        self._adapter = None
+        self._hits = 0
+        self._misses = 0
+
+    def bucket(self):
+        with self._lock:
+            if self._bucket is None:
+                self._misses += 1
+                client = storage.Client()
+                self._adapter = HTTPAdapter(pool_maxsize=self.pool_size)
+                client._http.mount("https://", self._adapter)
+                self._bucket = client.bucket(self.bucket_name)
+            else:
+                self._hits += 1
+            return self._bucket
+
+    # Membuka koneksi pertama (token + TLS) saat boot, bukan saat request pertama
+    def warm_up(self):
+        self.bucket().get_blob("__warmup__")
+
+    def stats(self) -> dict:
+        requests_sent = 0
+        new_connections = 0
+        if self._adapter is not None:
+            pools = self._adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                requests_sent += pool.num_requests
+                new_connections += pool.num_connections
+        return {
+            "pool_size": self.pool_size,
+            "client_hits": self._hits,
+            "client_misses": self._misses,
+            "connection_hits": requests_sent - new_connections,
+            "connection_misses": new_connections,
+        }
+
+gcs_pool = GcsPool(BUCKET_NAME, GCS_POOL_SIZE)
 
 # Fungsi untuk mengunggah data ke Google Cloud Storage
 def upload_to_gcs(data: bytes, file_name: str):
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    blob = bucket.blob(file_name)
-    blob.upload_from_string(data)
+    blob = gcs_pool.bucket().blob(file_name)
+    with phase("gcs_upload", len(data)):
+        blob.upload_from_string(data)
 
 # Fungsi untuk mengunduh data dari Google Cloud Storage
 def download_from_gcs(file_name: str) -> bytes:
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    blob = bucket.blob(file_name)
-    return blob.download_as_bytes()
+    blob = gcs_pool.bucket().blob(file_name)
+    with phase("gcs_download"):
+        return blob.download_as_bytes()
+
+# Fungsi untuk streaming upload ke GCS: setiap chunk di-hash dan ditulis dalam satu pass,
+# sehingga memori per request dibatasi oleh UPLOAD_CHUNK_SIZE, bukan ukuran file
+def stream_upload_to_gcs(stream, file_name: str, hashers=()) -> int:
+    blob = gcs_pool.bucket().blob(file_name)
+    total_size = 0
+    with blob.open("wb", chunk_size=UPLOAD_CHUNK_SIZE) as writer:
+        while True:
+            with phase("body_read"):
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            with phase("hash", len(chunk) if hashers else 0):
+                for hasher in hashers:
+                    hasher.update(chunk)
+            with phase("gcs_upload", len(chunk)):
+                writer.write(chunk)
+            total_size += len(chunk)
+        # Final chunk and upload finalisation
+        with phase("gcs_upload"):
+            writer.close()
+    return total_size
+
+# Fungsi untuk meng-hash stream tanpa mengunggahnya
+def hash_stream(stream, hashers) -> int:
+    total_size = 0
+    while True:
+        with phase("body_read"):
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        with phase("hash", len(chunk)):
+            for hasher in hashers:
+                hasher.update(chunk)
+        total_size += len(chunk)
+    return total_size
+
+def metadata_ref(hash_type: str, hash_value: str):
+    return db.collection('file_metadata').document(metadata_doc_id(hash_type, hash_value))
+
+metadata_cache = MetadataCache(METADATA_CACHE_SIZE, METADATA_CACHE_TTL, METADATA_CACHE_NEGATIVE_TTL)
+
+# Mencari metadata file berdasarkan hash, mengembalikan dict metadata atau None
+def find_file_metadata(hash_value: str, hash_type: str):
+    doc_id = metadata_doc_id(hash_type, hash_value)
+    metadata = metadata_cache.get(doc_id)
+    if metadata is MetadataCache.MISSING:
+        with phase("firestore_read"):
+            snapshot = metadata_ref(hash_type, hash_value).get()
+        metadata = snapshot.to_dict() if snapshot.exists else None
+        metadata_cache.put(doc_id, metadata)
+    return metadata
+
+# Lookup tanpa hash_type (route download): satu batched read untuk semua tipe, urutan HASH_TYPES menang
+def find_any_file_metadata(hash_value: str):
+    cache_key = metadata_doc_id("*", hash_value)
+    metadata = metadata_cache.get(cache_key)
+    if metadata is not MetadataCache.MISSING:
+        return metadata
+
+    with phase("firestore_read"):
+        snapshots = {snapshot.id: snapshot for snapshot in db.get_all([metadata_ref(t, hash_value) for t in HASH_TYPES])}
+    metadata = None
+    for hash_type in HASH_TYPES:
+        snapshot = snapshots.get(metadata_doc_id(hash_type, hash_value))
+        if snapshot is not None and snapshot.exists:
+            metadata = snapshot.to_dict()
+            break
+    metadata_cache.put(cache_key, metadata)
+    return metadata
+
+# Lookup banyak (hash_type, hash_value) sekaligus: cache dulu, sisanya dengan get_all per CHECK_BATCH_READ_SIZE dokumen.
+# Mengembalikan {doc_id: dict metadata atau None}.
+def find_file_metadata_many(pairs) -> dict:
+    found = {}
+    missing = []
+    for hash_type, hash_value in pairs:
+        doc_id = metadata_doc_id(hash_type, hash_value)
+        if doc_id in found:
+            continue
+        metadata = metadata_cache.get(doc_id)
+        if metadata is MetadataCache.MISSING:
+            found[doc_id] = None
+            missing.append(metadata_ref(hash_type, hash_value))
+        else:
+            found[doc_id] = metadata
+
+    for start in range(0, len(missing), CHECK_BATCH_READ_SIZE):
+        group = missing[start:start + CHECK_BATCH_READ_SIZE]
+        with phase("firestore_read"):
+            for snapshot in db.get_all(group):
+                if snapshot.exists:
+                    found[snapshot.id] = snapshot.to_dict()
+        for ref in group:
+            metadata_cache.put(ref.id, found[ref.id])
+    return found
+
+# Upload yang menulis record baru membuang entry cache untuk hash tersebut
+def invalidate_file_metadata(hash_value: str):
+    metadata_cache.invalidate_hash(hash_value)
+
+# Menyimpan upload ke GCS.
+# Mode biasa: hash dan upload dalam satu pass ke nama file asli.
+# Mode content-addressed: body (sudah di-spool oleh werkzeug) di-hash dulu, lalu diunggah
+# ke content_object_name() hanya jika digest tersebut belum ada di file_metadata.
+def store_upload(stream, file_name: str, hash_type: str, hasher, outboard=None) -> dict:
+    chunk_index = ChunkIndexBuilder(CHUNK_INDEX_CHUNK_SIZE) if CHUNK_INDEX else None
+    # Outboard tree and chunk digests are single-threaded work, scheduled like the BLAKE3 hasher
+    hashers = [hasher] + [ScheduledHasher(h, 1) for h in (outboard, chunk_index) if h is not None]
+    if not CONTENT_ADDRESSED_STORAGE:
+        size = stream_upload_to_gcs(stream, file_name, hashers)
+        hash_value = hasher.hexdigest()
+        return {"object_name": file_name, "hash_value": hash_value, "size": size, "existing": None,
+                "outboard": store_outboard(outboard, hash_value, file_name),
+                "chunk_index": store_chunk_index(chunk_index, file_name)}
+
+    size = hash_stream(stream, hashers)
+    hash_value = hasher.hexdigest()
+    existing = find_file_metadata(hash_value, hash_type)
+    if existing is not None:
+        return {"object_name": existing.get('file_name'), "hash_value": hash_value, "size": size, "existing": existing}
+
+    object_name = content_object_name(hash_value)
+    stream.seek(0)
+    stream_upload_to_gcs(stream, object_name)
+    return {"object_name": object_name, "hash_value": hash_value, "size": size, "existing": None,
+            "outboard": store_outboard(outboard, hash_value, object_name),
+            "chunk_index": store_chunk_index(chunk_index, object_name)}
+
+# Outboard tree untuk upload baru, atau None jika OUTBOARD_TREES dimatikan
+def new_outboard_hasher(hash_type: str, key_bytes: bytes = None, context=None):
+    if not OUTBOARD_TREES:
+        return None
+    return OutboardHasher(hash_type, key_bytes=key_bytes, context=context, group_log=OUTBOARD_GROUP_LOG,
+                          batch_size=UPLOAD_CHUNK_SIZE)
+
+# Menyimpan outboard di samping objeknya; root tree harus sama dengan hash dari blake3-py
+def store_outboard(outboard, hash_value: str, object_name: str):
+    if outboard is None:
+        return None
+    if outboard.hexdigest() != hash_value:
+        raise ValueError("Outboard tree root does not match the BLAKE3 hash")
+    name = outboard_object_name(object_name)
+    upload_to_gcs(outboard.outboard(), name)
+    return {"object_name": name, "group_log": outboard.group_log}
+
+# Menyimpan tabel digest per chunk di samping objeknya
+def store_chunk_index(chunk_index, object_name: str):
+    if chunk_index is None:
+        return None
+    name = chunk_index_object_name(object_name)
+    upload_to_gcs(chunk_index.packed(), name)
+    return {"object_name": name, "chunk_size": chunk_index.chunk_size}
+
+# Menyusun penulisan metadata untuk sebuah upload: (document ref, data, mode "set" | "merge" | "update")
+def file_metadata_write(stored: dict, hash_type: str, file_name: str):
+    data, mode = metadata_write(stored, hash_type, file_name, CONTENT_ADDRESSED_STORAGE)
+    return metadata_ref(hash_type, stored["hash_value"]), data, mode
+
+# Simpan metadata ke Firestore
+def save_file_metadata(stored: dict, hash_type: str, file_name: str):
+    ref, data, mode = file_metadata_write(stored, hash_type, file_name)
+    with phase("firestore_write"):
+        if mode == "update":
+            ref.update(data)
+        else:
+            ref.set(data, merge=(mode == "merge"))
+    invalidate_file_metadata(stored["hash_value"])
+
+# Simpan metadata banyak upload sekaligus dengan WriteBatch per BATCH_COMMIT_SIZE dokumen.
+# Mengembalikan exception per hash_value untuk grup yang gagal di-commit.
+def save_file_metadata_batch(writes: list) -> dict:
+    pending = [
+        (metadata_ref(hash_type, hash_value), data, mode, hash_value)
+        for hash_type, hash_value, data, mode in coalesce_metadata_writes(writes, CONTENT_ADDRESSED_STORAGE)
+    ]
+
+    failures = {}
+    for start in range(0, len(pending), BATCH_COMMIT_SIZE):
+        group = pending[start:start + BATCH_COMMIT_SIZE]
+        batch = db.batch()
+        for ref, data, mode, _ in group:
+            if mode == "update":
+                batch.update(ref, data)
+            else:
+                batch.set(ref, data, merge=(mode == "merge"))
+        try:
+            with phase("firestore_write"):
+                batch.commit()
+        except Exception as e:
+            for _, _, _, hash_value in group:
+                failures[hash_value] = e
+        for _, _, _, hash_value in group:
+            invalidate_file_metadata(hash_value)
+    return failures
+
+# Iterasi file dari request batch: multipart (field "files", boleh berulang) atau body tar.
+# Member tar dibaca berurutan dari stream, jadi disalin ke file sementara sebelum diproses paralel.
+def iter_batch_files():
+    if request.mimetype in ("application/x-tar", "application/tar"):
+        with tarfile.open(fileobj=request.stream, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_SIZE)
+                with phase("body_read", member.size):
+                    shutil.copyfileobj(archive.extractfile(member), spool, UPLOAD_CHUNK_SIZE)
+                spool.seek(0)
+                yield member.name, spool
+        return
+    with phase("body_read"):
+        files = request.files.getlist('files') + request.files.getlist('file')
+    for file in files:
+        yield file.filename, file.stream
+
+# Hash dan upload satu file dari batch (dijalankan di thread pool)
+def ingest_batch_file(stream, file_name: str, hash_type: str, key_bytes: bytes) -> dict:
+    try:
+        context = f"{file_name} derive" if hash_type == "derive_keyed" else None
+        update_size = expected_update_size(stream_size(stream), UPLOAD_CHUNK_SIZE)
+        hasher = new_blake3_hasher(hash_type, key_bytes=key_bytes, context=context, update_size=update_size)
+        outboard = new_outboard_hasher(hash_type, key_bytes=key_bytes, context=context)
+        return store_upload(stream, file_name, hash_type, hasher, outboard)
+    finally:
+        stream.close()
+
+# Fungsi untuk mengambil blob beserta metadatanya (size, etag, generation) dari GCS
+def get_gcs_blob(file_name: str):
+    with phase("gcs_metadata"):
+        return gcs_pool.bucket().get_blob(file_name)
+
+# Fungsi untuk membaca blob [start, end) secara bertahap dengan ranged read.
+# Blob dari get_gcs_blob membawa generation, jadi semua chunk dibaca dari versi objek yang sama.
+def iter_gcs_chunks(blob, start: int = 0, end: int = None, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+    if end is None:
+        end = blob.size
+    position = start
+    while position < end:
+        stop = min(position + chunk_size, end)
+        with phase("gcs_download", stop - position):
+            chunk = blob.download_as_bytes(start=position, end=stop - 1, checksum=None)
+        yield chunk
+        position = stop
+
+# Menjalankan iterator di thread latar dengan buffer terbatas, sehingga unduhan chunk
+# berikutnya berjalan bersamaan dengan pemrosesan chunk saat ini
+def prefetch(iterator, depth: int = VERIFY_PREFETCH_CHUNKS):
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer():
+        try:
+            for chunk in iterator:
+                if not put((chunk, None)):
+                    return
+        except Exception as e:
+            put((None, e))
+            return
+        put((None, None))
+
+    threading.Thread(target=bind(producer), daemon=True).start()
+    try:
+        while True:
+            chunk, error = buffer.get()
+            if error is not None:
+                raise error
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Consumer stopped early (error or closed generator): let the producer exit
+        stop.set()
+
+# Fungsi untuk menghitung hash blob secara streaming: memori dibatasi oleh
+# VERIFY_CHUNK_SIZE * (VERIFY_PREFETCH_CHUNKS + 2), bukan ukuran objek
+# hash_slots (opsional) membatasi berapa hasher yang boleh berjalan bersamaan
+def stream_hash_blob(blob, hasher, hash_slots=None) -> str:
+    for chunk in prefetch(iter_gcs_chunks(blob, chunk_size=VERIFY_CHUNK_SIZE)):
+        if hash_slots is None:
+            with phase("hash", len(chunk)):
+                hasher.update(chunk)
+        else:
+            with hash_slots, phase("hash", len(chunk)):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+# Verifikasi satu entry /check-batch (dijalankan di thread pool)
+def verify_batch_entry(index: int, entry: dict, metadata, hash_slots) -> dict:
+    hash_value = entry['hash_value']
+    hash_type = entry.get('hash_type', 'regular')
+    result = {"index": index, "hash_value": hash_value, "hash_type": hash_type}
+    try:
+        blob = get_gcs_blob(metadata['file_name']) if metadata else None
+        if blob is None:
+            result["error"] = "File not found"
+            return result
+        key_bytes = entry['key'].encode('utf-8') if hash_type == "keyed" else None
+        update_size = expected_update_size(blob.size, VERIFY_CHUNK_SIZE)
+        hasher = new_blake3_hasher(hash_type, key_bytes=key_bytes, context=entry.get('context'), update_size=update_size)
+        data_download_hash = stream_hash_blob(blob, hasher, hash_slots)
+        result["Status"] = "Success" if data_download_hash == hash_value else "Data Integrity Check Failed!"
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+# Menjalankan verifikasi batch dan mengirim hasil sebagai NDJSON begitu setiap verifikasi selesai
+def stream_check_batch(entries: list):
+    hash_slots = threading.BoundedSemaphore(CHECK_BATCH_HASH_WORKERS)
+    failed = 0
+    valid = []
+    for index, entry in enumerate(entries):
+        error = check_batch_entry_error(entry)
+        if error is not None:
+            failed += 1
+            yield json.dumps({"index": index, "error": error}) + "\n"
+        else:
+            valid.append((index, entry))
+
+    pool = ThreadPoolExecutor(max_workers=CHECK_BATCH_IO_WORKERS)
+    try:
+        futures = []
+        for start in range(0, len(valid), CHECK_BATCH_READ_SIZE):
+            group = valid[start:start + CHECK_BATCH_READ_SIZE]
+            metadata = find_file_metadata_many([(entry.get('hash_type', 'regular'), entry['hash_value']) for _, entry in group])
+            for index, entry in group:
+                doc_id = metadata_doc_id(entry.get('hash_type', 'regular'), entry['hash_value'])
+                futures.append(pool.submit(bind(verify_batch_entry), index, entry, metadata[doc_id], hash_slots))
+
+        for future in as_completed(futures):
+            result = future.result()
+            if result.get("Status") != "Success":
+                failed += 1
+            yield json.dumps(result) + "\n"
+    finally:
+        # Client disconnected or all done: drop verifications that have not started yet
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    yield json.dumps({"done": True, "count": len(entries), "failed": failed}) + "\n"
+
+# If-Range: a range is only honoured while the client's validator still matches the object
+def range_is_fresh(blob) -> bool:
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == blob.etag
+    if if_range.date is not None:
+        return blob.updated is not None and blob.updated.replace(microsecond=0) <= if_range.date
+    return True
+
+# Range tunggal dari header Range untuk blob: ((start, end) atau None untuk seluruh objek, respons 416 atau None)
+def requested_range(blob):
+    if request.range is None or not range_is_fresh(blob):
+        return None, None
+    byte_range = request.range.range_for_length(blob.size)
+    if byte_range is None and len(request.range.ranges) == 1:
+        response = jsonify({"error": "Requested range not satisfiable"})
+        response.status_code = 416
+        response.headers['Content-Range'] = f"bytes */{blob.size}"
+        return None, response
+    return byte_range, None
+
+# Membaca header dan node parent dari objek outboard. Outboard kecil dibaca utuh, yang besar
+# hanya node yang dibutuhkan; node yang bersebelahan digabung dalam satu ranged read.
+def read_outboard_nodes(outboard_blob, offsets: list):
+    if outboard_blob.size <= OUTBOARD_FULL_READ_SIZE:
+        with phase("gcs_download", outboard_blob.size):
+            data = outboard_blob.download_as_bytes(checksum=None)
+        return data[:HEADER_LEN], {offset: data[offset:offset + PARENT_LEN] for offset in offsets}
+
+    runs = [[0, HEADER_LEN]]
+    for offset in sorted(offsets):
+        if offset == runs[-1][1]:
+            runs[-1][1] += PARENT_LEN
+        else:
+            runs.append([offset, offset + PARENT_LEN])
+    def read_run(run):
+        with phase("gcs_download", run[1] - run[0]):
+            return outboard_blob.download_as_bytes(start=run[0], end=run[1] - 1, checksum=None)
+
+    with ThreadPoolExecutor(max_workers=min(len(runs), OUTBOARD_READ_WORKERS)) as pool:
+        parts = list(pool.map(bind(read_run), runs))
+
+    nodes = {}
+    for (run_start, _), data in zip(runs, parts):
+        for position in range(HEADER_LEN if run_start == 0 else 0, len(data), PARENT_LEN):
+            nodes[run_start + position] = data[position:position + PARENT_LEN]
+    return parts[0][:HEADER_LEN], nodes
+
+# Slice (lihat blake3_tree.py) untuk [start, end) dari blob, sebagai iterator bytes.
+# Raises LookupError when the object has no outboard and ValueError when the outboard is stale.
+def open_object_slice(metadata: dict, blob, start: int, end: int):
+    outboard = metadata.get('outboard')
+    outboard_blob = get_gcs_blob(outboard['object_name']) if outboard else None
+    if outboard_blob is None:
+        raise LookupError("No outboard tree stored for this file")
+
+    group_log = outboard['group_log']
+    header, nodes = read_outboard_nodes(outboard_blob, slice_node_offsets(blob.size, start, end, group_log))
+    if content_length(header) != blob.size:
+        raise ValueError("Outboard tree does not match the stored object")
+    content_start, content_end = slice_content_range(blob.size, start, end, group_log)
+    return iter_encode_slice(header, nodes.__getitem__, iter_gcs_chunks(blob, content_start, content_end), start, end, group_log)
+
+# Membaca dan meng-hash chunk terpilih lewat ranged read paralel. Mengembalikan index chunk yang rusak.
+def scrub_chunks(blob, chunk_size: int, digests, chunk_ids: list) -> list:
+    def chunk_is_intact(index):
+        start, end = chunk_range(index, chunk_size, blob.size)
+        with phase("gcs_download", end - start):
+            data = blob.download_as_bytes(start=start, end=end - 1, checksum=None)
+        with phase("hash", len(data)):
+            return len(data) == end - start and chunk_digest(data) == expected_digest(digests, index)
+
+    if not chunk_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(chunk_ids), SCRUB_IO_WORKERS)) as pool:
+        intact = list(pool.map(bind(chunk_is_intact), chunk_ids))
+    return [index for index, ok in zip(chunk_ids, intact) if not ok]
+
+# Respons upload: durasi, puncak memori, cycles per byte dan waktu per fase dari request_metrics
+def upload_response(stored: dict, **extra):
+    return jsonify({
+        "file_name": stored["object_name"],
+        "hash_value": stored["hash_value"],
+        "deduplicated": stored["existing"] is not None,
+        **current_metrics().summary(stored["size"]),
+        **extra
+    })
+
+# Body yang di-stream setelah view selesai: metrik request dikirim setelah byte terakhir
+# (atau saat klien memutus koneksi dan server menutup iterator)
+def measured_body(body, status: int = 200):
+    metrics = current_metrics()
+    metrics.streaming = True
 
-def get_cpu_frequency():
-    return psutil.cpu_freq().current
+    def send():
+        try:
+            yield from body
+        finally:
+            metrics.finish(status)
+    return send()
 
 @app.route('/upload-keyed-hash', methods=['POST'])
 def upload_keyed_hash():
-    start_time = time.time()
-    process = psutil.Process(os.getpid())
-    start_mem = process.memory_info().rss
-
-    file = request.files['file']
-    file_data = file.read()
+    set_hash_type("keyed")
+    with phase("body_read"):
+        file = request.files['file']
+        key = request.form.get('key')
     file_name = file.filename
 
-    key = request.form.get('key')
     if key is None or len(key) != 32:
         return jsonify({"error": "Key must be provided and be exactly 32 bytes long"}), 400
     
-    #file_bytes = file_data.encode('utf-8')
     key_bytes = key.encode('utf-8')
-    hash_value = blake3_keyed_hash(file_data, key_bytes)
-    gcs_file_name = f"{file_name}"
-    upload_to_gcs(file_data, gcs_file_name)
-
-    # Simpan metadata ke Firestore
-    doc_ref = db.collection("file_metadata").document()
-    doc_ref.set({
-        'file_name': gcs_file_name,
-        'hash_value': hash_value,
-        'hash_type': "keyed"
-    })
-
-    end_time = time.time()
-    end_mem = process.memory_info().rss
-
-    elapsed_time = end_time - start_time
-    memory_usage = (end_mem - start_mem) / 1024  # Convert to KB
-
-    cpu_freq = get_cpu_frequency()
-    cycles = elapsed_time * cpu_freq
-    file_size_bytes = len(file_data)
-    throughput = cycles / file_size_bytes  # cycles per byte
-
-    return jsonify({
-        "file_name": gcs_file_name,
-        "hash_value": hash_value,
-        "time_elapsed": elapsed_time,
-        "memory_usage_MB": memory_usage,
-        "throughput_cpb": throughput
-    })
+    update_size = expected_update_size(stream_size(file.stream), UPLOAD_CHUNK_SIZE)
+    hasher = new_blake3_hasher("keyed", key_bytes=key_bytes, update_size=update_size)
+    outboard = new_outboard_hasher("keyed", key_bytes=key_bytes)
+    stored = store_upload(file.stream, file_name, "keyed", hasher, outboard)
+    save_file_metadata(stored, "keyed", file_name)
+    return upload_response(stored)
 
 @app.route('/upload-derive-keyed-hash', methods=['POST'])
 def upload_derive_keyed_hash():
-
-    start_time = time.time()
-    process = psutil.Process(os.getpid())
-    start_mem = process.memory_info().rss
-
-    file = request.files['file']
-    file_data = file.read()
+    set_hash_type("derive_keyed")
+    with phase("body_read"):
+        file = request.files['file']
     file_name = file.filename
 
     # Generate context from file metadata
-    last_modified = request.form.get('last_modified')
-    hash_type = request.form.get('hash_type')
     context = f"{file_name} derive"
     
-    hash_value = blake3_derive_keyed_hash(file_data, context)
-    gcs_file_name = f"{file_name}"
-    upload_to_gcs(file_data, gcs_file_name)
-
-    # Simpan metadata ke Firestore
-    doc_ref = db.collection("file_metadata").document()
-    doc_ref.set({
-        'file_name': gcs_file_name,
-        'hash_value': hash_value,
-        'hash_type': "derive_keyed"
-    })
-
-    end_time = time.time()
-    end_mem = process.memory_info().rss
-
-    elapsed_time = end_time - start_time
-    memory_usage = (end_mem - start_mem) / 1024  # Convert to KB
-
-    cpu_freq = get_cpu_frequency()
-    cycles = elapsed_time * cpu_freq
-    file_size_bytes = len(file_data)
-    throughput = cycles / file_size_bytes  # cycles per byte
-
-    return jsonify({
-        "file_name": gcs_file_name,
-        "hash_value": hash_value,
-        "time_elapsed": elapsed_time,
-        "memory_usage_MB": memory_usage,
-        "throughput_cpb": throughput,
-        "context": context
-    })
+    update_size = expected_update_size(stream_size(file.stream), UPLOAD_CHUNK_SIZE)
+    hasher = new_blake3_hasher("derive_keyed", context=context, update_size=update_size)
+    outboard = new_outboard_hasher("derive_keyed", context=context)
+    stored = store_upload(file.stream, file_name, "derive_keyed", hasher, outboard)
+    save_file_metadata(stored, "derive_keyed", file_name)
+    return upload_response(stored, context=context)
 
 @app.route('/upload-regular-hash', methods=['POST'])
 def upload():
-    start_time = time.time()
-    process = psutil.Process(os.getpid())
-    start_mem = process.memory_info().rss
-
-    file = request.files['file']
-    file_data = file.read()
+    set_hash_type("regular")
+    with phase("body_read"):
+        file = request.files['file']
     file_name = file.filename
 
-    hash_value = blake3_regular_hash(file_data)
-    gcs_file_name = f"{file_name}"
-    upload_to_gcs(file_data, gcs_file_name)
-
-    # Simpan metadata ke Firestore
-    doc_ref = db.collection("file_metadata").document()
-    doc_ref.set({
-        'file_name': gcs_file_name,
-        'hash_value': hash_value,
-        'hash_type': "regular"
-    })
-
-    end_time = time.time()
-    end_mem = process.memory_info().rss
-
-    elapsed_time = end_time - start_time
-    memory_usage = (end_mem - start_mem) / 1024  # Convert to KB
-
-    cpu_freq = get_cpu_frequency()
-    cycles = elapsed_time * cpu_freq
-    file_size_bytes = len(file_data)
-    throughput = cycles / file_size_bytes  # cycles per byte
-
-    return jsonify({
-        "file_name": gcs_file_name,
-        "hash_value": hash_value,
-        "time_elapsed": elapsed_time,
-        "memory_usage_MB": memory_usage,
-        "throughput_cpb": throughput
-    })
+    update_size = expected_update_size(stream_size(file.stream), UPLOAD_CHUNK_SIZE)
+    hasher = new_blake3_hasher("regular", update_size=update_size)
+    outboard = new_outboard_hasher("regular")
+    stored = store_upload(file.stream, file_name, "regular", hasher, outboard)
+    save_file_metadata(stored, "regular", file_name)
+    return upload_response(stored)
+
+@app.route('/upload-batch', methods=['POST'])
+def upload_batch():
+    # Parameter dari form (multipart) atau query string (body tar)
+    with phase("body_read"):
+        params = request.args if request.mimetype in ("application/x-tar", "application/tar") else request.form
+    hash_type = params.get('hash_type', 'regular')
+    set_hash_type(hash_type)
+    if hash_type not in HASH_TYPES:
+        return jsonify({"error": f"hash_type must be one of {', '.join(HASH_TYPES)}"}), 400
+
+    key_bytes = None
+    if hash_type == "keyed":
+        key = params.get('key')
+        if key is None or len(key) != 32:
+            return jsonify({"error": "Key must be provided and be exactly 32 bytes long"}), 400
+        key_bytes = key.encode('utf-8')
+
+    # Semaphore membatasi jumlah file yang sudah dibaca tetapi belum selesai diunggah
+    in_flight = threading.BoundedSemaphore(BATCH_UPLOAD_WORKERS * 2)
+
+    def ingest(stream, file_name):
+        try:
+            return ingest_batch_file(stream, file_name, hash_type, key_bytes)
+        finally:
+            in_flight.release()
+
+    names = []
+    futures = []
+    archive_error = None
+    with ThreadPoolExecutor(max_workers=BATCH_UPLOAD_WORKERS) as pool:
+        try:
+            for file_name, stream in iter_batch_files():
+                in_flight.acquire()
+                names.append(file_name)
+                futures.append(pool.submit(bind(ingest), stream, file_name))
+        except tarfile.TarError as e:
+            # Members before the bad block are already in GCS: their metadata is still written below
+            archive_error = f"Invalid tar stream: {e}"
+
+    results = []
+    writes = []
+    for file_name, future in zip(names, futures):
+        try:
+            stored = future.result()
+        except Exception as e:
+            results.append({"file_name": file_name, "status": "error", "error": str(e)})
+            continue
+        writes.append((stored, hash_type, file_name))
+        result = {
+            "file_name": file_name,
+            "status": "ok",
+            "stored_as": stored["object_name"],
+            "hash_value": stored["hash_value"],
+            "size": stored["size"],
+            "deduplicated": stored["existing"] is not None
+        }
+        if hash_type == "derive_keyed":
+            result["context"] = f"{file_name} derive"
+        results.append(result)
+
+    failures = save_file_metadata_batch(writes)
+    for result in results:
+        error = failures.get(result.get("hash_value"))
+        if error is not None:
+            result["status"] = "error"
+            result["error"] = str(error)
+
+    response = {
+        "hash_type": hash_type,
+        "count": len(results),
+        "failed": sum(1 for result in results if result["status"] != "ok"),
+        "files": results,
+        "time_elapsed": current_metrics().elapsed()
+    }
+    if archive_error is not None:
+        response["error"] = archive_error
+        return jsonify(response), 400
+    return jsonify(response)
 
 @app.route('/check-regular-hash/<hash_value>', methods=['GET'])
 def check_regular_hash(hash_value):
-    metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).where('hash_type', '==', 'regular').limit(1).get()
-    metadata = metadata_ref[0].to_dict() if metadata_ref else None
+    set_hash_type("regular")
+    metadata = find_file_metadata(hash_value, 'regular')
     if not metadata:
         return jsonify({"error": "File not found"}), 404
 
-    file_data = download_from_gcs(metadata['file_name'])
-    
-    data_download_hash = blake3_regular_hash(file_data)
+    blob = get_gcs_blob(metadata['file_name'])
+    if blob is None:
+        return jsonify({"error": "File not found"}), 404
+
+    data_download_hash = stream_hash_blob(blob, new_blake3_hasher("regular", update_size=expected_update_size(blob.size, VERIFY_CHUNK_SIZE)))
     if data_download_hash != hash_value:
         return jsonify({"Status": "Data Integrity Check Failed!"})
     return jsonify({"Status": "Success", "hash_value": data_download_hash})
@@ -199,138 +728,232 @@ def check_regular_hash(hash_value):
 
 @app.route('/check-keyed-hash/<hash_value>', methods=['GET'])
 def check_keyed_hash(hash_value):
-    metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).where('hash_type', '==', 'keyed').limit(1).get()
-    metadata = metadata_ref[0].to_dict() if metadata_ref else None
+    set_hash_type("keyed")
+    metadata = find_file_metadata(hash_value, 'keyed')
     if not metadata:
         return jsonify({"error": "File not found"}), 404
     
     key = request.form.get('key')
     if key is None or len(key) != 32:
         return jsonify({"error": "Key must be provided and be exactly 32 bytes long"}), 400
-    file_data = download_from_gcs(metadata['file_name'])
+    blob = get_gcs_blob(metadata['file_name'])
+    if blob is None:
+        return jsonify({"error": "File not found"}), 404
     key_bytes = key.encode('utf-8')
 
-    data_download_hash = blake3_keyed_hash(file_data, key_bytes)
+    data_download_hash = stream_hash_blob(blob, new_blake3_hasher("keyed", key_bytes=key_bytes, update_size=expected_update_size(blob.size, VERIFY_CHUNK_SIZE)))
     if data_download_hash != hash_value:
         return jsonify({"Status": "Data Integrity Check Failed!"})
     return jsonify({"Status": "Success", "hash_value": data_download_hash})
 
 @app.route('/check-derive-keyed-hash/<hash_value>', methods=['GET'])
 def check_derive_keyed_hash(hash_value):
-    metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).where('hash_type', '==', 'derive_keyed').limit(1).get()
-    metadata = metadata_ref[0].to_dict() if metadata_ref else None
+    set_hash_type("derive_keyed")
+    metadata = find_file_metadata(hash_value, 'derive_keyed')
     if not metadata:
         return jsonify({"error": "File not found"}), 404
     
     context = request.form.get('context')
 
-    file_data = download_from_gcs(metadata['file_name'])
+    blob = get_gcs_blob(metadata['file_name'])
+    if blob is None:
+        return jsonify({"error": "File not found"}), 404
 
-    data_download_hash = blake3_derive_keyed_hash(file_data, context)
+    data_download_hash = stream_hash_blob(blob, new_blake3_hasher("derive_keyed", context=context, update_size=expected_update_size(blob.size, VERIFY_CHUNK_SIZE)))
     if data_download_hash != hash_value:
         return jsonify({"Status": "Data Integrity Check Failed!"})
     return jsonify({"Status": "Success", "hash_value": data_download_hash})
 
+@app.route('/check-batch', methods=['POST'])
+def check_batch():
+    payload = request.get_json(silent=True)
+    entries = payload.get('entries') if isinstance(payload, dict) else payload
+    if not isinstance(entries, list):
+        return jsonify({"error": "Body must be a JSON list of {hash_value, hash_type, key|context} entries"}), 400
+
+    return Response(measured_body(stream_check_batch(entries)), mimetype="application/x-ndjson")
+
 @app.route('/download/<hash_value>', methods=['GET'])
 def download_file(hash_value):
     try:
-        metadata_ref = db.collection('file_metadata').where('hash_value', '==', hash_value).stream()
-        metadata = next(metadata_ref, None)
+        metadata = find_any_file_metadata(hash_value)
         if not metadata:
             return jsonify({"error": "File not found"}), 404
+        set_hash_type(metadata.get('hash_type'))
+
+        file_name = metadata['file_name']
 
-        metadata_dict = metadata.to_dict()
-        file_name = metadata_dict['file_name']
-        
-        file_data = download_from_gcs(file_name)
-        return send_file(io.BytesIO(file_data), download_name=file_name, as_attachment=True)
+        blob = get_gcs_blob(file_name)
+        if blob is None:
+            return jsonify({"error": "File not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 404
-    
 
-# some endpoint for testing
+    # Range tunggal dilayani dengan 206, multi-range atau If-Range yang kadaluarsa dapat 200 penuh
+    size = blob.size
+    byte_range, error_response = requested_range(blob)
+    if error_response is not None:
+        return error_response
+    start, end = byte_range or (0, size)
+
+    # verify=1: bytes diautentikasi terhadap hash_value lewat outboard tree sebelum dikirim.
+    # Only regular hashes can be checked server-side; keyed modes need the client's key (use /slice).
+    body = iter_gcs_chunks(blob, start, end)
+    if request.args.get('verify') == '1':
+        if metadata.get('hash_type') != 'regular':
+            return jsonify({"error": "verify is only supported for regular hashes, use /slice"}), 400
+        try:
+            object_slice = open_object_slice(metadata, blob, start, end)
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 409
+        body = iter_decode_slice(object_slice, hash_value, start, end, metadata['outboard']['group_log'])
+
+    status = 206 if byte_range else 200
+    response = Response(
+        measured_body(body, status),
+        status=status,
+        mimetype=blob.content_type or "application/octet-stream",
+        direct_passthrough=True,
+    )
+    response.content_length = end - start
+    if byte_range:
+        response.content_range = ContentRange("bytes", start, end, size)
+    response.accept_ranges = "bytes"
+    response.set_etag(blob.etag)
+    response.last_modified = blob.updated
+    response.headers.set('Content-Disposition', 'attachment', filename=metadata.get('original_name', file_name))
+    return response
+
+# Slice terverifikasi untuk range dari header Range (tanpa Range: seluruh file): node parent di jalur
+# range ditambah grup leaf yang tercakup. Klien memverifikasinya dengan blake3_tree.decode_slice.
+@app.route('/slice/<hash_value>', methods=['GET'])
+def slice_file(hash_value):
+    try:
+        metadata = find_any_file_metadata(hash_value)
+        blob = get_gcs_blob(metadata['file_name']) if metadata else None
+        if blob is None:
+            return jsonify({"error": "File not found"}), 404
+        set_hash_type(metadata.get('hash_type'))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 404
 
-# @app.route('/keyed', methods=['POST'])
-# def keyed():
-#     text = "\x00\x01"
-#     key = "whats the Elvish word for friend"
+    byte_range, error_response = requested_range(blob)
+    if error_response is not None:
+        return error_response
+    start, end = byte_range or (0, blob.size)
+
+    try:
+        object_slice = open_object_slice(metadata, blob, start, end)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+
+    response = Response(measured_body(object_slice), mimetype="application/octet-stream", direct_passthrough=True)
+    response.headers['X-Slice-Start'] = str(start)
+    response.headers['X-Slice-End'] = str(end)
+    response.headers['X-Hash-Type'] = metadata.get('hash_type', 'regular')
+    response.headers['X-Outboard-Group-Log'] = str(metadata['outboard']['group_log'])
+    response.set_etag(blob.etag)
+    return response
+
+# Scrub: memeriksa sampel acak (sample=0.03) atau daftar chunk eksplisit (chunks=0,5,9) terhadap
+# tabel digest per chunk, tanpa mengunduh seluruh objek. Chunk yang rusak dilaporkan sebagai byte range.
+@app.route('/scrub/<hash_value>', methods=['GET'])
+def scrub_file(hash_value):
+    try:
+        sample = float(request.args.get('sample', SCRUB_SAMPLE))
+        chunks = request.args.get('chunks')
+        chunks = [int(index) for index in chunks.split(',') if index] if chunks is not None else None
+    except ValueError:
+        return jsonify({"error": "sample must be a number and chunks a comma-separated list of chunk numbers"}), 400
+    if not 0 < sample <= 1:
+        return jsonify({"error": "sample must be in (0, 1]"}), 400
+
+    metadata = find_any_file_metadata(hash_value)
+    blob = get_gcs_blob(metadata['file_name']) if metadata else None
+    if blob is None:
+        return jsonify({"error": "File not found"}), 404
+    set_hash_type(metadata.get('hash_type'))
+    index_blob = get_gcs_blob(metadata['chunk_index']['object_name']) if metadata.get('chunk_index') else None
+    if index_blob is None:
+        return jsonify({"error": "No chunk index stored for this file"}), 404
+
+    try:
+        with phase("gcs_download", index_blob.size):
+            index_data = index_blob.download_as_bytes()
+        chunk_size, content_len, digests = unpack_chunk_index(index_data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+
+    total = chunk_count(content_len, chunk_size)
+    chunk_ids = select_chunks(total, sample=sample, chunks=chunks, seed=request.args.get('seed'))
+    corrupt = []
+    if blob.size != content_len:
+        # Truncated or extended object: every chunk from the first one whose length changed is corrupt
+        first_changed = min(blob.size, content_len) // chunk_size
+        chunk_ids = [index for index in chunk_ids if index < first_changed]
+        corrupt = list(range(first_changed, total))
+    corrupt = sorted(set(corrupt + scrub_chunks(blob, chunk_size, digests, chunk_ids)))
+    ranges = corrupt_ranges(corrupt, chunk_size, content_len)
+    if blob.size > content_len:
+        # Bytes past the recorded length; joined to a corrupt last chunk when they touch it
+        if ranges and ranges[-1]["end"] == content_len:
+            ranges[-1]["end"] = blob.size
+        else:
+            ranges.append({"start": content_len, "end": blob.size})
+
+    return jsonify({
+        "Status": "Success" if not (corrupt or ranges) else "Data Integrity Check Failed!",
+        "hash_value": hash_value,
+        "size": blob.size,
+        "chunk_size": chunk_size,
+        "chunks_total": total,
+        "chunks_checked": len(chunk_ids),
+        "corrupt_chunks": corrupt,
+        "corrupt_ranges": ranges
+    })
+
+# Metrik per request (lihat request_metrics.py). Streamed bodies (download, slice, check-batch)
+# are measured until the last byte is sent, see measured_body().
+@app.before_request
+def begin_request_metrics():
+    start_request(request.url_rule.rule if request.url_rule else "unmatched")
+
+@app.after_request
+def finish_request_metrics(response):
+    metrics = current_metrics()
+    if metrics is not None and not metrics.streaming:
+        metrics.finish(response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics_payload(), content_type=CONTENT_TYPE_LATEST)
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "gcs_pool": gcs_pool.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "blake3_threading": threading_policy.stats(),
+        "hash_scheduler": hash_scheduler.stats(),
+        "tree_templates": tree_templates.stats()
+    })
+
+start_memory_tracing()
+
+if BLAKE3_CALIBRATE:
+    threading_policy.calibrate()
+
+if GCS_WARMUP:
+    try:
+        gcs_pool.warm_up()
+    except Exception as e:
+        print(f"GCS warm-up failed: {e}")
 
-#     text_bytes = text.encode('utf-8')
-#     key_bytes = key.encode('utf-8')
-#     hash_value = blake3_keyed_hash(text_bytes, key_bytes)
-    
-#     return jsonify({
-#         "text": text,
-#         "key": key,
-#         "hash_value": hash_value
-#     })
-    
-# @app.route('/regular', methods=['POST'])
-# def reguler():
-#     text = "\x00\x01"
-    
-#     text_bytes = text.encode('utf-8')
-#     hash_value = blake3_regular_hash(text_bytes)
-    
-#     return jsonify({
-#         "text": text,
-#         "hash_value": hash_value
-#     })
-    
-# @app.route('/derived', methods=['POST'])
-# def derive():
-#     text = "\x00\x01"
-#     context = "BLAKE3 2019-12-27 16:29:52 test vectors context"
-    
-#     text_bytes = text.encode('utf-8')
-#     hash_value = blake3_derive_keyed_hash(text_bytes, context)
-    
-#     return jsonify({
-#         "text": text,
-#         "context": context,
-#         "hash_value": hash_value
-#     })
-
-# @app.route('/test-second-preimage-regular', methods=['POST'])
-# def test_second_preimage_regular():
-#     message = "ini adalah pesan rahasia"
-    
-#     message_bytes = message.encode('utf-8')
-#     hash_value = blake3_regular_hash(message_bytes)
-    
-#     return jsonify({
-#         "message": message,
-#         "hash_value": hash_value
-#     })
-
-# @app.route('/test-second-preimage-keyed', methods=['POST'])
-# def test_second_preimage_keyed():
-#     message = "ini adalah pesan rahasia"
-#     key = "9ce463671338a2a2966dd8470296daa5"
-
-#     message_bytes = message.encode('utf-8')
-#     key_bytes = key.encode('utf-8')
-#     hash_value = blake3_keyed_hash(message_bytes, key_bytes)
-    
-#     return jsonify({
-#         "message": message,
-#         "hash_value": hash_value,
-#         "key": key
-#     })
-
-# @app.route('/test-second-preimage-derive-keyed', methods=['POST'])
-# def test_second_preimage_derive_keyed():
-#     message = "ini adalah pesan rahasia"
-#     context = "blake3 2024-08-20 12:00:00 test second preimage"
-
-#     message_bytes = message.encode('utf-8')
-#     hash_value = blake3_regular_hash(message_bytes)
-    
-#     return jsonify({
-#         "message": message,
-#         "hash_value": hash_value,
-#         "context": context
-#     })
 
 if __name__ == '__main__':
     app.run(debug=False, host='0.0.0.0', port=8080)
\ No newline at end of file
@@ -0,0 +1,705 @@
+from quart import Quart, request, jsonify, Response
+from werkzeug.datastructures import ContentRange
+from google.cloud import firestore
+from gcloud.aio.auth import Token
+from urllib.parse import quote
+import aiohttp
+import asyncio
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import time
+from blake3_hashing import BLAKE3_CALIBRATE, HASH_TYPES, new_blake3_hasher, threading_policy, hash_scheduler, ScheduledHasher, expected_update_size, stream_size
+from blake3_tree import OutboardHasher, tree_templates
+from chunk_index import ChunkIndexBuilder
+from file_metadata import MetadataCache, metadata_doc_id, content_object_name, outboard_object_name, chunk_index_object_name, metadata_write, coalesce_metadata_writes, check_batch_entry_error
+from request_metrics import start_request, current_metrics, set_hash_type, phase, add_phase, timed, metrics_payload, start_memory_tracing
+from prometheus_client import CONTENT_TYPE_LATEST
+
+# Varian asyncio dari gcp_app.py. Jalankan dengan: hypercorn gcp_app_async:app
+# GCS diakses lewat aiohttp (JSON API + resumable upload), Firestore lewat AsyncClient,
+# dan hashing dijalankan di thread pool sehingga event loop tetap melayani request lain.
+# Routes: uploads, /upload-batch, checks, /check-batch, /download, /metrics and /stats. Verified range
+# reads (/slice) and scrubs (/scrub) are only served by gcp_app.py; the outboard trees and chunk digest
+# tables they read are written by the uploads here as well.
+#
+# Phase times: hash and body_read run in threads and are timed there (timed()). The GCS and Firestore
+# phases time the awaited call with wall clock, so they include any time the event loop spent on other
+# tasks before resuming this request; under load read them as latency seen by the request, not I/O work.
+
+app = Quart(__name__)
+# Upload besar di-stream ke file sementara oleh form parser; batas dan timeout bawaan Quart dimatikan
+app.config["MAX_CONTENT_LENGTH"] = None
+app.config["BODY_TIMEOUT"] = None
+app.config["RESPONSE_TIMEOUT"] = None
+
+# Konfigurasi Google Cloud Storage
+BUCKET_NAME = "blake3-api-storage"
+GCS_API = "https://storage.googleapis.com/storage/v1/b"
+GCS_UPLOAD_API = "https://storage.googleapis.com/upload/storage/v1/b"
+GCS_SCOPES = ["https://www.googleapis.com/auth/devstorage.read_write"]
+
+# Same tunables as gcp_app.py
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("DOWNLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+VERIFY_CHUNK_SIZE = int(os.environ.get("VERIFY_CHUNK_SIZE", 4 * 1024 * 1024))
+GCS_POOL_SIZE = int(os.environ.get("GCS_POOL_SIZE", 32))
+CONTENT_ADDRESSED_STORAGE = os.environ.get("CONTENT_ADDRESSED_STORAGE", "0") == "1"
+METADATA_CACHE_SIZE = int(os.environ.get("METADATA_CACHE_SIZE", 10000))
+METADATA_CACHE_TTL = float(os.environ.get("METADATA_CACHE_TTL", 300))
+METADATA_CACHE_NEGATIVE_TTL = float(os.environ.get("METADATA_CACHE_NEGATIVE_TTL", 5))
+BATCH_UPLOAD_WORKERS = int(os.environ.get("BATCH_UPLOAD_WORKERS", 16))
+BATCH_COMMIT_SIZE = int(os.environ.get("BATCH_COMMIT_SIZE", 500))
+CHECK_BATCH_IO_WORKERS = int(os.environ.get("CHECK_BATCH_IO_WORKERS", 16))
+CHECK_BATCH_READ_SIZE = int(os.environ.get("CHECK_BATCH_READ_SIZE", 100))
+# Outboard trees (opt-in, as in gcp_app.py) and chunk digest tables are produced on upload here too
+OUTBOARD_TREES = os.environ.get("OUTBOARD_TREES", "0") == "1"
+OUTBOARD_GROUP_LOG = int(os.environ.get("OUTBOARD_GROUP_LOG", 4))
+CHUNK_INDEX = os.environ.get("CHUNK_INDEX", "1") == "1"
+CHUNK_INDEX_CHUNK_SIZE = int(os.environ.get("CHUNK_INDEX_CHUNK_SIZE", 1024 * 1024))
+
+# Hashing threads (CPU parallelism) and transfers allowed in flight at once; every transfer
+# holds at most ~2 chunks, so memory is bounded by MAX_TRANSFERS * 2 * chunk size
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", os.cpu_count() or 1))
+MAX_TRANSFERS = int(os.environ.get("MAX_TRANSFERS", 64))
+
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="blake3")
+metadata_cache = MetadataCache(METADATA_CACHE_SIZE, METADATA_CACHE_TTL, METADATA_CACHE_NEGATIVE_TTL)
+
+# Dibuat di before_serving karena harus terikat ke event loop server
+db = None
+transfer_slots = None
+
+# Klien GCS async: satu aiohttp session (pool koneksi keep-alive) per worker
+class AsyncGcs:
+    def __init__(self, bucket_name: str, pool_size: int):
+        self.bucket_name = bucket_name
+        self.pool_size = pool_size
+        self.session = None
+        self.token = None
+
+    async def open(self):
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        self.token = Token(session=self.session, scopes=GCS_SCOPES)
+        # Ambil token pertama saat boot, bukan saat request pertama
+        await self.token.get()
+
+    async def close(self):
+        await self.session.close()
+
+    async def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {await self.token.get()}"}
+
+    def _object_url(self, name: str) -> str:
+        return f"{GCS_API}/{self.bucket_name}/o/{quote(name, safe='')}"
+
+    # Metadata objek (size, etag, generation, updated, contentType) atau None
+    async def get_blob(self, name: str):
+        with phase("gcs_metadata"):
+            async with self.session.get(self._object_url(name), headers=await self._headers()) as resp:
+                if resp.status == 404:
+                    return None
+                resp.raise_for_status()
+                return await resp.json()
+
+    # Membaca [start, end) dari generation yang sama lewat satu ranged GET, dikumpulkan per chunk_size.
+    # gcs_download counts the time spent fetching each chunk, not the time the consumer holds it.
+    async def iter_chunks(self, blob: dict, start: int, end: int, chunk_size: int):
+        if start >= end:
+            return
+        fetch_started = time.perf_counter_ns()
+        headers = await self._headers()
+        headers["Range"] = f"bytes={start}-{end - 1}"
+        params = {"alt": "media", "generation": blob["generation"]}
+        async with self.session.get(self._object_url(blob["name"]), headers=headers, params=params) as resp:
+            resp.raise_for_status()
+            pending = []
+            pending_size = 0
+            async for piece in resp.content.iter_chunked(chunk_size):
+                pending.append(piece)
+                pending_size += len(piece)
+                if pending_size >= chunk_size:
+                    add_phase("gcs_download", time.perf_counter_ns() - fetch_started, pending_size)
+                    yield b"".join(pending)
+                    fetch_started = time.perf_counter_ns()
+                    pending = []
+                    pending_size = 0
+            if pending:
+                add_phase("gcs_download", time.perf_counter_ns() - fetch_started, pending_size)
+                yield b"".join(pending)
+
+    # Resumable upload: chunk berikutnya dibaca dan chunk saat ini di-hash sementara chunk saat ini dikirim
+    async def upload_stream(self, stream, name: str, hasher=None) -> int:
+        headers = await self._headers()
+        headers["X-Upload-Content-Type"] = "application/octet-stream"
+        params = {"uploadType": "resumable", "name": name}
+        with phase("gcs_upload"):
+            async with self.session.post(f"{GCS_UPLOAD_API}/{self.bucket_name}/o", params=params, headers=headers) as resp:
+                resp.raise_for_status()
+                session_uri = resp.headers["Location"]
+
+        loop = asyncio.get_running_loop()
+        offset = 0
+        chunk = await loop.run_in_executor(None, timed("body_read", stream.read), UPLOAD_CHUNK_SIZE)
+        while True:
+            next_read = loop.run_in_executor(None, timed("body_read", stream.read), UPLOAD_CHUNK_SIZE)
+            hashing = loop.run_in_executor(hash_executor, timed("hash", hasher.update, len(chunk)), chunk) if hasher is not None and chunk else None
+            next_chunk = await next_read
+            await self._put_chunk(session_uri, chunk, offset, final=not next_chunk)
+            if hashing is not None:
+                await hashing
+            offset += len(chunk)
+            if not next_chunk:
+                return offset
+            chunk = next_chunk
+
+    async def _put_chunk(self, session_uri: str, chunk: bytes, offset: int, final: bool):
+        total = str(offset + len(chunk)) if final else "*"
+        content_range = f"bytes {offset}-{offset + len(chunk) - 1}/{total}" if chunk else f"bytes */{total}"
+        with phase("gcs_upload", len(chunk)):
+            async with self.session.put(session_uri, data=chunk, headers={"Content-Range": content_range}) as resp:
+                # 308 = chunk diterima, upload belum selesai
+                if final or resp.status != 308:
+                    resp.raise_for_status()
+
+gcs = AsyncGcs(BUCKET_NAME, GCS_POOL_SIZE)
+
+@app.before_serving
+async def startup():
+    global db, transfer_slots
+    db = firestore.AsyncClient()
+    transfer_slots = asyncio.Semaphore(MAX_TRANSFERS)
+    await gcs.open()
+    start_memory_tracing()
+    if BLAKE3_CALIBRATE:
+        # Blocking hashing work, so off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, threading_policy.calibrate)
+
+@app.after_serving
+async def shutdown():
+    await gcs.close()
+
+def metadata_ref(hash_type: str, hash_value: str):
+    return db.collection('file_metadata').document(metadata_doc_id(hash_type, hash_value))
+
+async def find_file_metadata(hash_value: str, hash_type: str):
+    doc_id = metadata_doc_id(hash_type, hash_value)
+    metadata = metadata_cache.get(doc_id)
+    if metadata is MetadataCache.MISSING:
+        with phase("firestore_read"):
+            snapshot = await metadata_ref(hash_type, hash_value).get()
+        metadata = snapshot.to_dict() if snapshot.exists else None
+        metadata_cache.put(doc_id, metadata)
+    return metadata
+
+async def find_any_file_metadata(hash_value: str):
+    cache_key = metadata_doc_id("*", hash_value)
+    metadata = metadata_cache.get(cache_key)
+    if metadata is not MetadataCache.MISSING:
+        return metadata
+
+    snapshots = {}
+    with phase("firestore_read"):
+        async for snapshot in db.get_all([metadata_ref(t, hash_value) for t in HASH_TYPES]):
+            snapshots[snapshot.id] = snapshot
+    metadata = None
+    for hash_type in HASH_TYPES:
+        snapshot = snapshots.get(metadata_doc_id(hash_type, hash_value))
+        if snapshot is not None and snapshot.exists:
+            metadata = snapshot.to_dict()
+            break
+    metadata_cache.put(cache_key, metadata)
+    return metadata
+
+async def find_file_metadata_many(pairs) -> dict:
+    found = {}
+    missing = []
+    for hash_type, hash_value in pairs:
+        doc_id = metadata_doc_id(hash_type, hash_value)
+        if doc_id in found:
+            continue
+        metadata = metadata_cache.get(doc_id)
+        if metadata is MetadataCache.MISSING:
+            found[doc_id] = None
+            missing.append(metadata_ref(hash_type, hash_value))
+        else:
+            found[doc_id] = metadata
+
+    for start in range(0, len(missing), CHECK_BATCH_READ_SIZE):
+        group = missing[start:start + CHECK_BATCH_READ_SIZE]
+        with phase("firestore_read"):
+            async for snapshot in db.get_all(group):
+                if snapshot.exists:
+                    found[snapshot.id] = snapshot.to_dict()
+        for ref in group:
+            metadata_cache.put(ref.id, found[ref.id])
+    return found
+
+# Meng-hash stream lokal (body yang sudah di-spool) di thread pool
+async def hash_stream(stream, hasher) -> int:
+    loop = asyncio.get_running_loop()
+    total_size = 0
+    while True:
+        chunk = await loop.run_in_executor(None, timed("body_read", stream.read), UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return total_size
+        await loop.run_in_executor(hash_executor, timed("hash", hasher.update, len(chunk)), chunk)
+        total_size += len(chunk)
+
+# Meng-update hasher, outboard tree dan tabel digest per chunk dengan chunk yang sama, dalam satu job di hash_executor
+class UploadHashers:
+    def __init__(self, *hashers):
+        self.hashers = [hasher for hasher in hashers if hasher is not None]
+
+    def update(self, chunk):
+        for hasher in self.hashers:
+            hasher.update(chunk)
+
+def new_outboard_hasher(hash_type: str, key_bytes: bytes = None, context=None):
+    if not OUTBOARD_TREES:
+        return None
+    return OutboardHasher(hash_type, key_bytes=key_bytes, context=context, group_log=OUTBOARD_GROUP_LOG,
+                          batch_size=UPLOAD_CHUNK_SIZE)
+
+# Sama seperti store_outboard() di gcp_app.py
+async def store_outboard(outboard, hash_value: str, object_name: str):
+    if outboard is None:
+        return None
+    tree_root = await asyncio.get_running_loop().run_in_executor(hash_executor, timed("hash", outboard.hexdigest))
+    if tree_root != hash_value:
+        raise ValueError("Outboard tree root does not match the BLAKE3 hash")
+    name = outboard_object_name(object_name)
+    await gcs.upload_stream(io.BytesIO(outboard.outboard()), name)
+    return {"object_name": name, "group_log": outboard.group_log}
+
+async def store_chunk_index(chunk_index, object_name: str):
+    if chunk_index is None:
+        return None
+    name = chunk_index_object_name(object_name)
+    await gcs.upload_stream(io.BytesIO(chunk_index.packed()), name)
+    return {"object_name": name, "chunk_size": chunk_index.chunk_size}
+
+# Sama seperti store_upload() di gcp_app.py
+async def store_upload(stream, file_name: str, hash_type: str, hasher, outboard=None) -> dict:
+    chunk_index = ChunkIndexBuilder(CHUNK_INDEX_CHUNK_SIZE) if CHUNK_INDEX else None
+    hashers = UploadHashers(hasher, *(ScheduledHasher(h, 1) for h in (outboard, chunk_index) if h is not None))
+    async with transfer_slots:
+        if not CONTENT_ADDRESSED_STORAGE:
+            size = await gcs.upload_stream(stream, file_name, hashers)
+            hash_value = hasher.hexdigest()
+            return {"object_name": file_name, "hash_value": hash_value, "size": size, "existing": None,
+                    "outboard": await store_outboard(outboard, hash_value, file_name),
+                    "chunk_index": await store_chunk_index(chunk_index, file_name)}
+
+        size = await hash_stream(stream, hashers)
+        hash_value = hasher.hexdigest()
+        existing = await find_file_metadata(hash_value, hash_type)
+        if existing is not None:
+            return {"object_name": existing.get('file_name'), "hash_value": hash_value, "size": size, "existing": existing}
+
+        object_name = content_object_name(hash_value)
+        stream.seek(0)
+        await gcs.upload_stream(stream, object_name)
+        return {"object_name": object_name, "hash_value": hash_value, "size": size, "existing": None,
+                "outboard": await store_outboard(outboard, hash_value, object_name),
+                "chunk_index": await store_chunk_index(chunk_index, object_name)}
+
+async def save_file_metadata(stored: dict, hash_type: str, file_name: str):
+    data, mode = metadata_write(stored, hash_type, file_name, CONTENT_ADDRESSED_STORAGE)
+    ref = metadata_ref(hash_type, stored["hash_value"])
+    with phase("firestore_write"):
+        if mode == "update":
+            await ref.update(data)
+        else:
+            await ref.set(data, merge=(mode == "merge"))
+    metadata_cache.invalidate_hash(stored["hash_value"])
+
+async def save_file_metadata_batch(writes: list) -> dict:
+    pending = coalesce_metadata_writes(writes, CONTENT_ADDRESSED_STORAGE)
+    failures = {}
+    for start in range(0, len(pending), BATCH_COMMIT_SIZE):
+        group = pending[start:start + BATCH_COMMIT_SIZE]
+        batch = db.batch()
+        for hash_type, hash_value, data, mode in group:
+            if mode == "update":
+                batch.update(metadata_ref(hash_type, hash_value), data)
+            else:
+                batch.set(metadata_ref(hash_type, hash_value), data, merge=(mode == "merge"))
+        try:
+            with phase("firestore_write"):
+                await batch.commit()
+        except Exception as e:
+            for _, hash_value, _, _ in group:
+                failures[hash_value] = e
+        for _, hash_value, _, _ in group:
+            metadata_cache.invalidate_hash(hash_value)
+    return failures
+
+# Verifikasi streaming: chunk berikutnya diunduh sementara chunk saat ini di-hash di thread pool
+async def stream_hash_blob(blob: dict, hasher) -> str:
+    loop = asyncio.get_running_loop()
+    hashing = None
+    async with transfer_slots:
+        async for chunk in gcs.iter_chunks(blob, 0, int(blob["size"]), VERIFY_CHUNK_SIZE):
+            if hashing is not None:
+                await hashing
+            hashing = loop.run_in_executor(hash_executor, timed("hash", hasher.update, len(chunk)), chunk)
+        if hashing is not None:
+            await hashing
+    return hasher.hexdigest()
+
+def range_is_fresh(blob: dict) -> bool:
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == blob.get("etag")
+    if if_range.date is not None:
+        updated = parse_gcs_time(blob.get("updated"))
+        return updated is not None and updated.replace(microsecond=0) <= if_range.date
+    return True
+
+def parse_gcs_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+# Respons upload yang sama dengan gcp_app.py
+def upload_response(stored: dict, **extra):
+    return jsonify({
+        "file_name": stored["object_name"],
+        "hash_value": stored["hash_value"],
+        "deduplicated": stored["existing"] is not None,
+        **current_metrics().summary(stored["size"]),
+        **extra
+    })
+
+# Body yang di-stream setelah view selesai: metrik request dikirim setelah byte terakhir
+def measured_body(body, status: int = 200):
+    metrics = current_metrics()
+    metrics.streaming = True
+
+    async def send():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            metrics.finish(status)
+    return send()
+
+@app.route('/upload-keyed-hash', methods=['POST'])
+async def upload_keyed_hash():
+    set_hash_type("keyed")
+    with phase("body_read"):
+        files = await request.files
+        form = await request.form
+    file = files['file']
+    file_name = file.filename
+
+    key = form.get('key')
+    if key is None or len(key) != 32:
+        return jsonify({"error": "Key must be provided and be exactly 32 bytes long"}), 400
+
+    update_size = expected_update_size(stream_size(file.stream), UPLOAD_CHUNK_SIZE)
+    hasher = new_blake3_hasher("keyed", key_bytes=key.encode('utf-8'), update_size=update_size)
+    outboard = new_outboard_hasher("keyed", key_bytes=key.encode('utf-8'))
+    stored = await store_upload(file.stream, file_name, "keyed", hasher, outboard)
+    await save_file_metadata(stored, "keyed", file_name)
+    return upload_response(stored)
+
+@app.route('/upload-derive-keyed-hash', methods=['POST'])
+async def upload_derive_keyed_hash():
+    set_hash_type("derive_keyed")
+    with phase("body_read"):
+        files = await request.files
+    file = files['file']
+    file_name = file.filename
+    context = f"{file_name} derive"
+
+    update_size = expected_update_size(stream_size(file.stream), UPLOAD_CHUNK_SIZE)
+    hasher = new_blake3_hasher("derive_keyed", context=context, update_size=update_size)
+    outboard = new_outboard_hasher("derive_keyed", context=context)
+    stored = await store_upload(file.stream, file_name, "derive_keyed", hasher, outboard)
+    await save_file_metadata(stored, "derive_keyed", file_name)
+    return upload_response(stored, context=context)
+
+@app.route('/upload-regular-hash', methods=['POST'])
+async def upload():
+    set_hash_type("regular")
+    with phase("body_read"):
+        files = await request.files
+    file = files['file']
+    file_name = file.filename
+
+    update_size = expected_update_size(stream_size(file.stream), UPLOAD_CHUNK_SIZE)
+    hasher = new_blake3_hasher("regular", update_size=update_size)
+    outboard = new_outboard_hasher("regular")
+    stored = await store_upload(file.stream, file_name, "regular", hasher, outboard)
+    await save_file_metadata(stored, "regular", file_name)
+    return upload_response(stored)
+
+# Member tar disalin ke file sementara (dijalankan di thread pool karena tarfile sinkron)
+def spool_tar_members(body) -> list:
+    members = []
+    with tarfile.open(fileobj=body, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_SIZE)
+            shutil.copyfileobj(archive.extractfile(member), spool, UPLOAD_CHUNK_SIZE)
+            spool.seek(0)
+            members.append((member.name, spool))
+    return members
+
+@app.route('/upload-batch', methods=['POST'])
+async def upload_batch():
+    is_tar = request.mimetype in ("application/x-tar", "application/tar")
+
+    with phase("body_read"):
+        params = request.args if is_tar else await request.form
+    hash_type = params.get('hash_type', 'regular')
+    set_hash_type(hash_type)
+    if hash_type not in HASH_TYPES:
+        return jsonify({"error": f"hash_type must be one of {', '.join(HASH_TYPES)}"}), 400
+
+    key_bytes = None
+    if hash_type == "keyed":
+        key = params.get('key')
+        if key is None or len(key) != 32:
+            return jsonify({"error": "Key must be provided and be exactly 32 bytes long"}), 400
+        key_bytes = key.encode('utf-8')
+
+    if is_tar:
+        body = tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_SIZE)
+        with phase("body_read"):
+            async for data in request.body:
+                body.write(data)
+        body.seek(0)
+        try:
+            batch_files = await asyncio.get_running_loop().run_in_executor(None, timed("body_read", spool_tar_members), body)
+        except tarfile.TarError as e:
+            return jsonify({"error": f"Invalid tar stream: {e}"}), 400
+        finally:
+            body.close()
+    else:
+        with phase("body_read"):
+            files = await request.files
+        batch_files = [(file.filename, file.stream) for file in files.getlist('files') + files.getlist('file')]
+
+    workers = asyncio.Semaphore(BATCH_UPLOAD_WORKERS)
+
+    async def ingest(file_name, stream):
+        async with workers:
+            try:
+                context = f"{file_name} derive" if hash_type == "derive_keyed" else None
+                update_size = expected_update_size(stream_size(stream), UPLOAD_CHUNK_SIZE)
+                hasher = new_blake3_hasher(hash_type, key_bytes=key_bytes, context=context, update_size=update_size)
+                outboard = new_outboard_hasher(hash_type, key_bytes=key_bytes, context=context)
+                return await store_upload(stream, file_name, hash_type, hasher, outboard)
+            finally:
+                stream.close()
+
+    outcomes = await asyncio.gather(*(ingest(name, stream) for name, stream in batch_files), return_exceptions=True)
+
+    results = []
+    writes = []
+    for (file_name, _), stored in zip(batch_files, outcomes):
+        if isinstance(stored, Exception):
+            results.append({"file_name": file_name, "status": "error", "error": str(stored)})
+            continue
+        writes.append((stored, hash_type, file_name))
+        result = {
+            "file_name": file_name,
+            "status": "ok",
+            "stored_as": stored["object_name"],
+            "hash_value": stored["hash_value"],
+            "size": stored["size"],
+            "deduplicated": stored["existing"] is not None
+        }
+        if hash_type == "derive_keyed":
+            result["context"] = f"{file_name} derive"
+        results.append(result)
+
+    failures = await save_file_metadata_batch(writes)
+    for result in results:
+        error = failures.get(result.get("hash_value"))
+        if error is not None:
+            result["status"] = "error"
+            result["error"] = str(error)
+
+    return jsonify({
+        "hash_type": hash_type,
+        "count": len(results),
+        "failed": sum(1 for result in results if result["status"] != "ok"),
+        "files": results,
+        "time_elapsed": current_metrics().elapsed()
+    })
+
+async def check_hash(hash_value: str, hash_type: str, key_bytes: bytes = None, context=None):
+    set_hash_type(hash_type)
+    metadata = await find_file_metadata(hash_value, hash_type)
+    blob = await gcs.get_blob(metadata['file_name']) if metadata else None
+    if blob is None:
+        return jsonify({"error": "File not found"}), 404
+
+    update_size = expected_update_size(int(blob["size"]), VERIFY_CHUNK_SIZE)
+    hasher = new_blake3_hasher(hash_type, key_bytes=key_bytes, context=context, update_size=update_size)
+    data_download_hash = await stream_hash_blob(blob, hasher)
+    if data_download_hash != hash_value:
+        return jsonify({"Status": "Data Integrity Check Failed!"})
+    return jsonify({"Status": "Success", "hash_value": data_download_hash})
+
+@app.route('/check-regular-hash/<hash_value>', methods=['GET'])
+async def check_regular_hash(hash_value):
+    return await check_hash(hash_value, 'regular')
+
+@app.route('/check-keyed-hash/<hash_value>', methods=['GET'])
+async def check_keyed_hash(hash_value):
+    if await find_file_metadata(hash_value, 'keyed') is None:
+        return jsonify({"error": "File not found"}), 404
+
+    key = (await request.form).get('key')
+    if key is None or len(key) != 32:
+        return jsonify({"error": "Key must be provided and be exactly 32 bytes long"}), 400
+    return await check_hash(hash_value, 'keyed', key_bytes=key.encode('utf-8'))
+
+@app.route('/check-derive-keyed-hash/<hash_value>', methods=['GET'])
+async def check_derive_keyed_hash(hash_value):
+    context = (await request.form).get('context')
+    return await check_hash(hash_value, 'derive_keyed', context=context)
+
+async def verify_batch_entry(index: int, entry: dict, metadata, io_slots) -> dict:
+    hash_value = entry['hash_value']
+    hash_type = entry.get('hash_type', 'regular')
+    result = {"index": index, "hash_value": hash_value, "hash_type": hash_type}
+    async with io_slots:
+        try:
+            blob = await gcs.get_blob(metadata['file_name']) if metadata else None
+            if blob is None:
+                result["error"] = "File not found"
+                return result
+            key_bytes = entry['key'].encode('utf-8') if hash_type == "keyed" else None
+            update_size = expected_update_size(int(blob["size"]), VERIFY_CHUNK_SIZE)
+            hasher = new_blake3_hasher(hash_type, key_bytes=key_bytes, context=entry.get('context'), update_size=update_size)
+            data_download_hash = await stream_hash_blob(blob, hasher)
+            result["Status"] = "Success" if data_download_hash == hash_value else "Data Integrity Check Failed!"
+        except Exception as e:
+            result["error"] = str(e)
+    return result
+
+async def stream_check_batch(entries: list):
+    io_slots = asyncio.Semaphore(CHECK_BATCH_IO_WORKERS)
+    failed = 0
+    valid = []
+    for index, entry in enumerate(entries):
+        error = check_batch_entry_error(entry)
+        if error is not None:
+            failed += 1
+            yield json.dumps({"index": index, "error": error}) + "\n"
+        else:
+            valid.append((index, entry))
+
+    tasks = []
+    try:
+        for start in range(0, len(valid), CHECK_BATCH_READ_SIZE):
+            group = valid[start:start + CHECK_BATCH_READ_SIZE]
+            metadata = await find_file_metadata_many([(entry.get('hash_type', 'regular'), entry['hash_value']) for _, entry in group])
+            for index, entry in group:
+                doc_id = metadata_doc_id(entry.get('hash_type', 'regular'), entry['hash_value'])
+                tasks.append(asyncio.ensure_future(verify_batch_entry(index, entry, metadata[doc_id], io_slots)))
+
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if result.get("Status") != "Success":
+                failed += 1
+            yield json.dumps(result) + "\n"
+    finally:
+        # Client disconnected or all done: cancel verifications still pending
+        for task in tasks:
+            task.cancel()
+
+    yield json.dumps({"done": True, "count": len(entries), "failed": failed}) + "\n"
+
+@app.route('/check-batch', methods=['POST'])
+async def check_batch():
+    payload = await request.get_json(silent=True)
+    entries = payload.get('entries') if isinstance(payload, dict) else payload
+    if not isinstance(entries, list):
+        return jsonify({"error": "Body must be a JSON list of {hash_value, hash_type, key|context} entries"}), 400
+
+    return Response(measured_body(stream_check_batch(entries)), mimetype="application/x-ndjson")
+
+@app.route('/download/<hash_value>', methods=['GET'])
+async def download_file(hash_value):
+    try:
+        metadata = await find_any_file_metadata(hash_value)
+        if not metadata:
+            return jsonify({"error": "File not found"}), 404
+        set_hash_type(metadata.get('hash_type'))
+
+        file_name = metadata['file_name']
+        blob = await gcs.get_blob(file_name)
+        if blob is None:
+            return jsonify({"error": "File not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 404
+
+    size = int(blob["size"])
+    byte_range = None
+    if request.range is not None and range_is_fresh(blob):
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None and len(request.range.ranges) == 1:
+            response = jsonify({"error": "Requested range not satisfiable"})
+            response.status_code = 416
+            response.headers['Content-Range'] = f"bytes */{size}"
+            return response
+    start, end = byte_range or (0, size)
+
+    async def body():
+        async with transfer_slots:
+            async for chunk in gcs.iter_chunks(blob, start, end, DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+
+    status = 206 if byte_range else 200
+    response = Response(measured_body(body(), status), status=status, mimetype=blob.get("contentType") or "application/octet-stream")
+    response.content_length = end - start
+    if byte_range:
+        response.content_range = ContentRange("bytes", start, end, size)
+    response.accept_ranges = "bytes"
+    response.set_etag(blob["etag"])
+    response.last_modified = parse_gcs_time(blob.get("updated"))
+    response.headers.set('Content-Disposition', 'attachment', filename=metadata.get('original_name', file_name))
+    return response
+
+# Metrik per request (lihat request_metrics.py), sama seperti gcp_app.py
+@app.before_request
+async def begin_request_metrics():
+    start_request(request.url_rule.rule if request.url_rule else "unmatched")
+
+@app.after_request
+async def finish_request_metrics(response):
+    metrics = current_metrics()
+    if metrics is not None and not metrics.streaming:
+        metrics.finish(response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+async def prometheus_metrics():
+    return Response(metrics_payload(), content_type=CONTENT_TYPE_LATEST)
+
+@app.route('/stats', methods=['GET'])
+async def stats():
+    return jsonify({
+        "gcs_pool": {
+            "pool_size": GCS_POOL_SIZE,
+            "transfers_in_flight": MAX_TRANSFERS - transfer_slots._value
+        },
+        "metadata_cache": metadata_cache.stats(),
+        "blake3_threading": threading_policy.stats(),
+        "hash_scheduler": hash_scheduler.stats(),
+        "tree_templates": tree_templates.stats()
+    })
+
+if __name__ == '__main__':
+    app.run(debug=False, host='0.0.0.0', port=8080)
@@ -0,0 +1,60 @@
+from google.cloud import firestore
+import argparse
+from file_metadata import metadata_doc_id
+
+# Rewrites file_metadata documents created with random auto IDs into the
+# "{hash_type}:{hash_value}" layout that gcp_app.py reads with point gets.
+# Documents sharing a hash are merged into one record and their names kept as aliases.
+
+COLLECTION = "file_metadata"
+
+# Writes per WriteBatch commit (Firestore allows at most 500)
+BATCH_WRITES = 500
+
+def migrate(db, dry_run: bool = False) -> dict:
+    collection = db.collection(COLLECTION)
+    counts = {"migrated": 0, "already_keyed": 0, "skipped": 0}
+    batch = db.batch()
+    pending = 0
+
+    for snapshot in collection.stream():
+        data = snapshot.to_dict()
+        hash_type = data.get('hash_type')
+        hash_value = data.get('hash_value')
+        # e.g. hkdf_sha3 records carry a derived key instead of a hash_value
+        if not hash_type or not hash_value:
+            counts["skipped"] += 1
+            continue
+
+        doc_id = metadata_doc_id(hash_type, hash_value)
+        if snapshot.id == doc_id:
+            counts["already_keyed"] += 1
+            continue
+
+        counts["migrated"] += 1
+        if dry_run:
+            print(f"{snapshot.id} -> {doc_id}")
+            continue
+
+        record = dict(data)
+        name = data.get('original_name', data.get('file_name'))
+        record['aliases'] = firestore.ArrayUnion(list(data.get('aliases', [])) + ([name] if name else []))
+        batch.set(collection.document(doc_id), record, merge=True)
+        batch.delete(snapshot.reference)
+        pending += 2
+        if pending >= BATCH_WRITES:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migrate file_metadata documents to {hash_type}:{hash_value} IDs")
+    parser.add_argument("--dry-run", action="store_true", help="only print the documents that would be rewritten")
+    args = parser.parse_args()
+
+    counts = migrate(firestore.Client(), dry_run=args.dry_run)
+    print(f"Migrated: {counts['migrated']}, already keyed: {counts['already_keyed']}, skipped: {counts['skipped']}")
@@ -0,0 +1,196 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+import os
+import psutil
+import threading
+import time
+import tracemalloc
+
+# Instrumentasi per request untuk gcp_app.py dan gcp_app_async.py: durasi setiap fase diukur dengan
+# perf_counter_ns, puncak memori lewat RSS (atau tracemalloc), dan semuanya diekspor ke Prometheus di /metrics.
+
+# Phases timed inside a request. A phase's time is summed over all its calls, so a phase run by
+# several worker threads (batch routes) or overlapped with another one (async app) can exceed wall time.
+PHASES = ("body_read", "hash", "gcs_upload", "gcs_download", "gcs_metadata", "firestore_read", "firestore_write")
+
+# Peak memory is process RSS sampled at phase ends, above the RSS at request start. Spikes inside a
+# phase that are freed before it ends are missed. METRICS_TRACEMALLOC=1 uses tracemalloc's allocation
+# peak instead (every Python-level allocation: spooled bodies, GCS chunks, numpy buffers), reset when a
+# phase starts and read when it ends, so spikes inside a phase count; tracemalloc has one peak per
+# process, so concurrent requests reset each other's peak. It is opt-in because tracing every
+# allocation roughly halves upload throughput.
+METRICS_TRACEMALLOC = os.environ.get("METRICS_TRACEMALLOC", "0") == "1"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# 64 KiB .. 1 GiB
+MEMORY_BUCKETS = tuple(4 ** n for n in range(8, 16))
+
+REQUEST_SECONDS = Histogram("blake3_api_request_seconds", "Request latency", ["route", "hash_type", "status"], buckets=LATENCY_BUCKETS)
+PHASE_SECONDS = Histogram("blake3_api_phase_seconds", "Time a request spent in each phase", ["route", "hash_type", "phase"], buckets=LATENCY_BUCKETS)
+PEAK_MEMORY_BYTES = Histogram("blake3_api_request_peak_memory_bytes", "Peak process memory above the level at request start", ["route", "hash_type"], buckets=MEMORY_BUCKETS)
+REQUESTS = Counter("blake3_api_requests", "Requests served", ["route", "hash_type", "status"])
+PHASE_BYTES = Counter("blake3_api_phase_bytes", "Bytes read, hashed, uploaded or downloaded per phase", ["route", "hash_type", "phase"])
+
+_process = psutil.Process()
+
+# Dipanggil aplikasi saat startup (bukan saat import), agar tool yang hanya mengimpor modul ini tidak ikut di-trace
+def start_memory_tracing():
+    if METRICS_TRACEMALLOC and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+# tracemalloc dipakai hanya jika diminta dan sudah dimulai; selain itu RSS
+def _tracing() -> bool:
+    return METRICS_TRACEMALLOC and tracemalloc.is_tracing()
+
+# Memori proses saat ini dalam byte: total tracemalloc, atau RSS
+def memory_bytes() -> int:
+    return tracemalloc.get_traced_memory()[0] if _tracing() else _process.memory_info().rss
+
+# Puncak memori sejak reset_memory_peak() terakhir (dengan RSS: nilai saat ini)
+def peak_memory_bytes() -> int:
+    return tracemalloc.get_traced_memory()[1] if _tracing() else _process.memory_info().rss
+
+def reset_memory_peak():
+    if _tracing():
+        tracemalloc.reset_peak()
+
+# Frekuensi CPU saat ini dalam Hz (psutil melaporkan MHz), None jika tidak tersedia
+def cpu_frequency_hz():
+    try:
+        freq = psutil.cpu_freq()
+    except (NotImplementedError, OSError):
+        return None
+    return freq.current * 1e6 if freq and freq.current else None
+
+# Metrik satu request: waktu dan byte per fase plus puncak memori. Fase bisa dicatat dari
+# beberapa thread sekaligus (lihat bind()), jadi penjumlahannya memakai lock.
+class RequestMetrics:
+    def __init__(self, route: str, hash_type: str = "none"):
+        self.route = route
+        self.hash_type = hash_type
+        self.phase_ns = dict.fromkeys(PHASES, 0)
+        self.phase_bytes = dict.fromkeys(PHASES, 0)
+        self.peak_bytes = 0
+        self._base_bytes = memory_bytes()
+        reset_memory_peak()
+        self._lock = threading.Lock()
+        self._finished = False
+        # Set when the body is streamed after the view returns; the app then calls finish() at its end
+        self.streaming = False
+        self._started = time.perf_counter_ns()
+
+    def sample_memory(self):
+        self.peak_bytes = max(self.peak_bytes, peak_memory_bytes() - self._base_bytes)
+
+    def add(self, name: str, elapsed_ns: int, nbytes: int = 0):
+        with self._lock:
+            self.phase_ns[name] += elapsed_ns
+            self.phase_bytes[name] += nbytes
+        self.sample_memory()
+
+    @contextmanager
+    def phase(self, name: str, nbytes: int = 0):
+        # Peak since the last phase first, so spikes between phases are not lost by the reset
+        self.sample_memory()
+        reset_memory_peak()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter_ns() - start, nbytes)
+
+    def elapsed(self) -> float:
+        return (time.perf_counter_ns() - self._started) / 1e9
+
+    # Ringkasan untuk respons upload. throughput_cpb counts only the hash phase: CPU cycles
+    # (hash time x clock) per byte of content, without body read or network time.
+    def summary(self, size: int) -> dict:
+        hash_seconds = self.phase_ns["hash"] / 1e9
+        freq = cpu_frequency_hz()
+        return {
+            "time_elapsed": self.elapsed(),
+            "memory_usage_MB": self.peak_bytes / (1024 * 1024),
+            "throughput_cpb": hash_seconds * freq / size if size and freq else 0,
+            "phases_ms": {name: ns / 1e6 for name, ns in self.phase_ns.items() if ns}
+        }
+
+    # Mengirim metrik ke Prometheus, sekali per request
+    def finish(self, status: int):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        self.sample_memory()
+        labels = (self.route, self.hash_type)
+        REQUEST_SECONDS.labels(*labels, str(status)).observe(self.elapsed())
+        REQUESTS.labels(*labels, str(status)).inc()
+        for name in PHASES:
+            if self.phase_ns[name]:
+                PHASE_SECONDS.labels(*labels, name).observe(self.phase_ns[name] / 1e9)
+            if self.phase_bytes[name]:
+                PHASE_BYTES.labels(*labels, name).inc(self.phase_bytes[name])
+        PEAK_MEMORY_BYTES.labels(*labels).observe(self.peak_bytes)
+
+_current = ContextVar("request_metrics", default=None)
+_NO_PHASE = nullcontext()
+
+def start_request(route: str, hash_type: str = "none") -> RequestMetrics:
+    metrics = RequestMetrics(route, hash_type)
+    _current.set(metrics)
+    return metrics
+
+def current_metrics():
+    return _current.get()
+
+# Hash type dari request saat ini, untuk route yang baru mengetahuinya setelah membaca form atau metadata
+def set_hash_type(hash_type: str):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.hash_type = hash_type or "none"
+
+# Mencatat durasi blok sebagai fase name dari request saat ini (di luar request: tidak dicatat)
+def phase(name: str, nbytes: int = 0):
+    metrics = _current.get()
+    return _NO_PHASE if metrics is None else metrics.phase(name, nbytes)
+
+# Untuk kode yang mengukur sendiri (async generator yang tidak boleh dihitung saat suspend)
+def add_phase(name: str, elapsed_ns: int, nbytes: int = 0):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(name, elapsed_ns, nbytes)
+
+# fn untuk dijalankan di thread lain (thread pool, executor) dengan metrik request saat ini
+def bind(fn):
+    metrics = _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(metrics)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+# Seperti bind(), dan seluruh panggilan dicatat sebagai fase name
+def timed(name: str, fn, nbytes: int = 0):
+    metrics = _current.get()
+    if metrics is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current.set(metrics)
+        try:
+            with metrics.phase(name, nbytes):
+                return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+# Body /metrics. Under gunicorn with several workers set PROMETHEUS_MULTIPROC_DIR so every worker's samples are merged.
+def metrics_payload() -> bytes:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
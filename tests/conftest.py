@@ -0,0 +1,41 @@
+import io
+import os
+import sys
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (REPO_ROOT, os.path.join(REPO_ROOT, "Test")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Small chunk index chunks keep the scrub tests' payloads small; no calibration or GCS warm-up in tests
+APP_ENV = {"BLAKE3_CALIBRATE": "0", "GCS_WARMUP": "0", "CHUNK_INDEX_CHUNK_SIZE": "1024"}
+
+# gcp_app.py dengan GCS dan Firestore lokal (Test/local_backends.py) di direktori sementara
+@pytest.fixture(scope="session")
+def gcp_app(tmp_path_factory):
+    from local_backends import load_app
+    saved = {name: os.environ.get(name) for name in APP_ENV}
+    os.environ.update(APP_ENV)
+    try:
+        return load_app(os.path.join(REPO_ROOT, "gcp_app.py"), str(tmp_path_factory.mktemp("gcp_app")))
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+@pytest.fixture
+def client(gcp_app):
+    return gcp_app.app.test_client()
+
+# Upload lewat /upload-regular-hash; mengembalikan JSON respons (file_name, hash_value, ...)
+@pytest.fixture
+def upload(client):
+    def upload(data: bytes, name: str) -> dict:
+        response = client.post("/upload-regular-hash", data={"file": (io.BytesIO(data), name)},
+                               content_type="multipart/form-data")
+        assert response.status_code == 200
+        return response.get_json()
+    return upload
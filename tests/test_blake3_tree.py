@@ -0,0 +1,88 @@
+import os
+import sys
+import pytest
+from blake3 import blake3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blake3_tree import (CHUNK_LEN, HEADER_LEN, OutboardHasher, content_length, decode_slice, encode_slice,
+                         hash_bytes, mode_params, slice_content_range, slice_node_offsets)
+
+# Round trips of blake3_tree.py against blake3-py: root hash, outboard and slices, in every API mode
+
+KEY = b"10c9a7fdfdd3ade1025895293e0b9412"
+CONTEXT = "blake3_tree test derive"
+MODES = [("regular", None, None), ("keyed", KEY, None), ("derive_keyed", None, CONTEXT)]
+SIZES = [0, 1, 63, 64, 65, CHUNK_LEN - 1, CHUNK_LEN, CHUNK_LEN + 1, 4 * CHUNK_LEN, 5 * CHUNK_LEN + 7,
+         16 * CHUNK_LEN, 17 * CHUNK_LEN, 37 * CHUNK_LEN + 100, 64 * CHUNK_LEN]
+
+def reference(data: bytes, hash_type: str, key_bytes: bytes, context: str) -> str:
+    if hash_type == "keyed":
+        return blake3(data, key=key_bytes).hexdigest()
+    if hash_type == "derive_keyed":
+        return blake3(data, derive_key_context=context).hexdigest()
+    return blake3(data).hexdigest()
+
+def payload(size: int) -> bytes:
+    return blake3(b"payload").digest(length=size)
+
+def outboard_of(data: bytes, mode, group_log: int, update_size: int = None):
+    hasher = OutboardHasher(*mode, group_log=group_log, batch_size=3 * (CHUNK_LEN << group_log))
+    step = update_size or max(1, len(data))
+    for offset in range(0, len(data), step):
+        hasher.update(data[offset:offset + step])
+    return hasher
+
+def slice_ranges(size: int):
+    ranges = [(0, size), (0, 1), (size // 2, size // 2 + 1), (max(0, size - 1), size), (size // 3, 2 * size // 3 + 1),
+              (size, size + 10), (size + 5, size + 10)]
+    return sorted(set(ranges))
+
+@pytest.mark.parametrize("mode", MODES, ids=[m[0] for m in MODES])
+def test_hash_bytes_matches_blake3(mode):
+    key_words, flags = mode_params(*mode)
+    for size in SIZES:
+        data = payload(size)
+        assert hash_bytes(data, key_words, flags) == reference(data, *mode)
+
+@pytest.mark.parametrize("mode", MODES, ids=[m[0] for m in MODES])
+@pytest.mark.parametrize("group_log", [0, 2, 4])
+def test_outboard_root_matches_blake3(mode, group_log):
+    for size in SIZES:
+        data = payload(size)
+        for update_size in (None, 1000, CHUNK_LEN << group_log):
+            hasher = outboard_of(data, mode, group_log, update_size)
+            assert hasher.hexdigest() == reference(data, *mode), (size, update_size)
+            assert content_length(hasher.outboard()) == size
+            assert len(hasher.outboard()) == HEADER_LEN + 64 * (max(1, -(-size // (CHUNK_LEN << group_log))) - 1)
+
+@pytest.mark.parametrize("mode", MODES, ids=[m[0] for m in MODES])
+@pytest.mark.parametrize("group_log", [0, 2, 4])
+def test_slice_round_trip(mode, group_log):
+    for size in SIZES:
+        data = payload(size)
+        hasher = outboard_of(data, mode, group_log)
+        hash_value, outboard = hasher.hexdigest(), hasher.outboard()
+        for start, end in slice_ranges(size):
+            encoded = encode_slice(outboard, data, start, end, group_log)
+            content_start, content_end = slice_content_range(size, start, end, group_log)
+            nodes = len(slice_node_offsets(size, start, end, group_log))
+            assert len(encoded) == HEADER_LEN + 64 * nodes + content_end - content_start
+            assert decode_slice(encoded, hash_value, start, end, group_log, *mode) == data[start:end], (size, start, end)
+
+@pytest.mark.parametrize("group_log", [0, 2])
+def test_tampered_slice_is_rejected(group_log):
+    mode = MODES[1]
+    data = payload(37 * CHUNK_LEN + 100)
+    hasher = outboard_of(data, mode, group_log)
+    start, end = 20 * CHUNK_LEN, 21 * CHUNK_LEN
+    encoded = bytearray(encode_slice(hasher.outboard(), data, start, end, group_log))
+    for position in (HEADER_LEN, HEADER_LEN + 70, len(encoded) - 1):
+        tampered = bytearray(encoded)
+        tampered[position] ^= 1
+        with pytest.raises(ValueError):
+            decode_slice(bytes(tampered), hasher.hexdigest(), start, end, group_log, *mode)
+    with pytest.raises(ValueError):
+        decode_slice(bytes(encoded), hasher.hexdigest(), start, end, group_log, *MODES[0])
+    with pytest.raises(ValueError):
+        decode_slice(bytes(encoded[:-1]), hasher.hexdigest(), start, end, group_log, *mode)
@@ -0,0 +1,104 @@
+import os
+import pytest
+from blake3 import blake3
+
+from chunk_index import (DIGEST_LEN, HEADER, ChunkIndexBuilder, chunk_count, chunk_range, corrupt_ranges, expected_digest,
+                         select_chunks, unpack_chunk_index)
+
+CHUNK = 1024
+
+# chunk_index.py: tabel digest per chunk, dan /scrub di gcp_app.py atas GCS/Firestore lokal
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK - 1, CHUNK, CHUNK + 1, 5 * CHUNK, 5 * CHUNK + 7])
+@pytest.mark.parametrize("update_size", [1000, 4096])
+def test_builder_round_trip(size, update_size):
+    data = os.urandom(size)
+    builder = ChunkIndexBuilder(CHUNK)
+    for i in range(0, size, update_size):
+        builder.update(data[i:i + update_size])
+    chunk_size, content_len, digests = unpack_chunk_index(builder.packed())
+    assert (chunk_size, content_len) == (CHUNK, size)
+    assert len(digests) == chunk_count(size, CHUNK) * DIGEST_LEN
+    for index in range(chunk_count(size, CHUNK)):
+        start, end = chunk_range(index, CHUNK, size)
+        assert expected_digest(digests, index) == blake3(data[start:end]).digest()
+
+def test_unpack_rejects_malformed_tables():
+    builder = ChunkIndexBuilder(CHUNK)
+    builder.update(b"x" * (2 * CHUNK))
+    packed = builder.packed()
+    with pytest.raises(ValueError):
+        unpack_chunk_index(packed[:HEADER.size - 1])
+    with pytest.raises(ValueError):
+        unpack_chunk_index(packed[:-1])
+    with pytest.raises(ValueError):
+        unpack_chunk_index(b"XXXX" + packed[4:])
+
+def test_select_chunks():
+    assert select_chunks(10, chunks=[9, 3, 3, -1, 10]) == [3, 9]
+    assert select_chunks(0, sample=0.5) == []
+    assert len(select_chunks(100, sample=0.001)) == 1
+    assert select_chunks(10, sample=1) == list(range(10))
+    assert select_chunks(100, sample=0.1, seed="a") == select_chunks(100, sample=0.1, seed="a")
+
+def test_corrupt_ranges_merges_adjacent_chunks():
+    assert corrupt_ranges([], CHUNK, 10 * CHUNK) == []
+    assert corrupt_ranges([4, 1, 2], CHUNK, 4 * CHUNK + 10) == [
+        {"start": CHUNK, "end": 3 * CHUNK}, {"start": 4 * CHUNK, "end": 4 * CHUNK + 10}]
+
+# Upload lalu scrub; the object file is changed in between, as bit rot or a stray write would
+def object_path(gcp_app, file_name: str) -> str:
+    return gcp_app.gcs_pool.bucket().blob(file_name)._path
+
+def scrub(client, hash_value: str, **args) -> dict:
+    response = client.get(f"/scrub/{hash_value}", query_string={"sample": 1, **args})
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_scrub_intact_object(gcp_app, client, upload):
+    uploaded = upload(os.urandom(4 * CHUNK + 100), "scrub-intact.bin")
+    result = scrub(client, uploaded["hash_value"])
+    assert result["Status"] == "Success"
+    assert (result["chunks_total"], result["chunks_checked"]) == (5, 5)
+    assert result["corrupt_ranges"] == []
+
+def test_scrub_flipped_byte(gcp_app, client, upload):
+    data = bytearray(os.urandom(4 * CHUNK))
+    uploaded = upload(bytes(data), "scrub-flip.bin")
+    data[2 * CHUNK + 5] ^= 1
+    with open(object_path(gcp_app, uploaded["file_name"]), "wb") as f:
+        f.write(data)
+    result = scrub(client, uploaded["hash_value"])
+    assert result["Status"] == "Data Integrity Check Failed!"
+    assert result["corrupt_chunks"] == [2]
+    assert result["corrupt_ranges"] == [{"start": 2 * CHUNK, "end": 3 * CHUNK}]
+    # Chunk yang tidak dipilih tidak diperiksa
+    assert scrub(client, uploaded["hash_value"], chunks="0,1,3")["Status"] == "Success"
+
+def test_scrub_truncated_object(gcp_app, client, upload):
+    data = os.urandom(4 * CHUNK)
+    uploaded = upload(data, "scrub-truncate.bin")
+    with open(object_path(gcp_app, uploaded["file_name"]), "wb") as f:
+        f.write(data[:2 * CHUNK + 10])
+    result = scrub(client, uploaded["hash_value"])
+    assert result["Status"] == "Data Integrity Check Failed!"
+    assert result["corrupt_chunks"] == [2, 3]
+    assert result["corrupt_ranges"] == [{"start": 2 * CHUNK, "end": 4 * CHUNK}]
+
+def test_scrub_extended_at_chunk_boundary(gcp_app, client, upload):
+    uploaded = upload(os.urandom(3 * CHUNK), "scrub-extend-boundary.bin")
+    with open(object_path(gcp_app, uploaded["file_name"]), "ab") as f:
+        f.write(b"extra")
+    result = scrub(client, uploaded["hash_value"])
+    assert result["Status"] == "Data Integrity Check Failed!"
+    assert result["corrupt_chunks"] == []
+    assert result["corrupt_ranges"] == [{"start": 3 * CHUNK, "end": 3 * CHUNK + 5}]
+
+def test_scrub_extended_off_chunk_boundary(gcp_app, client, upload):
+    uploaded = upload(os.urandom(3 * CHUNK + 10), "scrub-extend.bin")
+    with open(object_path(gcp_app, uploaded["file_name"]), "ab") as f:
+        f.write(b"extra")
+    result = scrub(client, uploaded["hash_value"])
+    assert result["Status"] == "Data Integrity Check Failed!"
+    assert result["corrupt_chunks"] == [3]
+    assert result["corrupt_ranges"] == [{"start": 3 * CHUNK, "end": 3 * CHUNK + 15}]
@@ -0,0 +1,56 @@
+import os
+import pytest
+
+# /download: Range tunggal (206), suffix range, 416, multi-range dan If-Range yang kadaluarsa (200 penuh)
+
+SIZE = 3000
+
+@pytest.fixture
+def stored(upload):
+    data = os.urandom(SIZE)
+    return data, upload(data, f"download-{data[:4].hex()}.bin")["hash_value"]
+
+def test_full_download(client, stored):
+    data, hash_value = stored
+    response = client.get(f"/download/{hash_value}")
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["ETag"] and response.headers["Last-Modified"]
+    assert "Content-Range" not in response.headers
+
+@pytest.mark.parametrize("header, start, end", [("bytes=10-19", 10, 20), ("bytes=2990-", 2990, SIZE),
+                                                ("bytes=-5", SIZE - 5, SIZE), ("bytes=2000-9999", 2000, SIZE)])
+def test_single_range(client, stored, header, start, end):
+    data, hash_value = stored
+    response = client.get(f"/download/{hash_value}", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.data == data[start:end]
+    assert response.headers["Content-Range"] == f"bytes {start}-{end - 1}/{SIZE}"
+    assert response.headers["Content-Length"] == str(end - start)
+
+def test_unsatisfiable_range(client, stored):
+    _, hash_value = stored
+    response = client.get(f"/download/{hash_value}", headers={"Range": f"bytes={SIZE}-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{SIZE}"
+
+def test_multi_range_gets_the_whole_object(client, stored):
+    data, hash_value = stored
+    response = client.get(f"/download/{hash_value}", headers={"Range": "bytes=0-1,10-11"})
+    assert response.status_code == 200
+    assert response.data == data
+
+def test_if_range(client, stored):
+    data, hash_value = stored
+    full = client.get(f"/download/{hash_value}")
+    etag, last_modified = full.headers["ETag"], full.headers["Last-Modified"]
+    for validator in (etag, last_modified):
+        response = client.get(f"/download/{hash_value}", headers={"Range": "bytes=0-9", "If-Range": validator})
+        assert response.status_code == 206 and response.data == data[:10]
+    for stale in ('"stale-etag"', "Mon, 01 Jan 2001 00:00:00 GMT"):
+        response = client.get(f"/download/{hash_value}", headers={"Range": "bytes=0-9", "If-Range": stale})
+        assert response.status_code == 200 and response.data == data
+
+def test_missing_hash(client):
+    assert client.get("/download/" + "0" * 64).status_code == 404
@@ -0,0 +1,87 @@
+import time
+from blake3 import blake3
+from google.cloud import firestore
+
+from file_metadata import MetadataCache, coalesce_metadata_writes, metadata_doc_id, metadata_write
+
+# file_metadata.py: MetadataCache (TTL, entry negatif, LRU, invalidasi)
+
+def test_cache_hit_and_miss():
+    cache = MetadataCache(10, ttl=60, negative_ttl=60)
+    assert cache.get("regular:aa") is MetadataCache.MISSING
+    cache.put("regular:aa", {"file_name": "a"})
+    assert cache.get("regular:aa") == {"file_name": "a"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+def test_negative_entries_use_their_own_ttl():
+    cache = MetadataCache(10, ttl=60, negative_ttl=0.05)
+    cache.put("regular:aa", None)
+    cache.put("regular:bb", {"file_name": "b"})
+    assert cache.get("regular:aa") is None
+    assert cache.stats()["negative_hits"] == 1
+    time.sleep(0.1)
+    assert cache.get("regular:aa") is MetadataCache.MISSING
+    assert cache.get("regular:bb") == {"file_name": "b"}
+    assert cache.stats()["expired"] == 1
+
+def test_positive_entries_expire():
+    cache = MetadataCache(10, ttl=0.05, negative_ttl=60)
+    cache.put("regular:aa", {"file_name": "a"})
+    time.sleep(0.1)
+    assert cache.get("regular:aa") is MetadataCache.MISSING
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MetadataCache(2, ttl=60, negative_ttl=60)
+    cache.put("regular:aa", {"file_name": "a"})
+    cache.put("regular:bb", {"file_name": "b"})
+    cache.get("regular:aa")
+    cache.put("regular:cc", {"file_name": "c"})
+    assert cache.get("regular:bb") is MetadataCache.MISSING
+    assert cache.get("regular:aa") is not MetadataCache.MISSING
+    assert cache.stats()["evictions"] == 1
+
+def test_invalidate_hash_drops_every_hash_type():
+    cache = MetadataCache(10, ttl=60, negative_ttl=60)
+    for key in (metadata_doc_id("regular", "aa"), metadata_doc_id("keyed", "aa"), metadata_doc_id("*", "aa"),
+                metadata_doc_id("regular", "bb")):
+        cache.put(key, None)
+    cache.invalidate_hash("aa")
+    assert cache.stats()["entries"] == 1 and cache.stats()["invalidations"] == 3
+    assert cache.get(metadata_doc_id("regular", "bb")) is None
+
+# Negative entry dari lookup yang gagal dibuang oleh upload hash yang sama
+def test_upload_replaces_a_cached_miss(gcp_app, client, upload):
+    data = b"cached miss " * 100
+    hash_value = blake3(data).hexdigest()
+    assert client.get(f"/download/{hash_value}").status_code == 404
+    assert gcp_app.metadata_cache.get(metadata_doc_id("*", hash_value)) is None
+    upload(data, "cached-miss.bin")
+    assert client.get(f"/download/{hash_value}").status_code == 200
+
+# coalesce_metadata_writes: satu penulisan per dokumen untuk WriteBatch /upload-batch
+def stored(hash_value: str, object_name: str, existing=None) -> dict:
+    return {"object_name": object_name, "hash_value": hash_value, "size": 10, "existing": existing}
+
+def test_coalesce_keeps_the_last_plain_write():
+    writes = [(stored("aa", "a1"), "regular", "a1"), (stored("bb", "b"), "regular", "b"),
+              (stored("aa", "a2"), "regular", "a2"), (stored("aa", "k"), "keyed", "k")]
+    merged = coalesce_metadata_writes(writes, content_addressed=False)
+    assert [(hash_type, hash_value, mode) for hash_type, hash_value, _, mode in merged] == [
+        ("regular", "aa", "set"), ("regular", "bb", "set"), ("keyed", "aa", "set")]
+    assert merged[0][2]["file_name"] == "a2"
+
+def test_coalesce_merges_aliases_of_content_addressed_uploads():
+    writes = [(stored("aa", "aa/obj"), "regular", "first.bin"), (stored("aa", "aa/obj"), "regular", "second.bin"),
+              (stored("aa", "aa/obj", existing={"file_name": "aa/obj"}), "regular", "third.bin")]
+    (hash_type, hash_value, data, mode), = coalesce_metadata_writes(writes, content_addressed=True)
+    assert (hash_type, hash_value, mode) == ("regular", "aa", "merge")
+    assert data["original_name"] == "first.bin"
+    assert isinstance(data["aliases"], firestore.ArrayUnion)
+    assert list(data["aliases"].values) == ["first.bin", "second.bin", "third.bin"]
+
+def test_coalesce_matches_single_writes():
+    write = (stored("aa", "aa/obj"), "regular", "one.bin")
+    (_, _, data, mode), = coalesce_metadata_writes([write], content_addressed=True)
+    assert (data, mode) == metadata_write(*write, True)
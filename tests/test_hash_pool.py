@@ -0,0 +1,63 @@
+import os
+import signal
+import threading
+import time
+import pytest
+
+import hash_pool
+from hash_pool import HashPoolError, HashWorkerPool
+
+# Test/hash_pool.py: pemulihan pool saat worker mati, dan health check yang tidak memotong map() yang berjalan
+
+@pytest.fixture
+def pool():
+    pool = HashWorkerPool(2, timeout=30, health_interval=3600)
+    pool.start()
+    yield pool
+    pool.restart()
+
+def run_in_thread(fn, *args):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = fn(*args)
+        except Exception as e:
+            outcome["error"] = e
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+def wait_until(condition, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_map_fails_cleanly_when_a_worker_is_killed(pool):
+    thread, outcome = run_in_thread(pool.map, time.sleep, [2, 2])
+    wait_until(lambda: pool._active == 1)
+    time.sleep(0.2)
+    os.kill(next(iter(pool._executor._processes)), signal.SIGKILL)
+    thread.join(10)
+    assert isinstance(outcome.get("error"), HashPoolError)
+    assert pool.stats()["broken"] == 1 and pool.stats()["restarts"] == 1
+    # A fresh executor serves the next map
+    assert pool.map(abs, [-1, -2]) == [1, 2]
+
+def test_failed_health_check_does_not_restart_a_busy_pool(pool, monkeypatch):
+    thread, outcome = run_in_thread(pool.map, time.sleep, [1, 1])
+    wait_until(lambda: pool._active == 1)
+    # Pings queue behind the map's work and time out; the map must keep its executor
+    monkeypatch.setattr(hash_pool, "HASH_POOL_PING_TIMEOUT", 0.05)
+    assert pool.check() is False
+    thread.join(10)
+    assert outcome == {"result": [None, None]}
+    assert pool.stats()["restarts"] == 0
+
+def test_failed_health_check_restarts_an_idle_pool(pool, monkeypatch):
+    executor = pool._executor
+    os.kill(next(iter(executor._processes)), signal.SIGKILL)
+    assert pool.check() is False
+    assert pool.stats()["restarts"] == 1 and pool._executor is not executor
+    assert pool.check() is True
@@ -0,0 +1,74 @@
+import threading
+import time
+from blake3 import blake3
+
+import blake3_hashing
+from blake3_hashing import HashScheduler
+
+# HashScheduler: total thread budget, FIFO queue, and the bypass for small single-threaded hashes
+
+def test_threads_are_capped_by_the_budget():
+    scheduler = HashScheduler(4)
+    assert scheduler.threads(blake3.AUTO) == 4
+    assert scheduler.threads(8) == 4
+    assert scheduler.threads(2) == 2
+    assert scheduler.threads(0) == 1
+
+def test_waiters_are_served_in_fifo_order():
+    scheduler = HashScheduler(4)
+    scheduler.acquire(3)
+    order = []
+
+    def waiter(name, threads):
+        scheduler.acquire(threads)
+        order.append(name)
+        scheduler.release(threads)
+
+    # One token is free, but the narrow request queued behind a wide one waits for it
+    workers = []
+    for name, threads in (("wide", 4), ("narrow", 1)):
+        workers.append(threading.Thread(target=waiter, args=(name, threads)))
+        workers[-1].start()
+        while scheduler.stats()["queue_depth"] < len(workers):
+            time.sleep(0.001)
+    assert scheduler.stats()["threads_in_use"] == 3
+    scheduler.release(3)
+    for worker in workers:
+        worker.join(5)
+    assert order == ["wide", "narrow"]
+    stats = scheduler.stats()
+    assert (stats["queued"], stats["max_queue_depth"], stats["threads_in_use"], stats["queue_depth"]) == (2, 2, 0, 0)
+
+def test_concurrent_slots_stay_within_the_budget():
+    scheduler = HashScheduler(3)
+    in_use, peak, lock = [0], [0], threading.Lock()
+
+    def hash_twice(threads):
+        for _ in range(2):
+            with scheduler.slot(threads):
+                with lock:
+                    in_use[0] += threads
+                    peak[0] = max(peak[0], in_use[0])
+                time.sleep(0.002)
+                with lock:
+                    in_use[0] -= threads
+
+    workers = [threading.Thread(target=hash_twice, args=(1 + i % 3,)) for i in range(12)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+    assert peak[0] <= 3
+    assert scheduler.stats()["acquired"] == 24
+
+def test_small_single_threaded_hashes_skip_the_scheduler():
+    scheduler = HashScheduler(1)
+    scheduler.acquire(1)
+    # Budget exhausted: a small single-threaded hash still runs, a larger one would queue
+    with scheduler.slot(1, blake3_hashing.BLAKE3_UNSCHEDULED_MAX):
+        pass
+    assert scheduler.stats()["unscheduled"] == 1
+    assert scheduler.stats()["queue_depth"] == 0
+    scheduler.release(1)
+    with scheduler.slot(1, blake3_hashing.BLAKE3_UNSCHEDULED_MAX + 1):
+        assert scheduler.stats()["threads_in_use"] == 1
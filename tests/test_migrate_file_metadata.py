@@ -0,0 +1,48 @@
+import pytest
+
+import migrate_file_metadata
+from local_backends import LocalFirestoreClient
+from migrate_file_metadata import migrate
+
+# migrate_file_metadata.py atas Firestore lokal: dokumen auto-ID ditulis ulang ke "{hash_type}:{hash_value}"
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(LocalFirestoreClient, "root", str(tmp_path))
+    return LocalFirestoreClient()
+
+def documents(db) -> dict:
+    return {snapshot.id: snapshot.to_dict() for snapshot in db.collection("file_metadata").stream()}
+
+def add(db, doc_id: str, data: dict):
+    db.collection("file_metadata").document(doc_id).set(data)
+
+def test_migrate_rekeys_and_merges_documents(db):
+    add(db, "auto1", {"file_name": "a.bin", "hash_value": "aa", "hash_type": "regular"})
+    add(db, "auto2", {"file_name": "a-copy.bin", "hash_value": "aa", "hash_type": "regular", "aliases": ["old.bin"]})
+    add(db, "auto3", {"file_name": "k.bin", "hash_value": "aa", "hash_type": "keyed"})
+    add(db, "regular:bb", {"file_name": "b.bin", "hash_value": "bb", "hash_type": "regular"})
+    add(db, "auto4", {"file_name": "h.bin", "hash_type": "hkdf_sha3", "derived_key": "..."})
+
+    counts = migrate(db)
+    assert counts == {"migrated": 3, "already_keyed": 1, "skipped": 1}
+    docs = documents(db)
+    assert sorted(docs) == ["auto4", "keyed:aa", "regular:aa", "regular:bb"]
+    assert docs["regular:aa"]["hash_value"] == "aa"
+    assert sorted(docs["regular:aa"]["aliases"]) == ["a-copy.bin", "a.bin", "old.bin"]
+    assert docs["keyed:aa"]["aliases"] == ["k.bin"]
+    # Idempotent: a second run finds everything keyed
+    assert migrate(db) == {"migrated": 0, "already_keyed": 3, "skipped": 1}
+
+def test_dry_run_writes_nothing(db, capsys):
+    add(db, "auto1", {"file_name": "a.bin", "hash_value": "aa", "hash_type": "regular"})
+    assert migrate(db, dry_run=True)["migrated"] == 1
+    assert "auto1 -> regular:aa" in capsys.readouterr().out
+    assert list(documents(db)) == ["auto1"]
+
+def test_writes_are_committed_in_batches(db, monkeypatch):
+    monkeypatch.setattr(migrate_file_metadata, "BATCH_WRITES", 4)
+    for i in range(5):
+        add(db, f"auto{i}", {"file_name": f"{i}.bin", "hash_value": f"{i:02x}", "hash_type": "regular"})
+    assert migrate(db)["migrated"] == 5
+    assert sorted(documents(db)) == [f"regular:{i:02x}" for i in range(5)]
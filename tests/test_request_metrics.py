@@ -0,0 +1,28 @@
+import tracemalloc
+
+import request_metrics
+from request_metrics import RequestMetrics, start_memory_tracing
+
+# request_metrics.py: tracemalloc hanya jika diminta (METRICS_TRACEMALLOC=1) dan dimulai oleh aplikasi
+
+def test_memory_tracing_is_opt_in():
+    assert not request_metrics.METRICS_TRACEMALLOC
+    start_memory_tracing()
+    assert not tracemalloc.is_tracing()
+    metrics = RequestMetrics("/test")
+    with metrics.phase("hash"):
+        pass
+    assert metrics.peak_bytes >= 0
+
+def test_tracemalloc_peak_inside_a_phase(monkeypatch):
+    monkeypatch.setattr(request_metrics, "METRICS_TRACEMALLOC", True)
+    start_memory_tracing()
+    try:
+        metrics = RequestMetrics("/test")
+        with metrics.phase("hash"):
+            # Freed before the phase ends: only the allocation peak sees it
+            data = bytearray(8 * 1024 * 1024)
+            del data
+        assert metrics.peak_bytes >= 8 * 1024 * 1024
+    finally:
+        tracemalloc.stop()